@@ -26,6 +26,13 @@ class Defaults:
 
     # Feature toggles
     mock_mode: bool = True
+    # Real mode: run ROI/RGB means/POS per chunk at ingest instead of all at finalize
+    streaming_rppg: bool = True
+    # Real mode: finalize in N worker processes (0 = in-process, via asyncio.to_thread)
+    finalize_workers: int = 0
+    # Seconds the WS waits for finalize before sending a failure result. Finalize workers
+    # get a fraction of it (rppg_pool.worker_timeout_s), so they time out first.
+    finalize_timeout_s: float = 10.0
 
 
 DEFAULTS = Defaults()
@@ -6,6 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from .routes.sessions import router as sessions_router
 from .routes.ws import router as ws_router
 from .routes.mayla import router as mayla_router
+from .services import rppg_pool
 
 
 def create_app() -> FastAPI:
@@ -24,6 +25,9 @@ def create_app() -> FastAPI:
     app.include_router(ws_router)
     app.include_router(mayla_router)
 
+    # Real mode with finalize_workers > 0: spawn the rPPG workers ahead of the first session
+    rppg_pool.warm_up()
+
     @app.get("/health")
     def health():
         return {"ok": True}
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
 
@@ -42,12 +44,16 @@ class _ChunkReq(BaseModel):
     chunk_seq: int
     n: int
     frames: list[str]
+    # Optional per-frame capture timestamps (ms, client clock)
+    ts_ms: Optional[list[float]] = None
 
 
 @router.post("/{session_id}/chunk")
 def ingest_chunk(session_id: str, req: _ChunkReq):
     try:
-        n_ingested, _ = SESSION_MANAGER.ingest_chunk_base64(session_id=session_id, frames_b64=req.frames)
+        n_ingested, _ = SESSION_MANAGER.ingest_chunk_base64(
+            session_id=session_id, frames_b64=req.frames, ts_ms=req.ts_ms
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import time
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from ..config import DEFAULTS
+from ..services.frame_protocol import decode_binary_message
 from ..services.rppg_service import SESSION_MANAGER
 
 router = APIRouter(tags=["ws"])
@@ -75,7 +78,7 @@ async def ws_session(websocket: WebSocket, session_id: str):
             # Hard timeout to avoid hanging WS
             result = await asyncio.wait_for(
                 asyncio.to_thread(SESSION_MANAGER.finalize_session, session_id),
-                timeout=10.0,
+                timeout=float(DEFAULTS.finalize_timeout_s),
             )
             if not isinstance(result, dict):
                 result = _poor_result(elapsed, "Resultado inválido do processamento.")
@@ -135,34 +138,66 @@ async def ws_session(websocket: WebSocket, session_id: str):
 
     try:
         while True:
-            msg = await websocket.receive_text()
+            message = await websocket.receive()
+            if message.get("type") == "websocket.disconnect":
+                raise WebSocketDisconnect(code=message.get("code") or 1000)
+
+            if message.get("bytes") is not None:
+                # Binary chunk: msgpack with raw JPEG bytes (no base64/JSON overhead)
+                try:
+                    chunk = decode_binary_message(message["bytes"])
+                except ValueError as e:
+                    print(f"[WS] invalid_binary session_id={session_id} err={str(e)}")
+                    await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+                    continue
+
+                if chunk.type == "end":
+                    await _finalize(reason="client_end")
+                    return
+
+                chunk_seq = chunk.chunk_seq
+                n_declared = chunk.n
+                ingest = functools.partial(SESSION_MANAGER.ingest_chunk_jpeg, session_id, chunk.frames, ts_ms=chunk.ts_ms)
+            else:
+                msg = message.get("text") or ""
+
+                try:
+                    payload = json.loads(msg)
+                except Exception:
+                    print(f"[WS] invalid_json session_id={session_id}")
+                    await websocket.send_text(json.dumps({"type": "error", "message": "invalid_json"}))
+                    continue
+
+                if payload.get("type") == "end":
+                    await _finalize(reason="client_end")
+                    return
+
+                frames = payload.get("frames")
+                n_declared = payload.get("n")
+                chunk_seq = payload.get("chunk_seq")
+
+                if not isinstance(chunk_seq, int):
+                    await websocket.send_text(json.dumps({"type": "error", "message": "missing_chunk_seq"}))
+                    continue
+
+                if not isinstance(frames, list):
+                    await websocket.send_text(json.dumps({"type": "error", "message": "missing_frames"}))
+                    continue
+
+                ingest = functools.partial(
+                    SESSION_MANAGER.ingest_chunk_base64,
+                    session_id=session_id,
+                    frames_b64=frames,
+                    ts_ms=payload.get("ts_ms"),
+                )
 
             try:
-                payload = json.loads(msg)
-            except Exception:
-                print(f"[WS] invalid_json session_id={session_id}")
-                await websocket.send_text(json.dumps({"type": "error", "message": "invalid_json"}))
-                continue
-
-            if payload.get("type") == "end":
-                await _finalize(reason="client_end")
-                return
-
-            frames = payload.get("frames")
-            n_declared = payload.get("n")
-            chunk_seq = payload.get("chunk_seq")
-
-            if not isinstance(chunk_seq, int):
-                await websocket.send_text(json.dumps({"type": "error", "message": "missing_chunk_seq"}))
-                continue
-
-            if not isinstance(frames, list):
-                await websocket.send_text(json.dumps({"type": "error", "message": "missing_frames"}))
-                continue
-
-            try:
-                n_ingested, total_bytes = SESSION_MANAGER.ingest_chunk_base64(session_id=session_id, frames_b64=frames)
+                # Real mode runs ROI/POS at ingest (streaming engine): keep it off the event loop.
+                n_ingested, total_bytes = await asyncio.to_thread(ingest)
             except ValueError as e:
+                if str(e) == "invalid_timestamps":
+                    await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+                    continue
                 print(f"[WS] guardrail_triggered session_id={session_id} err={str(e)}")
                 await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
                 await websocket.close(code=4400)
@@ -172,6 +207,11 @@ async def ws_session(websocket: WebSocket, session_id: str):
             n_ack = n_declared if isinstance(n_declared, int) else n_ingested
             await websocket.send_text(json.dumps({"type": "ack", "chunk_seq": chunk_seq, "received": n_ack}))
 
+            # Streaming mode: preview BPM of the signal so far
+            live_bpm = SESSION_MANAGER.live_bpm(session_id)
+            if live_bpm is not None:
+                await websocket.send_text(json.dumps({"type": "progress", "stage": "capturing", "live_bpm": round(live_bpm, 1)}))
+
             s2 = SESSION_MANAGER.get(session_id)
             print(
                 f"[WS] chunk session_id={session_id} chunk_seq={chunk_seq} n_ingested={n_ingested} bytes={total_bytes} totals: frames={s2.frames_received if s2 else '?'} chunks={s2.chunks_received if s2 else '?'}"
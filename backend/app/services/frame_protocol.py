@@ -0,0 +1,76 @@
+"""Binary WS chunk format (alternative to base64 frames inside JSON text messages).
+
+A binary WS message is a msgpack map:
+
+    {"type": "chunk", "chunk_seq": int, "frames": [bin, ...], "ts_ms": [float, ...]}
+
+`frames` carries the raw JPEG bytes (msgpack `bin`, length-prefixed, no base64) and
+`ts_ms` the optional per-frame capture timestamps in milliseconds. `{"type": "end"}`
+ends the session, as with JSON.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+try:
+    import msgpack  # type: ignore
+except Exception:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+
+@dataclass
+class BinaryChunk:
+    type: str
+    chunk_seq: Optional[int] = None
+    frames: Optional[List[bytes]] = None
+    ts_ms: Optional[List[float]] = None
+    n: Optional[int] = None
+
+
+def decode_binary_message(data: bytes) -> BinaryChunk:
+    """Parse one binary WS message. Raises ValueError with a WS error code on bad input."""
+    if msgpack is None:
+        raise ValueError("binary_not_supported")
+
+    try:
+        payload = msgpack.unpackb(data, raw=False)
+    except Exception:
+        raise ValueError("invalid_binary_chunk")
+
+    if not isinstance(payload, dict):
+        raise ValueError("invalid_binary_chunk")
+
+    msg_type = payload.get("type") or "chunk"
+    if msg_type == "end":
+        return BinaryChunk(type="end")
+    if msg_type != "chunk":
+        raise ValueError("invalid_binary_chunk")
+
+    chunk_seq = payload.get("chunk_seq")
+    if not isinstance(chunk_seq, int) or isinstance(chunk_seq, bool):
+        raise ValueError("missing_chunk_seq")
+
+    frames = payload.get("frames")
+    if not isinstance(frames, list) or not all(isinstance(f, (bytes, bytearray)) for f in frames):
+        raise ValueError("missing_frames")
+
+    ts_ms = payload.get("ts_ms")
+    if ts_ms is not None:
+        if (
+            not isinstance(ts_ms, list)
+            or len(ts_ms) != len(frames)
+            or not all(isinstance(t, (int, float)) and not isinstance(t, bool) for t in ts_ms)
+        ):
+            raise ValueError("invalid_timestamps")
+        ts_ms = [float(t) for t in ts_ms]
+
+    n = payload.get("n")
+    return BinaryChunk(
+        type="chunk",
+        chunk_seq=chunk_seq,
+        frames=[bytes(f) for f in frames],
+        ts_ms=ts_ms,
+        n=n if isinstance(n, int) else None,
+    )
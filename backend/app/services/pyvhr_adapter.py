@@ -1,20 +1,26 @@
 from __future__ import annotations
 
 import math
+import os
+import threading
 import time
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 
 # MediaPipe is used only for face ROI detection; this module is otherwise independent of FastAPI.
 import mediapipe as mp
 
-from scipy.signal import butter, filtfilt, welch, find_peaks
+from scipy.fft import rfftfreq
+from scipy.signal import butter, filtfilt, find_peaks
 from scipy.stats import median_abs_deviation
 
 # pyVHR methods (local package in this repo)
-from pyVHR.BVP.methods import cpu_CHROM, cpu_POS
+from pyVHR.BPM.utils import SlidingWelch, Welch_batch, peak_bpm, welch_zoom
+from pyVHR.BVP.methods import cpu_CHROM, cpu_POS_fast
+from pyVHR.extraction.utils import fill_gaps
 
 
 @dataclass
@@ -41,6 +47,15 @@ class _Roi:
 # if we decide to extend the signature).
 _ROI_REFRESH_INTERVAL = 3
 
+# Runs of missing RGB means up to this many frames are linearly interpolated; longer
+# ones hold the last valid mean (and get logged).
+_MAX_INTERP_GAP = 4
+
+# Longest wait for a pooled face detector. With more live sessions than detectors, a
+# push (or batch ROI stage) fails with TimeoutError("face_detector_pool_exhausted")
+# instead of parking its executor thread indefinitely.
+_DETECTOR_TIMEOUT_S = 5.0
+
 
 def _bandpass_1d(x: np.ndarray, fps: float, min_hz: float, max_hz: float, order: int = 4) -> np.ndarray:
     if x.size < 10 or fps <= 0:
@@ -71,6 +86,16 @@ def _bandpass_bvp(bvp: np.ndarray, fps: float, min_hz: float = 0.65, max_hz: flo
     return filtfilt(b, a, bvp).astype(np.float32)
 
 
+def _welch_in_band(x: np.ndarray, fps: float, min_hz: float, max_hz: float, nfft: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    """Welch PSD of a 1-D signal (segments of up to 256 samples, 80% overlap) at the
+    nfft-point DFT bins in [min_hz, max_hz] only, as (freqs_hz, psd)."""
+    nperseg = min(256, x.size)
+    noverlap = int(0.8 * nperseg)
+    freqs = rfftfreq(nfft, 1.0 / fps)
+    band = np.flatnonzero((freqs >= min_hz) & (freqs <= max_hz))
+    return freqs[band], welch_zoom(x, fps, nperseg, noverlap, nfft, band)
+
+
 def _snr_from_psd(freqs_hz: np.ndarray, psd: np.ndarray, f_peak_hz: float) -> Tuple[float, float]:
     """Return (snr_db, snr_score in [0,1]).
 
@@ -120,30 +145,21 @@ def _estimate_bpm_series(bvp: np.ndarray, fps: float, winsize: int, stride: int)
     win_len = int(round(winsize * fps))
     hop = int(round(stride * fps))
     hop = max(1, hop)
+    if win_len <= 0 or bvp.size < win_len:
+        return []
 
-    out: List[float] = []
-    for start in range(0, bvp.size - win_len + 1, hop):
-        seg = bvp[start : start + win_len]
-        if not np.isfinite(seg).all():
-            continue
-        # Welch PSD
-        nperseg = min(256, seg.size)
-        noverlap = int(0.8 * nperseg)
-        freqs, psd = welch(seg, fs=fps, nperseg=nperseg, noverlap=noverlap, nfft=2048)
-        # Find peak in HR band
-        band = (freqs >= 0.65) & (freqs <= 4.0)
-        if not np.any(band):
-            continue
-        freqs_b = freqs[band]
-        psd_b = psd[band]
-        if psd_b.size == 0 or np.sum(psd_b) <= 0:
-            continue
-        peak_i = int(np.argmax(psd_b))
-        f_peak_hz = float(freqs_b[peak_i])
-        bpm = f_peak_hz * 60.0
-        if 40.0 <= bpm <= 200.0:
-            out.append(float(bpm))
-    return out
+    # All windows in one Welch call (pyVHR's batched estimator, band 0.65-4 Hz bins only)
+    windows = np.lib.stride_tricks.sliding_window_view(bvp, win_len)[::hop]
+    windows = windows[np.isfinite(windows).all(axis=1)]
+    if windows.shape[0] == 0:
+        return []
+    bpm_freqs, psd = Welch_batch(windows, float(fps), minHz=0.65, maxHz=4.0, nfft=2048, method="zoom")
+    if bpm_freqs.size == 0:
+        return []
+    # Peak in HR band (interpolated between bins), for windows with some power in it
+    psd = psd[np.sum(psd, axis=1) > 0]
+    bpms = peak_bpm(bpm_freqs, psd, interp=True).astype(np.float64)
+    return [float(bpm) for bpm in bpms if 40.0 <= bpm <= 200.0]
 
 
 def _quality_from_confidence_and_mad(confidence: float, mad_bpm: float) -> str:
@@ -154,13 +170,8 @@ def _quality_from_confidence_and_mad(confidence: float, mad_bpm: float) -> str:
     return "poor"
 
 
-def process_rppg_signal(
-    frames: list,
-    fps: float,
-    winsize: int = 5,
-    stride: int = 1,
-) -> dict:
-    base_result: Dict[str, Any] = {
+def _empty_result() -> Dict[str, Any]:
+    return {
         "bpm": None,
         "confidence": 0.0,
         "quality": "poor",
@@ -178,12 +189,425 @@ def process_rppg_signal(
         "stress_level": None,
     }
 
+
+def _new_face_detector() -> Any:
+    mp_face = mp.solutions.face_detection
+    return mp_face.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+
+
+class FaceDetectorPool:
+    """Bounded pool of reusable MediaPipe FaceDetection instances.
+
+    Building a detector loads the model and initializes its graph, which is far more
+    expensive than running it on a 256x144 frame, so instances are kept across sessions.
+    A detector is not thread-safe: `acquire()` hands one out exclusively and, while
+    `max_size` are in use, waits up to `timeout` seconds (None: no limit) before raising
+    TimeoutError. Detectors are created lazily; one that raised while in
+    use, or whose graph is gone, is closed and replaced instead of being reused.
+    """
+
+    def __init__(self, max_size: int, factory: Callable[[], Any] = _new_face_detector):
+        self.max_size = int(max(1, max_size))
+        self._factory = factory
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._idle: List[Any] = []
+        self.created = 0
+        self.discarded = 0
+
+    @staticmethod
+    def _healthy(detector: Any) -> bool:
+        # mediapipe's SolutionBase drops its graph on close()
+        return getattr(detector, "_graph", True) is not None
+
+    def _discard(self, detector: Any):
+        self.discarded += 1
+        try:
+            detector.close()
+        except Exception:
+            pass
+
+    def _take(self) -> Any:
+        while True:
+            with self._lock:
+                detector = self._idle.pop() if self._idle else None
+            if detector is None:
+                self.created += 1
+                return self._factory()
+            if self._healthy(detector):
+                return detector
+            self._discard(detector)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        if not self._slots.acquire(timeout=-1 if timeout is None else timeout):
+            print(f"[RPPG] face detector pool exhausted max_size={self.max_size} timeout={timeout}s")
+            raise TimeoutError("face_detector_pool_exhausted")
+        detector = None
+        try:
+            detector = self._take()
+            yield detector
+        except BaseException:
+            if detector is not None:
+                self._discard(detector)
+                detector = None
+            raise
+        finally:
+            if detector is not None:
+                if self._healthy(detector):
+                    with self._lock:
+                        self._idle.append(detector)
+                else:
+                    self._discard(detector)
+            self._slots.release()
+
+    def warm(self, n: int = 1):
+        """Create up to `n` idle detectors ahead of time."""
+        with self._lock:
+            missing = max(0, min(int(n), self.max_size) - len(self._idle))
+        for _ in range(missing):
+            with self.acquire():
+                pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for detector in idle:
+            try:
+                detector.close()
+            except Exception:
+                pass
+
+
+# Shared by every session of this process (each pool worker process gets its own).
+DETECTOR_POOL = FaceDetectorPool(max_size=os.cpu_count() or 1)
+
+
+class _RoiTracker:
+    """Face ROI state carried from frame to frame.
+
+    The detector only runs every `refresh_interval` frames (or while no ROI is known);
+    in between, the last ROI is reused.
+    """
+
+    def __init__(self, face_detector: Any, refresh_interval: int = _ROI_REFRESH_INTERVAL):
+        self.face_detector = face_detector
+        self.refresh_interval = int(max(1, refresh_interval))
+        self.roi: Optional[_Roi] = None
+        self.frame_index = 0
+
+    def mean_rgb(self, frame: Any) -> Optional[np.ndarray]:
+        """Return the mean RGB triple of the face ROI, or None when it can't be measured."""
+        i = self.frame_index
+        self.frame_index += 1
+
+        if frame is None:
+            return None
+
+        arr = np.asarray(frame)
+        if arr.ndim != 3 or arr.shape[2] != 3:
+            return None
+
+        h, w, _ = arr.shape
+
+        # Refresh ROI periodically
+        do_refresh = (i % self.refresh_interval) == 0 or self.roi is None
+        if do_refresh:
+            res = self.face_detector.process(arr)
+            new_roi: Optional[_Roi] = None
+            if res and res.detections:
+                det = res.detections[0]
+                bb = det.location_data.relative_bounding_box
+                x1 = int(bb.xmin * w)
+                y1 = int(bb.ymin * h)
+                x2 = int((bb.xmin + bb.width) * w)
+                y2 = int((bb.ymin + bb.height) * h)
+
+                # Small padding to include cheeks/forehead.
+                pad_x = int(0.05 * (x2 - x1))
+                pad_y = int(0.08 * (y2 - y1))
+                new_roi = _Roi(x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y).clamp_to(w, h)
+
+            if new_roi is not None and new_roi.area() > 0:
+                self.roi = new_roi
+
+        roi = self.roi
+        if roi is None or roi.area() <= 0:
+            return None
+
+        crop = arr[roi.y1 : roi.y2, roi.x1 : roi.x2, :]
+        if crop.size == 0:
+            return None
+
+        return np.mean(crop.reshape(-1, 3), axis=0).astype(np.float32)
+
+
+def _log_long_gaps(n: int):
+    if n > 0:
+        print(f"[RPPG] long_gaps={n} frames held (> {_MAX_INTERP_GAP} missing in a row)")
+
+
+def _valid_timestamps(timestamps_ms: Any, n: int) -> Optional[np.ndarray]:
+    """Timestamps as float64 (n,), or None when they can't be used (then frames are
+    assumed to be evenly spaced at the nominal fps)."""
+    if timestamps_ms is None:
+        return None
+    ts = np.asarray(timestamps_ms, dtype=np.float64).reshape(-1)
+    if ts.size != n or n < 2 or not np.isfinite(ts).all() or ts[-1] <= ts[0]:
+        return None
+    return ts
+
+
+def resample_uniform(sig: np.ndarray, timestamps_ms: np.ndarray, fps: float) -> np.ndarray:
+    """Linearly resample a (T, C) trace captured at `timestamps_ms` onto a uniform grid.
+
+    The grid starts at the first timestamp with a 1000/fps ms step. Samples whose
+    timestamp doesn't increase over the previous ones (duplicates, clock hiccups) are
+    dropped. Grid points that hit a capture time exactly take that sample as is.
+    """
+    ts = np.asarray(timestamps_ms, dtype=np.float64)
+    x = np.asarray(sig, dtype=np.float64)
+    keep = np.ones(ts.shape[0], dtype=bool)
+    keep[1:] = ts[1:] > np.maximum.accumulate(ts)[:-1]
+    ts, x = ts[keep], x[keep]
+
+    dt = 1000.0 / float(fps)
+    grid = ts[0] + np.arange(int((ts[-1] - ts[0]) / dt) + 2) * dt
+    grid = grid[grid <= ts[-1]]
+
+    idx = np.searchsorted(ts, grid, side="right") - 1
+    nxt = np.minimum(idx + 1, ts.shape[0] - 1)
+    exact = ts[idx] == grid
+    span = np.where(exact, 1.0, ts[nxt] - ts[idx])
+    frac = (grid - ts[idx]) / span
+    out = x[idx] + (x[nxt] - x[idx]) * frac[:, np.newaxis]
+    out[exact] = x[idx[exact]]
+    return out.astype(np.float32)
+
+
+def _pos_bvp(sig: np.ndarray, fps: float) -> np.ndarray:
+    X = np.transpose(sig[np.newaxis, :, :], (0, 2, 1)).astype(np.float32)
+    try:
+        return cpu_POS_fast(X, fps=float(fps)).squeeze().astype(np.float32)
+    except Exception:
+        return cpu_CHROM(X).squeeze().astype(np.float32)
+
+
+def _result_from_bvp(
+    result: Dict[str, Any],
+    sig: np.ndarray,
+    bvp: np.ndarray,
+    fps: float,
+    winsize: int,
+    stride: int,
+    face_detect_rate: float,
+    t_roi_ms: float,
+    t_pos_ms: float,
+) -> Dict[str, Any]:
+    """Band-pass the raw BVP and derive BPM/SNR/RR/HRV/stress from it.
+
+    `result` is the (poor) base result, returned with an explanatory message when a
+    quality gate fails. `t_pos_ms` is the POS time already spent by the caller.
+    """
+    t0 = time.perf_counter()
+    if bvp.ndim != 1 or bvp.size < int(max(3, winsize) * fps):
+        result["message"] = "Sinal BVP insuficiente."
+        result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
+        return result
+
+    bvp_f = _bandpass_bvp(bvp, fps=float(fps), min_hz=0.65, max_hz=4.0, order=4)
+    t_pos_ms += (time.perf_counter() - t0) * 1000.0
+    print(f"[RPPG] stage=pos elapsed={t_pos_ms:.0f} ms")
+
+    # --- Welch / BPM series / SNR ---
+    t0 = time.perf_counter()
+    bpm_series = _estimate_bpm_series(bvp_f, fps=float(fps), winsize=winsize, stride=stride)
+    if len(bpm_series) == 0:
+        result["message"] = "Não foi possível estimar BPM com estabilidade."
+        result["timings_ms"].update({"roi": float(t_roi_ms), "pos": float(t_pos_ms), "welch": 0.0})
+        return result
+
+    bpm_med = float(np.median(bpm_series))
+    mad_bpm = float(median_abs_deviation(np.array(bpm_series), scale=1.0, nan_policy="omit"))
+
+    freqs, psd = _welch_in_band(bvp_f, fps=float(fps), min_hz=0.65, max_hz=4.0)
+    f_peak_hz = bpm_med / 60.0
+    snr_db, snr_score = _snr_from_psd(freqs, psd, f_peak_hz=f_peak_hz)
+    t_welch_ms = (time.perf_counter() - t0) * 1000.0
+    print(f"[RPPG] stage=welch elapsed={t_welch_ms:.0f} ms")
+
+    result["snr_score"] = float(snr_score)
+    result["snr_db"] = float(snr_db)
+    if snr_score < 0.3:
+        result["message"] = "Sinal com baixa qualidade (SNR baixo). Repita em melhor iluminação e com menos movimento."
+        result["timings_ms"].update({"roi": float(t_roi_ms), "pos": float(t_pos_ms), "welch": float(t_welch_ms)})
+        return result
+
+    stability_score = float(max(0.0, min(1.0, 1.0 - (mad_bpm / 10.0))))
+    confidence = float(max(0.0, min(1.0, 0.6 * snr_score + 0.4 * stability_score)))
+    quality = _quality_from_confidence_and_mad(confidence=confidence, mad_bpm=mad_bpm)
+
+    msg = None
+    if quality == "poor":
+        msg = "Qualidade baixa. Repita com melhor iluminação e menos movimento."
+
+    # --- Mayla extra metrics (RR / HRV-SDNN / PRQ / Stress) ---
+    rr_bpm: Optional[float] = None
+    try:
+        # Prefer green channel; fallback to luminance if needed.
+        resp_src = sig[:, 1].astype(np.float32)
+        if not np.isfinite(resp_src).all():
+            resp_src = (0.299 * sig[:, 0] + 0.587 * sig[:, 1] + 0.114 * sig[:, 2]).astype(np.float32)
+
+        if resp_src.size >= int(10 * fps):
+            resp_src = resp_src - float(np.median(resp_src))
+            resp_f = _bandpass_1d(resp_src, fps=float(fps), min_hz=0.10, max_hz=0.50, order=4)
+
+            freqs_rb, psd_rb = _welch_in_band(resp_f, fps=float(fps), min_hz=0.10, max_hz=0.50)
+            if freqs_rb.size > 0:
+                if psd_rb.size > 0 and float(np.sum(psd_rb)) > 1e-10:
+                    peak_i = int(np.argmax(psd_rb))
+                    rr_hz = float(freqs_rb[peak_i])
+                    rr = rr_hz * 60.0
+                    if 6.0 <= rr <= 30.0:
+                        rr_bpm = float(rr)
+    except Exception:
+        rr_bpm = None
+
+    hrv_sdnn_ms: Optional[float] = None
+    try:
+        min_dist = max(1, int(round(float(fps) / 3.0)))
+        prom = float(np.std(bvp_f) * 0.25) if bvp_f.size > 0 else 0.0
+        peaks, _ = find_peaks(bvp_f, distance=min_dist, prominence=prom if prom > 0 else None)
+
+        if peaks is not None and int(peaks.size) >= 12:
+            ibis_s = np.diff(peaks.astype(np.float32)) / float(fps)
+            ibis_ms = ibis_s * 1000.0
+            if ibis_ms.size >= 2 and np.isfinite(ibis_ms).all():
+                sdnn = float(np.std(ibis_ms, ddof=1))
+                if 10.0 <= sdnn <= 200.0:
+                    hrv_sdnn_ms = sdnn
+    except Exception:
+        hrv_sdnn_ms = None
+
+    prq: Optional[float] = None
+    if rr_bpm is not None and rr_bpm > 0 and bpm_med is not None and np.isfinite(bpm_med):
+        prq = float(bpm_med) / float(rr_bpm)
+
+    # Stress: 1..30 (lower is better)
+    try:
+        if hrv_sdnn_ms is not None:
+            sdnn_norm = _clamp((float(hrv_sdnn_ms) - 20.0) / 100.0, 0.0, 1.0)
+            stability = _clamp(0.5 * float(snr_score) + 0.5 * sdnn_norm, 0.0, 1.0)
+        else:
+            stability = _clamp(float(snr_score), 0.0, 1.0)
+
+        stress_level = 5.0 + (1.0 - stability) * 22.0 + max(0.0, (float(bpm_med) - 75.0) * 0.25)
+        stress_level = _clamp(stress_level, 1.0, 30.0)
+    except Exception:
+        stress_level = None
+
+    return {
+        "bpm": float(bpm_med),
+        "confidence": confidence,
+        "quality": quality,
+        "snr_score": float(snr_score),
+        "snr_db": float(snr_db),
+        "face_detect_rate": float(face_detect_rate),
+        "bpm_series": [float(x) for x in bpm_series],
+        "message": msg,
+        "rr_bpm": rr_bpm,
+        "prq": prq,
+        "hrv_sdnn_ms": hrv_sdnn_ms,
+        "stress_level": stress_level,
+        "timings_ms": {
+            "roi": float(t_roi_ms),
+            "pos": float(t_pos_ms),
+            "welch": float(t_welch_ms),
+            "total": 0.0,  # filled in by the caller
+        },
+    }
+
+
+def _result_from_trace(
+    result: Dict[str, Any],
+    sig: np.ndarray,
+    fps: float,
+    winsize: int,
+    stride: int,
+    face_detect_rate: float,
+    t_roi_ms: float,
+    timestamps_ms: Any = None,
+) -> Dict[str, Any]:
+    """Gate on face detection, fill gaps in the (T, 3) RGB trace (in place) and run POS.
+
+    With capture timestamps, the filled trace is first resampled onto a uniform `fps` grid.
+    """
+    result["face_detect_rate"] = float(face_detect_rate)
+
+    if face_detect_rate < 0.7:
+        result["message"] = "Face pouco detectada. Repita com o rosto centralizado e estável."
+        result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
+        return result
+
+    if np.isnan(sig).any():
+        sig, long_gaps = fill_gaps(sig, max_gap=_MAX_INTERP_GAP)
+        if np.isnan(sig).any():
+            result["message"] = "Sinal RGB inválido."
+            result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
+            return result
+        _log_long_gaps(int(long_gaps.sum()))
+
+    # --- POS extraction (pyVHR) ---
+    t0 = time.perf_counter()
+    ts = _valid_timestamps(timestamps_ms, sig.shape[0])
+    if ts is not None:
+        sig = resample_uniform(sig, ts, fps=float(fps))
+    bvp = _pos_bvp(sig, fps=float(fps))
+    t_pos_ms = (time.perf_counter() - t0) * 1000.0
+
+    return _result_from_bvp(
+        result,
+        sig=sig,
+        bvp=bvp,
+        fps=float(fps),
+        winsize=winsize,
+        stride=stride,
+        face_detect_rate=face_detect_rate,
+        t_roi_ms=t_roi_ms,
+        t_pos_ms=t_pos_ms,
+    )
+
+
+def _set_total(out: Any, total_ms: float):
+    try:
+        if isinstance(out, dict) and isinstance(out.get("timings_ms"), dict):
+            out["timings_ms"]["total"] = float(total_ms)
+    except Exception:
+        pass
+    print(f"[RPPG] stage=total elapsed={total_ms:.0f} ms")
+
+
+def process_rppg_signal(
+    frames: list,
+    fps: float,
+    winsize: int = 5,
+    stride: int = 1,
+    face_detector: Any = None,
+    timestamps_ms: Optional[List[float]] = None,
+) -> dict:
+    """Batch rPPG estimation over a whole capture (list of RGB frames).
+
+    `face_detector` lets the caller pass its own MediaPipe detector; when omitted, one
+    is borrowed from `DETECTOR_POOL` for the ROI stage. `timestamps_ms` are the capture
+    times of `frames`; when given, the RGB trace is resampled to a uniform `fps` grid
+    before POS instead of assuming frames arrived exactly at `fps`.
+    """
+    base_result = _empty_result()
     out: Dict[str, Any] = base_result
 
     t_total0 = time.perf_counter()
     t_roi_ms = 0.0
-    t_pos_ms = 0.0
-    t_welch_ms = 0.0
 
     try:
         if not isinstance(frames, list) or len(frames) == 0:
@@ -196,239 +620,465 @@ def process_rppg_signal(
 
         # --- ROI detection + RGB mean extraction ---
         t0 = time.perf_counter()
-        mp_face = mp.solutions.face_detection
-        face_detector = mp_face.FaceDetection(model_selection=0, min_detection_confidence=0.5)
-
-        roi: Optional[_Roi] = None
         face_valid = 0
         rgb_means: List[np.ndarray] = []
 
-        for i, frame in enumerate(frames):
-            if frame is None:
-                rgb_means.append(np.array([np.nan, np.nan, np.nan], dtype=np.float32))
-                continue
-
-            arr = np.asarray(frame)
-            if arr.ndim != 3 or arr.shape[2] != 3:
-                rgb_means.append(np.array([np.nan, np.nan, np.nan], dtype=np.float32))
-                continue
-
-            h, w, _ = arr.shape
-
-            # Refresh ROI periodically
-            do_refresh = (i % _ROI_REFRESH_INTERVAL) == 0 or roi is None
-            if do_refresh:
-                res = face_detector.process(arr)
-                new_roi: Optional[_Roi] = None
-                if res and res.detections:
-                    det = res.detections[0]
-                    bb = det.location_data.relative_bounding_box
-                    x1 = int(bb.xmin * w)
-                    y1 = int(bb.ymin * h)
-                    x2 = int((bb.xmin + bb.width) * w)
-                    y2 = int((bb.ymin + bb.height) * h)
-
-                    # Small padding to include cheeks/forehead.
-                    pad_x = int(0.05 * (x2 - x1))
-                    pad_y = int(0.08 * (y2 - y1))
-                    new_roi = _Roi(x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y).clamp_to(w, h)
-
-                if new_roi is not None and new_roi.area() > 0:
-                    roi = new_roi
-
-            if roi is None or roi.area() <= 0:
-                rgb_means.append(np.array([np.nan, np.nan, np.nan], dtype=np.float32))
-                continue
-
-            crop = arr[roi.y1 : roi.y2, roi.x1 : roi.x2, :]
-            if crop.size == 0:
-                rgb_means.append(np.array([np.nan, np.nan, np.nan], dtype=np.float32))
-                continue
-
-            mean_rgb = np.mean(crop.reshape(-1, 3), axis=0).astype(np.float32)
-            rgb_means.append(mean_rgb)
-            face_valid += 1
-
-        face_detector.close()
+        detector_ctx = (
+            nullcontext(face_detector) if face_detector is not None else DETECTOR_POOL.acquire(timeout=_DETECTOR_TIMEOUT_S)
+        )
+        with detector_ctx as detector:
+            tracker = _RoiTracker(detector, refresh_interval=_ROI_REFRESH_INTERVAL)
+            for frame in frames:
+                mean_rgb = tracker.mean_rgb(frame)
+                if mean_rgb is None:
+                    rgb_means.append(np.array([np.nan, np.nan, np.nan], dtype=np.float32))
+                    continue
+                rgb_means.append(mean_rgb)
+                face_valid += 1
         t_roi_ms = (time.perf_counter() - t0) * 1000.0
         print(f"[RPPG] stage=roi elapsed={t_roi_ms:.0f} ms")
 
         face_detect_rate = face_valid / max(1, len(frames))
-        base_result["face_detect_rate"] = float(face_detect_rate)
+        out = _result_from_trace(
+            base_result,
+            sig=np.vstack(rgb_means),  # (T, 3)
+            fps=float(fps),
+            winsize=winsize,
+            stride=stride,
+            face_detect_rate=face_detect_rate,
+            t_roi_ms=t_roi_ms,
+            timestamps_ms=timestamps_ms,
+        )
+        return out
 
-        if face_detect_rate < 0.7:
-            base_result["message"] = "Face pouco detectada. Repita com o rosto centralizado e estável."
-            base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
-            return base_result
+    except Exception as e:
+        base_result["message"] = f"Falha no processamento rPPG: {type(e).__name__}"
+        return base_result
 
-        sig = np.vstack(rgb_means)  # (T, 3)
-        if np.isnan(sig).any():
-            # forward fill then back fill
-            for c in range(3):
-                col = sig[:, c]
-                mask = np.isfinite(col)
-                if not np.any(mask):
-                    base_result["message"] = "Sinal RGB inválido."
-                    base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
-                    return base_result
-                last = col[np.argmax(mask)]
-                for k in range(col.shape[0]):
-                    if np.isfinite(col[k]):
-                        last = col[k]
-                    else:
-                        col[k] = last
-                last = col[np.argmax(mask)]
-                for k in range(col.shape[0] - 1, -1, -1):
-                    if np.isfinite(col[k]):
-                        last = col[k]
-                    else:
-                        col[k] = last
-                sig[:, c] = col
-
-        # --- POS extraction (pyVHR) ---
-        t0 = time.perf_counter()
-        X = np.transpose(sig[np.newaxis, :, :], (0, 2, 1)).astype(np.float32)
-        try:
-            bvp = cpu_POS(X, fps=float(fps)).squeeze().astype(np.float32)
-        except Exception:
-            bvp = cpu_CHROM(X).squeeze().astype(np.float32)
+    finally:
+        _set_total(out, (time.perf_counter() - t_total0) * 1000.0)
 
-        if bvp.ndim != 1 or bvp.size < int(max(3, winsize) * fps):
-            base_result["message"] = "Sinal BVP insuficiente."
-            base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
-            return base_result
 
-        bvp_f = _bandpass_bvp(bvp, fps=float(fps), min_hz=0.65, max_hz=4.0, order=4)
-        t_pos_ms = (time.perf_counter() - t0) * 1000.0
-        print(f"[RPPG] stage=pos elapsed={t_pos_ms:.0f} ms")
+def process_rgb_trace(
+    rgb: np.ndarray,
+    fps: float,
+    winsize: int = 5,
+    stride: int = 1,
+    face_detect_rate: Optional[float] = None,
+    t_roi_ms: float = 0.0,
+    timestamps_ms: Optional[List[float]] = None,
+) -> dict:
+    """Same as `process_rppg_signal`, starting from per-frame ROI means already computed.
 
-        # --- Welch / BPM series / SNR ---
-        t0 = time.perf_counter()
-        bpm_series = _estimate_bpm_series(bvp_f, fps=float(fps), winsize=winsize, stride=stride)
-        if len(bpm_series) == 0:
-            base_result["message"] = "Não foi possível estimar BPM com estabilidade."
-            base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": float(t_pos_ms), "welch": 0.0})
+    `rgb` is (T, 3) with NaN rows where no face was measured. `face_detect_rate` defaults
+    to the share of finite rows; `t_roi_ms` is reported as the ROI stage time.
+    """
+    base_result = _empty_result()
+    out: Dict[str, Any] = base_result
+
+    t_total0 = time.perf_counter()
+    try:
+        sig = np.array(rgb, dtype=np.float32).reshape(-1, 3)
+        if sig.shape[0] == 0:
+            base_result["message"] = "Sem frames para processar."
             return base_result
 
-        bpm_med = float(np.median(bpm_series))
-        mad_bpm = float(median_abs_deviation(np.array(bpm_series), scale=1.0, nan_policy="omit"))
-
-        nperseg = min(256, bvp_f.size)
-        noverlap = int(0.8 * nperseg)
-        freqs, psd = welch(bvp_f, fs=float(fps), nperseg=nperseg, noverlap=noverlap, nfft=2048)
-        f_peak_hz = bpm_med / 60.0
-        snr_db, snr_score = _snr_from_psd(freqs, psd, f_peak_hz=f_peak_hz)
-        t_welch_ms = (time.perf_counter() - t0) * 1000.0
-        print(f"[RPPG] stage=welch elapsed={t_welch_ms:.0f} ms")
-
-        base_result["snr_score"] = float(snr_score)
-        base_result["snr_db"] = float(snr_db)
-        if snr_score < 0.3:
-            base_result["message"] = "Sinal com baixa qualidade (SNR baixo). Repita em melhor iluminação e com menos movimento."
-            base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": float(t_pos_ms), "welch": float(t_welch_ms)})
+        if fps is None or not np.isfinite(fps) or fps <= 0:
+            base_result["message"] = "FPS inválido."
             return base_result
 
-        stability_score = float(max(0.0, min(1.0, 1.0 - (mad_bpm / 10.0))))
-        confidence = float(max(0.0, min(1.0, 0.6 * snr_score + 0.4 * stability_score)))
-        quality = _quality_from_confidence_and_mad(confidence=confidence, mad_bpm=mad_bpm)
+        if face_detect_rate is None:
+            face_detect_rate = float(np.mean(np.isfinite(sig).all(axis=1)))
+
+        out = _result_from_trace(
+            base_result,
+            sig=sig,
+            fps=float(fps),
+            winsize=winsize,
+            stride=stride,
+            face_detect_rate=float(face_detect_rate),
+            t_roi_ms=float(t_roi_ms),
+            timestamps_ms=timestamps_ms,
+        )
+        return out
+
+    except Exception as e:
+        base_result["message"] = f"Falha no processamento rPPG: {type(e).__name__}"
+        return base_result
+
+    finally:
+        _set_total(out, (time.perf_counter() - t_total0) * 1000.0)
+
+
+class RingBuffer:
+    """Preallocated, fixed-capacity per-sample store (rows of `columns` values).
 
-        msg = None
-        if quality == "poor":
-            msg = "Qualidade baixa. Repita com melhor iluminação e menos movimento."
+    Appends write in place; once `capacity` rows are held the oldest ones are
+    overwritten. Reads return rows in chronological order, as views while the buffer
+    hasn't wrapped.
+    """
+
+    def __init__(self, capacity: int, columns: Optional[int] = 3, dtype: Any = np.float32, fill: float = 0.0):
+        self.capacity = int(max(1, capacity))
+        shape = (self.capacity,) if columns is None else (self.capacity, int(columns))
+        self._buf = np.full(shape, fill, dtype=dtype)
+        self._count = 0  # total rows ever appended
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._buf.nbytes)
+
+    def append(self, row: Any):
+        self._buf[self._count % self.capacity] = row
+        self._count += 1
+
+    def _indices(self, k: int) -> Tuple[int, int]:
+        # Slice bounds of the last k rows; a negative start means they wrap around.
+        k = min(int(k), len(self))
+        end = (self._count - 1) % self.capacity + 1 if self._count > 0 else 0
+        return end - k, end
+
+    def last(self, k: int) -> np.ndarray:
+        """The last `k` rows, oldest first."""
+        start, end = self._indices(k)
+        if start >= 0:
+            return self._buf[start:end]
+        return np.concatenate([self._buf[start:], self._buf[:end]])
+
+    def add_last(self, values: np.ndarray):
+        """In-place `+=` on the last len(values) rows."""
+        start, end = self._indices(len(values))
+        if start >= 0:
+            self._buf[start:end] += values
+        else:
+            self._buf[start:] += values[: -start]
+            self._buf[:end] += values[-start:]
+
+    def view(self) -> np.ndarray:
+        return self.last(len(self))
+
+
+class RppgStream:
+    """Incremental counterpart of `process_rppg_signal`, fed chunk by chunk during capture.
+
+    ROI tracking, the per-frame RGB means and the POS overlap-add buffer are updated as
+    frames arrive, so `finalize()` only band-passes the accumulated BVP and runs the
+    spectral stage. For the same frames the result matches the batch path.
+
+    Frames are not retained: the stream only keeps `capacity` rows of RGB means, ROI
+    boxes and BVP in preallocated ring buffers (a few KB per session).
+
+    When frames come with capture timestamps, gap-filled samples are resampled onto the
+    uniform `fps` grid as they arrive (same interpolation as `resample_uniform`), so POS
+    sees evenly spaced samples even if the browser dropped or delayed frames.
+    """
 
-        # --- Mayla extra metrics (RR / HRV-SDNN / PRQ / Stress) ---
-        rr_bpm: Optional[float] = None
+    def __init__(
+        self,
+        fps: float,
+        roi_refresh_interval: int = _ROI_REFRESH_INTERVAL,
+        winsize: int = 5,
+        stride: int = 1,
+        face_detector: Any = None,
+        capacity: int = 1024,
+    ):
+        self.fps = float(fps)
+        self.winsize = winsize
+        self.stride = stride
+
+        # Without an explicit detector, one is borrowed from DETECTOR_POOL per push, so
+        # idle sessions don't pin a detector between chunks.
+        self._face_detector = face_detector
+        self._tracker = _RoiTracker(None, refresh_interval=roi_refresh_interval)
+
+        self.frames_seen = 0
+        self.face_valid = 0
+        self.t_roi_ms = 0.0
+        self.t_pos_ms = 0.0
+
+        # POS window length, as in pyVHR's cpu_POS
+        self._pos_w = int(1.6 * self.fps)
+        self._pos_failed = False
+
+        # Per frame: raw ROI mean (NaN without face) and ROI box (-1 without ROI)
+        self._means = RingBuffer(capacity, columns=3, dtype=np.float32, fill=np.nan)
+        self._rois = RingBuffer(capacity, columns=4, dtype=np.int16, fill=-1)
+        self._ts = RingBuffer(capacity, columns=None, dtype=np.float64, fill=np.nan)
+
+        # Timestamp mode is decided by the first push; later pushes without timestamps
+        # get nominal ones (previous + 1000/fps).
+        self._timed: Optional[bool] = None
+        self._t_last_frame: Optional[float] = None
+        self._t0: Optional[float] = None
+        self._t_prev: Optional[float] = None
+        self._x_prev: Optional[np.ndarray] = None
+        self._grid_k = 0
+
+        # Per sample: gap-filled RGB trace (T, 3) and the overlap-added BVP (T,)
+        self._sig = RingBuffer(capacity, columns=3, dtype=np.float32)
+        self._H = RingBuffer(capacity, columns=None, dtype=np.float64)
+        self._last: Optional[np.ndarray] = None
+        self._leading_missing: List[Optional[float]] = []
+        # Missing frames after the last valid one, held back until the gap is known to be
+        # short (interpolated) or long (held at the last mean), as in fill_gaps.
+        self._gap: List[Optional[float]] = []
+        self._gap_long = False
+        self.long_gap_frames = 0
+
+        # Live BPM: Welch spectrum of the last `winsize` seconds of settled POS output,
+        # updated per sample by a sliding DFT over the HR band.
+        self._live = SlidingWelch(self.fps, max(2, int(round(winsize * self.fps))), minHz=0.65, maxHz=4.0, nfft=2048)
+
+    def _frame_times(self, n: int, timestamps_ms: Optional[List[float]]) -> List[Optional[float]]:
+        if self._timed is None:
+            self._timed = timestamps_ms is not None
+        if not self._timed:
+            return [None] * n
+
+        if timestamps_ms is not None and len(timestamps_ms) == n:
+            times = [float(t) for t in timestamps_ms]
+        else:
+            step = 1000.0 / self.fps
+            start = self._t_last_frame if self._t_last_frame is not None else -step
+            times = [start + step * (i + 1) for i in range(n)]
+        if times:
+            self._t_last_frame = times[-1]
+        return times
+
+    def push_frames(self, frames: list, timestamps_ms: Optional[List[float]] = None) -> int:
+        """Run ROI/RGB-mean extraction and POS on new frames. Returns how many had a face.
+
+        `timestamps_ms` are the frames' capture times (client clock, ms). If the ROI stage
+        raises, nothing of the chunk is stored: the stream is left as it was before the call.
+        """
+        prev_state = (self._timed, self._t_last_frame, self._tracker.frame_index, self._tracker.roi)
+        times = self._frame_times(len(frames), timestamps_ms)
+        valid = 0
+        t0 = time.perf_counter()
+        means: List[Optional[np.ndarray]] = []
+        rois: List[Any] = []
         try:
-            # Prefer green channel; fallback to luminance if needed.
-            resp_src = sig[:, 1].astype(np.float32)
-            if not np.isfinite(resp_src).all():
-                resp_src = (0.299 * sig[:, 0] + 0.587 * sig[:, 1] + 0.114 * sig[:, 2]).astype(np.float32)
-
-            if resp_src.size >= int(10 * fps):
-                resp_src = resp_src - float(np.median(resp_src))
-                resp_f = _bandpass_1d(resp_src, fps=float(fps), min_hz=0.10, max_hz=0.50, order=4)
-
-                nperseg_r = min(256, resp_f.size)
-                noverlap_r = int(0.8 * nperseg_r)
-                freqs_r, psd_r = welch(resp_f, fs=float(fps), nperseg=nperseg_r, noverlap=noverlap_r, nfft=2048)
-
-                band_r = (freqs_r >= 0.10) & (freqs_r <= 0.50)
-                if np.any(band_r):
-                    freqs_rb = freqs_r[band_r]
-                    psd_rb = psd_r[band_r]
-                    if psd_rb.size > 0 and float(np.sum(psd_rb)) > 1e-10:
-                        peak_i = int(np.argmax(psd_rb))
-                        rr_hz = float(freqs_rb[peak_i])
-                        rr = rr_hz * 60.0
-                        if 6.0 <= rr <= 30.0:
-                            rr_bpm = float(rr)
-        except Exception:
-            rr_bpm = None
+            detector_ctx = (
+                nullcontext(self._face_detector) if self._face_detector is not None else DETECTOR_POOL.acquire(timeout=_DETECTOR_TIMEOUT_S)
+            )
+            with detector_ctx as detector:
+                self._tracker.face_detector = detector
+                try:
+                    for frame in frames:
+                        mean_rgb = self._tracker.mean_rgb(frame)
+                        means.append(mean_rgb)
+                        roi = self._tracker.roi
+                        rois.append(-1 if mean_rgb is None else (roi.x1, roi.y1, roi.x2, roi.y2))
+                finally:
+                    self._tracker.face_detector = None
+        except BaseException:
+            self._timed, self._t_last_frame, self._tracker.frame_index, self._tracker.roi = prev_state
+            raise
+        finally:
+            self.t_roi_ms += (time.perf_counter() - t0) * 1000.0
+
+        for mean_rgb, roi, t in zip(means, rois, times):
+            self._ts.append(np.nan if t is None else t)
+            self._means.append(np.nan if mean_rgb is None else mean_rgb)
+            self._rois.append(roi)
+            if mean_rgb is not None:
+                valid += 1
 
-        hrv_sdnn_ms: Optional[float] = None
+        t0 = time.perf_counter()
+        for mean_rgb, t in zip(means, times):
+            self._push_mean(mean_rgb, t)
+        self.t_pos_ms += (time.perf_counter() - t0) * 1000.0
+
+        self.frames_seen += len(frames)
+        self.face_valid += valid
+        return valid
+
+    def _push_mean(self, mean_rgb: Optional[np.ndarray], t: Optional[float]):
+        # Incremental fill_gaps: frames before the first detection are back-filled once it
+        # shows up; later gaps wait for the next valid mean (interpolated) until they grow
+        # past _MAX_INTERP_GAP, after which they repeat the last valid mean.
+        if mean_rgb is None:
+            if self._last is None:
+                self._leading_missing.append(t)
+                if len(self._leading_missing) == _MAX_INTERP_GAP + 1:
+                    self.long_gap_frames += _MAX_INTERP_GAP + 1
+                elif len(self._leading_missing) > _MAX_INTERP_GAP + 1:
+                    self.long_gap_frames += 1
+                return
+            if self._gap_long:
+                self.long_gap_frames += 1
+                self._resample(self._last, t)
+                return
+            self._gap.append(t)
+            if len(self._gap) > _MAX_INTERP_GAP:
+                self._flush_gap()
+            return
+
+        for t_missing in self._leading_missing:
+            self._resample(mean_rgb, t_missing)
+        self._leading_missing = []
+        if self._gap:
+            lo = self._last.astype(np.float64)
+            hi = mean_rgb.astype(np.float64)
+            span = len(self._gap) + 1
+            for k, t_missing in enumerate(self._gap, start=1):
+                self._resample((lo + (hi - lo) * (k / span)).astype(np.float32), t_missing)
+            self._gap = []
+        self._gap_long = False
+        self._last = mean_rgb
+        self._resample(mean_rgb, t)
+
+    def _flush_gap(self):
+        # The pending gap is long (or the capture ended): hold the last valid mean.
+        if len(self._gap) > _MAX_INTERP_GAP:
+            self.long_gap_frames += len(self._gap)
+            self._gap_long = True
+        for t_missing in self._gap:
+            self._resample(self._last, t_missing)
+        self._gap = []
+
+    def _resample(self, rgb: np.ndarray, t: Optional[float]):
+        # Incremental version of resample_uniform: emit every grid point up to t.
+        if t is None:
+            self._append_sample(rgb)
+            return
+
+        x = rgb.astype(np.float64)
+        if self._t_prev is None:
+            self._t0 = t
+        elif t <= self._t_prev:
+            return
+
+        dt = 1000.0 / self.fps
+        while True:
+            g = self._t0 + self._grid_k * dt
+            if g > t:
+                break
+            if g == t:
+                self._append_sample(x.astype(np.float32))
+            else:
+                frac = (g - self._t_prev) / (t - self._t_prev)
+                self._append_sample((self._x_prev + (x - self._x_prev) * frac).astype(np.float32))
+            self._grid_k += 1
+        self._t_prev, self._x_prev = t, x
+
+    def _append_sample(self, rgb: np.ndarray):
+        self._sig.append(rgb)
+        self._H.append(0.0)
+
+        # POS overlap-add step for the window ending at the new sample (see cpu_POS):
+        # running POS on the last w+1 samples yields exactly that window's contribution.
+        w = self._pos_w
+        if self._pos_failed or w <= 0 or len(self._sig) <= w:
+            return
         try:
-            min_dist = max(1, int(round(float(fps) / 3.0)))
-            prom = float(np.std(bvp_f) * 0.25) if bvp_f.size > 0 else 0.0
-            peaks, _ = find_peaks(bvp_f, distance=min_dist, prominence=prom if prom > 0 else None)
-
-            if peaks is not None and int(peaks.size) >= 12:
-                ibis_s = np.diff(peaks.astype(np.float32)) / float(fps)
-                ibis_ms = ibis_s * 1000.0
-                if ibis_ms.size >= 2 and np.isfinite(ibis_ms).all():
-                    sdnn = float(np.std(ibis_ms, ddof=1))
-                    if 10.0 <= sdnn <= 200.0:
-                        hrv_sdnn_ms = sdnn
+            X = np.transpose(self._sig.last(w + 1)[np.newaxis, :, :], (0, 2, 1))
+            Hnm = cpu_POS_fast(X, fps=self.fps)[0, 1:]
+            self._H.add_last(Hnm)
+            # No later window overlaps the first sample of this one: it is final.
+            self._live.update(self._H.last(w + 1)[:1])
         except Exception:
-            hrv_sdnn_ms = None
+            # finalize() falls back to the batch POS/CHROM path
+            self._pos_failed = True
+
+    def live_bpm(self) -> Optional[float]:
+        """BPM of the last `winsize` seconds of BVP settled so far (None until there are enough).
 
-        prq: Optional[float] = None
-        if rr_bpm is not None and rr_bpm > 0 and bpm_med is not None and np.isfinite(bpm_med):
-            prq = float(bpm_med) / float(rr_bpm)
+        A cheap preview while frames are still coming: the BVP isn't band-passed yet and the
+        newest POS window is left out, so it may differ slightly from `finalize()`.
+        """
+        if self._pos_failed or not self._live.ready:
+            return None
+        _, psd = self._live.spectrum()
+        if psd.size == 0 or float(np.sum(psd)) <= 0:
+            return None
+        bpm = float(self._live.Pfreqs[int(np.argmax(psd[0]))])
+        return bpm if 40.0 <= bpm <= 200.0 else None
 
-        # Stress: 1..30 (lower is better)
+    def finalize(self) -> dict:
+        """Emit the result for everything pushed so far (same dict as `process_rppg_signal`)."""
+        base_result = _empty_result()
+        out: Dict[str, Any] = base_result
+
+        t_total0 = time.perf_counter()
+        t_roi_ms = self.t_roi_ms
         try:
-            if hrv_sdnn_ms is not None:
-                sdnn_norm = _clamp((float(hrv_sdnn_ms) - 20.0) / 100.0, 0.0, 1.0)
-                stability = _clamp(0.5 * float(snr_score) + 0.5 * sdnn_norm, 0.0, 1.0)
+            if self.frames_seen == 0:
+                base_result["message"] = "Sem frames para processar."
+                return base_result
+
+            if not np.isfinite(self.fps) or self.fps <= 0:
+                base_result["message"] = "FPS inválido."
+                return base_result
+
+            print(f"[RPPG] stage=roi elapsed={t_roi_ms:.0f} ms")
+
+            face_detect_rate = self.face_valid / max(1, self.frames_seen)
+            base_result["face_detect_rate"] = float(face_detect_rate)
+
+            if face_detect_rate < 0.7:
+                base_result["message"] = "Face pouco detectada. Repita com o rosto centralizado e estável."
+                base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
+                return base_result
+
+            # Trailing missing frames have no right neighbour: hold the last mean.
+            self._flush_gap()
+            _log_long_gaps(self.long_gap_frames)
+
+            if len(self._sig) == 0:
+                base_result["message"] = "Sinal RGB inválido."
+                base_result["timings_ms"].update({"roi": float(t_roi_ms), "pos": 0.0, "welch": 0.0})
+                return base_result
+
+            sig = self._sig.view()
+            t_pos_ms = self.t_pos_ms
+            if self._pos_failed:
+                t0 = time.perf_counter()
+                bvp = _pos_bvp(sig, fps=self.fps)
+                t_pos_ms += (time.perf_counter() - t0) * 1000.0
             else:
-                stability = _clamp(float(snr_score), 0.0, 1.0)
+                bvp = self._H.view().astype(np.float32)
+
+            out = _result_from_bvp(
+                base_result,
+                sig=sig,
+                bvp=bvp,
+                fps=self.fps,
+                winsize=self.winsize,
+                stride=self.stride,
+                face_detect_rate=face_detect_rate,
+                t_roi_ms=t_roi_ms,
+                t_pos_ms=t_pos_ms,
+            )
+            return out
+
+        except Exception as e:
+            base_result["message"] = f"Falha no processamento rPPG: {type(e).__name__}"
+            return base_result
 
-            stress_level = 5.0 + (1.0 - stability) * 22.0 + max(0.0, (float(bpm_med) - 75.0) * 0.25)
-            stress_level = _clamp(stress_level, 1.0, 30.0)
-        except Exception:
-            stress_level = None
-
-        out = {
-            "bpm": float(bpm_med),
-            "confidence": confidence,
-            "quality": quality,
-            "snr_score": float(snr_score),
-            "snr_db": float(snr_db),
-            "face_detect_rate": float(face_detect_rate),
-            "bpm_series": [float(x) for x in bpm_series],
-            "message": msg,
-            "rr_bpm": rr_bpm,
-            "prq": prq,
-            "hrv_sdnn_ms": hrv_sdnn_ms,
-            "stress_level": stress_level,
-            "timings_ms": {
-                "roi": float(t_roi_ms),
-                "pos": float(t_pos_ms),
-                "welch": float(t_welch_ms),
-                "total": 0.0,  # filled in finally
-            },
-        }
-        return out
+        finally:
+            _set_total(out, (time.perf_counter() - t_total0) * 1000.0)
 
-    except Exception as e:
-        base_result["message"] = f"Falha no processamento rPPG: {type(e).__name__}"
-        return base_result
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stream buffers."""
+        return sum(b.nbytes for b in (self._means, self._rois, self._ts, self._sig, self._H))
 
-    finally:
-        total_ms = (time.perf_counter() - t_total0) * 1000.0
-        try:
-            if isinstance(out, dict) and isinstance(out.get("timings_ms"), dict):
-                out["timings_ms"]["total"] = float(total_ms)
-        except Exception:
-            pass
-        print(f"[RPPG] stage=total elapsed={total_ms:.0f} ms")
\ No newline at end of file
+    def rgb_trace(self) -> np.ndarray:
+        """Per-frame ROI mean RGB (T, 3) float32, NaN where no face was measured."""
+        return self._means.view()
+
+    def timestamps(self) -> Optional[np.ndarray]:
+        """Per-frame capture times (T,) in ms, or None when frames came without them."""
+        return self._ts.view() if self._timed else None
+
+    def roi_track(self) -> np.ndarray:
+        """Per-frame ROI boxes (T, 4) int16 as x1, y1, x2, y2; -1 where there was none."""
+        return self._rois.view()
+
+    def close(self):
+        # Detectors are pooled (or owned by the caller); only drop the reference.
+        self._face_detector = None
@@ -0,0 +1,222 @@
+"""Process pool for rPPG finalization.
+
+`asyncio.to_thread` keeps finalize off the event loop but not off the GIL: MediaPipe,
+NumPy and SciPy work still competes with every other session's ingest. With
+`DEFAULTS.finalize_workers > 0`, batch-mode finalization (sessions without a streaming
+engine) runs in worker processes instead; streamed sessions already did the heavy work
+at ingest and finalize in-process. Each worker imports `pyvhr_adapter` once and warms
+its FaceDetection pool; frames (uint8 stack) are handed over through shared memory, so
+only a small descriptor gets pickled. A worker that doesn't answer within
+`worker_timeout_s()` (a fraction of the WS-side `DEFAULTS.finalize_timeout_s`) makes the
+call raise `TimeoutError`; its pool is retired so new work goes to a fresh one, and the
+hung worker is killed once the retired pool's other tasks have finished.
+"""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..config import DEFAULTS
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None  # type: ignore
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+# Tasks in flight per pool (keyed by id), so a retired pool is only killed once they're done
+_INFLIGHT: Dict[int, Set[Future]] = {}
+
+# Share of DEFAULTS.finalize_timeout_s a worker gets; the rest covers stacking frames,
+# shared-memory copies and building the result before the WS gives up.
+WORKER_TIMEOUT_FRACTION = 0.8
+
+
+def _init_worker():
+    from . import pyvhr_adapter
+
+    # One task at a time per worker: a single warm detector is all it needs.
+    pyvhr_adapter.DETECTOR_POOL.warm(1)
+
+
+def _attach(name: str, shape: Tuple[int, ...], dtype: str) -> Tuple[shared_memory.SharedMemory, Any]:
+    # The parent owns (and unlinks) the segment. Spawned workers share its resource
+    # tracker, so attaching here doesn't register a second owner.
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _run_frames(
+    name: str,
+    shape: Tuple[int, ...],
+    fps: float,
+    winsize: int,
+    stride: int,
+    roi_refresh_interval: int,
+    timestamps_ms: Optional[List[float]],
+) -> dict:
+    from . import pyvhr_adapter
+
+    shm, stack = _attach(name, shape, "uint8")
+    try:
+        pyvhr_adapter._ROI_REFRESH_INTERVAL = int(max(1, roi_refresh_interval))
+        return pyvhr_adapter.process_rppg_signal(
+            frames=list(stack),
+            fps=fps,
+            winsize=winsize,
+            stride=stride,
+            timestamps_ms=timestamps_ms,
+        )
+    finally:
+        del stack
+        shm.close()
+
+
+def worker_timeout_s() -> float:
+    """Seconds to wait for a finalize worker; always below the WS finalize timeout."""
+    return float(DEFAULTS.finalize_timeout_s) * WORKER_TIMEOUT_FRACTION
+
+
+def enabled() -> bool:
+    return int(DEFAULTS.finalize_workers) > 0 and np is not None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Lazily create the shared worker pool (spawned, so workers don't inherit threads)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=int(max(1, DEFAULTS.finalize_workers)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _POOL
+
+
+def _noop() -> None:
+    return None
+
+
+def warm_up():
+    """Start the workers now (imports + model load) instead of on the first finalize."""
+    if DEFAULTS.mock_mode or not enabled():
+        return
+    pool = get_pool()
+    for _ in range(int(max(1, DEFAULTS.finalize_workers))):
+        pool.submit(_noop)
+
+
+def shutdown_pool(kill: bool = False):
+    """Drop the shared pool; with `kill`, also terminate its workers (e.g. at exit)."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        procs = list((getattr(pool, "_processes", None) or {}).values()) if kill else []
+        pool.shutdown(wait=False, cancel_futures=True)
+        for proc in procs:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+
+
+def _reap(pool: ProcessPoolExecutor, procs: list, others: List[Future]):
+    # Killing a worker breaks its executor (every pending future fails), so let the
+    # retired pool's other tasks finish first; only the hung worker is left by then.
+    wait_futures(others, timeout=worker_timeout_s())
+    for proc in procs:
+        try:
+            if proc.is_alive():
+                proc.terminate()
+        except Exception:
+            pass
+    with _POOL_LOCK:
+        _INFLIGHT.pop(id(pool), None)
+
+
+def _retire_pool(pool: ProcessPoolExecutor, hung: Future):
+    """Route new work to a fresh pool and kill `pool`'s hung worker without failing other tasks."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+        others = [f for f in _INFLIGHT.get(id(pool), ()) if f is not hung]
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    # Queued tasks are cancelled (their callers resubmit to the new pool); running ones finish.
+    pool.shutdown(wait=False, cancel_futures=True)
+    threading.Thread(target=_reap, args=(pool, procs, others), name="rppg-pool-reaper", daemon=True).start()
+
+
+atexit.register(shutdown_pool, kill=True)
+
+
+def _submit_shared(arr: Any, fn: Any, *args: Any) -> dict:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(arr.nbytes)))
+    deadline = time.monotonic() + worker_timeout_s()
+    try:
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        while True:
+            pool = get_pool()
+            try:
+                future = pool.submit(fn, shm.name, tuple(arr.shape), *args)
+            except BrokenProcessPool:
+                shutdown_pool()
+                raise
+            except RuntimeError:
+                if _POOL is pool:
+                    raise
+                # Retired by another caller between get_pool() and submit()
+                continue
+            with _POOL_LOCK:
+                _INFLIGHT.setdefault(id(pool), set()).add(future)
+            try:
+                return future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except CancelledError:
+                # Still queued when its pool was retired; try again on the new one.
+                continue
+            except FutureTimeoutError:
+                # Don't leave a hung worker holding a pool slot (and the caller's session lock).
+                print(f"[RPPG] finalize worker timed out after {worker_timeout_s():.1f} s")
+                _retire_pool(pool, future)
+                raise TimeoutError("finalize_timeout")
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start over with a fresh pool next time.
+                shutdown_pool()
+                raise
+            finally:
+                with _POOL_LOCK:
+                    pending = _INFLIGHT.get(id(pool))
+                    if pending is not None:
+                        pending.discard(future)
+                        if not pending:
+                            del _INFLIGHT[id(pool)]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def run_frames(
+    frames: list,
+    fps: float,
+    winsize: int = 5,
+    stride: int = 1,
+    roi_refresh_interval: int = 3,
+    timestamps_ms: Optional[List[float]] = None,
+) -> dict:
+    """`pyvhr_adapter.process_rppg_signal` in a worker process."""
+    stack = np.stack([np.asarray(f, dtype=np.uint8) for f in frames]) if frames else np.zeros((0, 1, 1, 3), np.uint8)
+    ts = list(timestamps_ms) if timestamps_ms is not None else None
+    return _submit_shared(stack, _run_frames, float(fps), winsize, stride, roi_refresh_interval, ts)
@@ -2,13 +2,16 @@ from __future__ import annotations
 
 import base64
 import json
+import threading
 import time
 import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from io import BytesIO
 from typing import Any, Dict, List, Optional, Tuple
 
 from ..config import DEFAULTS
+from . import rppg_pool
 
 # Optional heavy deps (Build 2).
 # In many environments (e.g. Python 3.14), numpy/scipy/mediapipe wheels may be unavailable.
@@ -52,10 +55,78 @@ class SessionState:
 
     # Ingest/processing timing
     decode_ms_total: float = 0.0
+    stream_ms_total: float = 0.0
 
     # Build 2: optionally store decoded frames (downscaled RGB) for adapter processing.
     # When running in mock_mode (or without deps), we keep this empty.
     frames_rgb: List[Any] = field(default_factory=list)
+    # Client capture timestamps (ms) of frames_rgb; None once a chunk arrived without them.
+    frames_ts: Optional[List[float]] = field(default_factory=list)
+
+    # Streaming mode: pyvhr_adapter.RppgStream fed at ingest. Frames are dropped right
+    # after ROI averaging; the stream only keeps per-frame RGB means + ROI boxes.
+    stream: Any = None
+    # Frames of chunks the stream failed on (dropped; the rest of the session is kept)
+    stream_frames_dropped: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # Set when the session was ended while `lock` was held (e.g. during a finalize);
+    # the lock holder then drops the buffers on exit.
+    released: bool = False
+
+
+def _release_buffers(s: SessionState):
+    """Drop decoded frames and the streaming engine of a session."""
+    try:
+        s.frames_rgb.clear()
+        if s.frames_ts:
+            s.frames_ts.clear()
+    except Exception:
+        pass
+    stream, s.stream = s.stream, None
+    if stream is not None:
+        try:
+            stream.close()
+        except Exception:
+            pass
+
+
+@contextmanager
+def _locked(s: SessionState):
+    """Hold `s.lock`; drop the buffers on exit if the session was released meanwhile."""
+    with s.lock:
+        try:
+            yield s
+        finally:
+            if s.released:
+                _release_buffers(s)
+
+
+def _release_nowait(s: SessionState):
+    """Release a session's buffers without waiting on its lock.
+
+    Safe to call from the event loop: if a finalize (or ingest) holds the lock,
+    the session is only marked released and the holder frees the buffers on exit.
+    """
+    s.released = True
+    if s.lock.acquire(blocking=False):
+        try:
+            _release_buffers(s)
+        finally:
+            s.lock.release()
+
+
+def _check_timestamps(ts_ms: Any, n: int) -> Optional[List[float]]:
+    """Validate optional per-frame capture timestamps (one finite number per frame)."""
+    if ts_ms is None:
+        return None
+    if not isinstance(ts_ms, list) or len(ts_ms) != n:
+        raise ValueError("invalid_timestamps")
+    out: List[float] = []
+    for t in ts_ms:
+        if isinstance(t, bool) or not isinstance(t, (int, float)) or t != t or t in (float("inf"), float("-inf")):
+            raise ValueError("invalid_timestamps")
+        out.append(float(t))
+    return out
 
 
 class SessionManager:
@@ -68,11 +139,8 @@ class SessionManager:
         now = time.time()
         expired = [sid for sid, s in self._sessions.items() if s.expires_at <= now]
         for sid in expired:
-            # Ensure memory is released
-            try:
-                self._sessions[sid].frames_rgb.clear()
-            except Exception:
-                pass
+            # Ensure memory is released (deferred to the lock holder if busy)
+            _release_nowait(self._sessions[sid])
             del self._sessions[sid]
 
     def create_session(self, client_ip: str) -> SessionState:
@@ -103,10 +171,7 @@ class SessionManager:
         self._cleanup_expired()
         s = self._sessions.pop(session_id, None)
         if s is not None:
-            try:
-                s.frames_rgb.clear()
-            except Exception:
-                pass
+            _release_nowait(s)
 
     def get(self, session_id: str) -> Optional[SessionState]:
         self._cleanup_expired()
@@ -151,27 +216,26 @@ class SessionManager:
         s.bytes_received += total_chunk_bytes
         s.chunks_received += 1
 
-    def ingest_chunk_base64(self, session_id: str, frames_b64: List[str]) -> Tuple[int, int]:
-        """Ingest incoming base64 JPEG frames.
-
-        In **mock_mode**, this function only validates/counts bytes and does not decode/store frames.
-        In **real mode**, it decodes JPEG -> RGB numpy arrays (downscaled) when deps are available.
+    def ingest_chunk_base64(
+        self, session_id: str, frames_b64: List[str], ts_ms: Optional[List[float]] = None
+    ) -> Tuple[int, int]:
+        """Ingest incoming base64 JPEG frames (JSON text path).
 
         Returns: (n_frames, total_bytes)
         """
-        s = self.get(session_id)
-        if not s:
+        if not self.get(session_id):
             raise ValueError("session_not_found_or_expired")
 
         if not isinstance(frames_b64, list):
             raise ValueError("missing_frames")
+        ts_ms = _check_timestamps(ts_ms, len(frames_b64))
 
         t0 = time.perf_counter()
 
         # Decode base64 first (to enforce max_frame_bytes based on raw bytes)
         jpegs: List[bytes] = []
-        sizes: List[int] = []
-        for f in frames_b64:
+        kept_ts: List[float] = []
+        for i, f in enumerate(frames_b64):
             if not isinstance(f, str):
                 continue
             try:
@@ -179,7 +243,39 @@ class SessionManager:
             except Exception:
                 continue
             jpegs.append(b)
-            sizes.append(len(b))
+            if ts_ms is not None:
+                kept_ts.append(ts_ms[i])
+
+        return self.ingest_chunk_jpeg(session_id, jpegs, ts_ms=kept_ts if ts_ms is not None else None, _t0=t0)
+
+    def ingest_chunk_jpeg(
+        self,
+        session_id: str,
+        jpegs: List[bytes],
+        ts_ms: Optional[List[float]] = None,
+        _t0: Optional[float] = None,
+    ) -> Tuple[int, int]:
+        """Ingest raw JPEG frames (binary WS path, or base64 already decoded).
+
+        `ts_ms` are optional per-frame client capture timestamps (ms); real mode uses them
+        to resample the RGB trace onto a uniform grid instead of trusting target_fps.
+
+        In **mock_mode**, this function only validates/counts bytes and does not decode/store frames.
+        In **real mode**, it decodes JPEG -> RGB numpy arrays (downscaled) when deps are available,
+        and either feeds them to the session's streaming engine or stores them for finalize.
+
+        Returns: (n_frames, total_bytes)
+        """
+        s = self.get(session_id)
+        if not s:
+            raise ValueError("session_not_found_or_expired")
+
+        if not isinstance(jpegs, list):
+            raise ValueError("missing_frames")
+        ts_ms = _check_timestamps(ts_ms, len(jpegs))
+
+        t0 = time.perf_counter() if _t0 is None else _t0
+        sizes = [len(b) for b in jpegs]
 
         n = len(jpegs)
         total_bytes = int(sum(sizes))
@@ -199,19 +295,92 @@ class SessionManager:
         # Convert to RGB numpy and keep a smaller resolution to reduce memory.
         # 256x144 keeps face detector reasonably stable while staying light.
         target_w, target_h = 256, 144
-        for jb in jpegs:
+        decoded: List[Any] = []
+        decoded_ts: List[float] = []
+        for i, jb in enumerate(jpegs):
             try:
                 im = Image.open(BytesIO(jb)).convert("RGB")
                 im = im.resize((target_w, target_h), Image.BILINEAR)
                 arr = np.asarray(im, dtype=np.uint8)
-                s.frames_rgb.append(arr)
+                decoded.append(arr)
+                if ts_ms is not None:
+                    decoded_ts.append(ts_ms[i])
             except Exception:
                 # Skip frames that fail decoding
                 continue
 
         s.decode_ms_total += (time.perf_counter() - t0) * 1000.0
+
+        frames_ts = decoded_ts if ts_ms is not None else None
+        with _locked(s):
+            if s.finished or s.released:
+                return n, total_bytes
+            if not self._feed_stream(s, decoded, frames_ts):
+                s.frames_rgb.extend(decoded)
+                if frames_ts is None:
+                    s.frames_ts = None
+                elif s.frames_ts is not None:
+                    s.frames_ts.extend(frames_ts)
         return n, total_bytes
 
+    def _feed_stream(self, s: SessionState, frames: List[Any], ts_ms: Optional[List[float]] = None) -> bool:
+        """Push decoded frames to the session's streaming engine (created on first use).
+
+        Returns False when streaming is disabled or unavailable, so the caller keeps the
+        frames for the batch path instead. Once the stream exists, a chunk it fails on is
+        dropped (and counted in `stream_frames_dropped`); the samples streamed so far are kept.
+        Must be called with `s.lock` held.
+        """
+        if not DEFAULTS.streaming_rppg:
+            return False
+
+        t0 = time.perf_counter()
+        try:
+            if s.stream is None:
+                if s.frames_rgb:
+                    # Session already fell back to batch mode; stay consistent.
+                    return False
+                try:
+                    # Lazy import: adapter has heavy deps (numpy/scipy/mediapipe + local pyVHR)
+                    from . import pyvhr_adapter
+
+                    s.stream = pyvhr_adapter.RppgStream(
+                        fps=float(s.target_fps),
+                        roi_refresh_interval=int(max(1, s.roi_refresh_interval)),
+                        winsize=5,
+                        stride=1,
+                        capacity=int(max(1, s.max_frames)),
+                    )
+                except Exception as e:
+                    print(f"[RPPG] streaming disabled session_id={s.session_id} err={repr(e)}")
+                    return False
+            try:
+                s.stream.push_frames(frames, timestamps_ms=ts_ms)
+            except Exception as e:
+                # A failed push leaves the stream untouched, so only this chunk is lost.
+                if s.stream_frames_dropped == 0:
+                    print(f"[RPPG] stream chunk dropped session_id={s.session_id} err={repr(e)}")
+                s.stream_frames_dropped += len(frames)
+            return True
+        finally:
+            s.stream_ms_total += (time.perf_counter() - t0) * 1000.0
+
+    def live_bpm(self, session_id: str) -> Optional[float]:
+        """Preview BPM of a streamed session while it is capturing, or None.
+
+        Never waits on the session lock (it's called from the event loop): None while
+        an ingest or a finalize holds it.
+        """
+        s = self.get(session_id)
+        if not s or s.stream is None or not s.lock.acquire(blocking=False):
+            return None
+        try:
+            return s.stream.live_bpm() if s.stream is not None else None
+        except Exception:
+            return None
+        finally:
+            s.lock.release()
+
     def should_finalize(self, session_id: str) -> bool:
         s = self.get(session_id)
         if not s:
@@ -259,6 +428,10 @@ class SessionManager:
         if not s:
             raise ValueError("session_not_found_or_expired")
 
+        with _locked(s):
+            return self._finalize_real_locked(s)
+
+    def _finalize_real_locked(self, s: SessionState) -> dict:
         s.finished = True
         now = time.time()
         duration = 0.0
@@ -284,17 +457,10 @@ class SessionManager:
 
         adapter_out: Optional[dict] = None
         processing_ms: Optional[float] = None
+        streaming = s.stream is not None
+        buffer_bytes = int(s.stream.nbytes) if streaming else int(sum(getattr(f, "nbytes", 0) for f in s.frames_rgb))
 
         try:
-            # Lazy import: adapter has heavy deps (numpy/scipy/mediapipe + local pyVHR)
-            from . import pyvhr_adapter
-
-            # Ensure adapter uses the session ROI refresh interval (without changing its public signature)
-            try:
-                pyvhr_adapter._ROI_REFRESH_INTERVAL = int(max(1, s.roi_refresh_interval))
-            except Exception:
-                pass
-
             # Log accumulated decode time (base64->jpeg->rgb) for the session
             print(f"[RPPG] stage=decode elapsed={s.decode_ms_total:.0f} ms")
 
@@ -302,12 +468,37 @@ class SessionManager:
 
             # fps comes from session parameters
             fps = float(s.target_fps)
-            adapter_out = pyvhr_adapter.process_rppg_signal(
-                frames=s.frames_rgb,
-                fps=fps,
-                winsize=5,
-                stride=1,
-            )
+
+            if streaming:
+                # ROI/RGB means/POS already ran chunk by chunk; only the last stage is left,
+                # which is cheap enough to run here rather than in a worker process.
+                adapter_out = s.stream.finalize()
+            elif rppg_pool.enabled():
+                adapter_out = rppg_pool.run_frames(
+                    s.frames_rgb,
+                    fps=fps,
+                    winsize=5,
+                    stride=1,
+                    roi_refresh_interval=int(max(1, s.roi_refresh_interval)),
+                    timestamps_ms=s.frames_ts or None,
+                )
+            else:
+                # Lazy import: adapter has heavy deps (numpy/scipy/mediapipe + local pyVHR)
+                from . import pyvhr_adapter
+
+                # Ensure adapter uses the session ROI refresh interval (without changing its public signature)
+                try:
+                    pyvhr_adapter._ROI_REFRESH_INTERVAL = int(max(1, s.roi_refresh_interval))
+                except Exception:
+                    pass
+
+                adapter_out = pyvhr_adapter.process_rppg_signal(
+                    frames=s.frames_rgb,
+                    fps=fps,
+                    winsize=5,
+                    stride=1,
+                    timestamps_ms=s.frames_ts or None,
+                )
 
             processing_ms = (time.perf_counter() - t_proc0) * 1000.0
 
@@ -363,6 +554,11 @@ class SessionManager:
                     "snr_score": snr_score,
                     "snr_db": result.get("snr_db"),
                     "decode_ms_total": float(s.decode_ms_total),
+                    "streaming": streaming,
+                    "finalize_workers": int(DEFAULTS.finalize_workers),
+                    "stream_ms_total": float(s.stream_ms_total),
+                    "stream_frames_dropped": int(s.stream_frames_dropped),
+                    "buffer_bytes": buffer_bytes,
                     "processing_ms": float(processing_ms) if processing_ms is not None else None,
                     "timings_ms": {
                         "roi": float(timings.get("roi") or 0.0),
@@ -376,10 +572,7 @@ class SessionManager:
                 pass
 
             # Cleanup memory regardless of success/failure
-            try:
-                s.frames_rgb.clear()
-            except Exception:
-                pass
+            _release_buffers(s)
 
         return result
 
@@ -417,10 +610,8 @@ class SessionManager:
                 )
             except Exception:
                 pass
-            try:
-                s.frames_rgb.clear()
-            except Exception:
-                pass
+            with _locked(s):
+                _release_buffers(s)
             return out
 
         return self.finalize_real(session_id)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+
+class FakeFaceDetector:
+    """Always 'detects' the same centered face box."""
+
+    def process(self, arr):
+        bb = SimpleNamespace(xmin=0.3, ymin=0.2, width=0.4, height=0.5)
+        return SimpleNamespace(detections=[SimpleNamespace(location_data=SimpleNamespace(relative_bounding_box=bb))])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_face_detector():
+    return FakeFaceDetector
+
+
+@pytest.fixture
+def synthetic_frames():
+    def make(n=200, fps=8.0, bpm=72.0):
+        rng = np.random.default_rng(0)
+        gains = np.array([0.3, 1.0, 0.5])
+        frames = []
+        for k in range(n):
+            pulse = 0.01 * np.sin(2 * np.pi * (bpm / 60.0) * (k / fps))
+            base = np.array([150.0, 110.0, 90.0]) * (1.0 + pulse * gains)
+            frames.append(np.clip(base + rng.normal(0, 2, (144, 256, 3)), 0, 255).astype(np.uint8))
+        return frames
+
+    return make
@@ -0,0 +1,12 @@
+"""Tasks for the finalize pool tests.
+
+Kept free of heavy imports: spawned workers import this module to unpickle them.
+"""
+
+from __future__ import annotations
+
+import time
+
+
+def hang(name, shape, seconds):
+    time.sleep(seconds)
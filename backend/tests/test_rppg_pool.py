@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import dataclasses
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+import pytest
+from pool_tasks import hang
+
+pyvhr_adapter = pytest.importorskip("backend.app.services.pyvhr_adapter")
+
+
+def test_face_detector_pool_reuses_and_replaces_broken(fake_face_detector):
+    created = []
+
+    def factory():
+        created.append(fake_face_detector())
+        return created[-1]
+
+    pool = pyvhr_adapter.FaceDetectorPool(max_size=2, factory=factory)
+    with pool.acquire() as first:
+        pass
+    with pool.acquire() as second:
+        assert second is first
+
+    with pytest.raises(RuntimeError):
+        with pool.acquire():
+            raise RuntimeError("boom")
+    with pool.acquire() as third:
+        assert third is not first
+    assert len(created) == 2
+
+
+@pytest.fixture
+def real_mode(monkeypatch):
+    from backend.app.services import rppg_pool, rppg_service
+
+    def configure(**overrides):
+        defaults = dataclasses.replace(rppg_service.DEFAULTS, mock_mode=False, **overrides)
+        monkeypatch.setattr(rppg_service, "DEFAULTS", defaults)
+        monkeypatch.setattr(rppg_pool, "DEFAULTS", defaults)
+        return rppg_service.SessionManager()
+
+    return configure
+
+
+def test_streamed_session_finalizes_in_process(monkeypatch, real_mode, fake_face_detector, synthetic_frames):
+    from backend.app.services import rppg_pool
+
+    manager = real_mode(streaming_rppg=True, finalize_workers=1)
+    submitted = []
+    monkeypatch.setattr(rppg_pool, "_submit_shared", lambda *args: submitted.append(args))
+
+    s = manager.create_session("127.0.0.1")
+    s.stream = pyvhr_adapter.RppgStream(fps=8.0, face_detector=fake_face_detector())
+    frames = synthetic_frames()
+    for i in range(0, len(frames), 10):
+        assert manager._feed_stream(s, frames[i : i + 10])
+
+    result = manager.finalize_real(s.session_id)
+    assert submitted == []
+    assert abs(result["bpm"] - 72.0) < 3.0
+
+
+def test_live_bpm_preview_never_waits(real_mode, fake_face_detector, synthetic_frames):
+    manager = real_mode(streaming_rppg=True)
+    s = manager.create_session("127.0.0.1")
+    assert manager.live_bpm(s.session_id) is None  # no stream yet
+
+    s.stream = pyvhr_adapter.RppgStream(fps=8.0, face_detector=fake_face_detector())
+    frames = synthetic_frames()
+    for i in range(0, len(frames), 10):
+        assert manager._feed_stream(s, frames[i : i + 10])
+    assert abs(manager.live_bpm(s.session_id) - 72.0) < 3.0
+    with s.lock:
+        assert manager.live_bpm(s.session_id) is None
+
+
+def test_hung_finalize_worker_times_out(real_mode):
+    from backend.app.services import rppg_pool
+
+    real_mode(finalize_workers=1, finalize_timeout_s=1.0)
+    try:
+        with pytest.raises(TimeoutError):
+            rppg_pool._submit_shared(np.zeros(3, np.float32), hang, 600.0)
+        assert rppg_pool._POOL is None
+        for proc in multiprocessing.active_children():
+            proc.join(10)
+        assert multiprocessing.active_children() == []
+    finally:
+        rppg_pool.shutdown_pool(kill=True)
+
+
+def test_hung_worker_does_not_fail_other_sessions(monkeypatch, real_mode):
+    from backend.app.services import rppg_pool
+
+    real_mode(finalize_workers=2, finalize_timeout_s=5.0)
+    # Skip the detector warm-up; spawned workers resolve the initializer by name.
+    monkeypatch.setattr(rppg_pool, "_init_worker", rppg_pool._noop)
+    assert rppg_pool.worker_timeout_s() < 5.0
+    try:
+        pool = rppg_pool.get_pool()
+        # Start both workers (and import this module there) before the clock matters.
+        for f in [pool.submit(hang, None, None, 0.5) for _ in range(2)]:
+            f.result(120)
+        other = {}
+
+        def run_other():
+            time.sleep(1.5)
+            try:
+                other["result"] = rppg_pool._submit_shared(np.zeros(3, np.float32), hang, 3.0)
+            except Exception as e:
+                other["error"] = e
+
+        thread = threading.Thread(target=run_other)
+        thread.start()
+        with pytest.raises(TimeoutError):
+            rppg_pool._submit_shared(np.zeros(3, np.float32), hang, 600.0)
+        thread.join(30)
+        # The other session's task kept running on the retired pool and finished.
+        assert other == {"result": None}
+        for proc in multiprocessing.active_children():
+            proc.join(10)
+        assert multiprocessing.active_children() == []
+    finally:
+        rppg_pool.shutdown_pool(kill=True)
+
+
+def test_finalize_timeout_gives_failure_result(monkeypatch, real_mode, synthetic_frames):
+    from backend.app.services import rppg_pool
+
+    manager = real_mode(streaming_rppg=False, finalize_workers=1)
+
+    def hung(*args, **kwargs):
+        raise TimeoutError("finalize_timeout")
+
+    monkeypatch.setattr(rppg_pool, "run_frames", hung)
+    s = manager.create_session("127.0.0.1")
+    s.frames_rgb.extend(synthetic_frames(n=20))
+
+    result = manager.finalize_real(s.session_id)
+    assert result["bpm"] is None
+    assert result["quality"] == "poor"
+    assert s.lock.acquire(blocking=False)
+
+
+def test_end_session_during_finalize_does_not_block(monkeypatch, real_mode, synthetic_frames):
+    from backend.app.services import rppg_pool
+
+    manager = real_mode(streaming_rppg=False, finalize_workers=1)
+    started, unblock = threading.Event(), threading.Event()
+
+    def slow(*args, **kwargs):
+        started.set()
+        unblock.wait(30)
+        raise TimeoutError("finalize_timeout")
+
+    monkeypatch.setattr(rppg_pool, "run_frames", slow)
+    s = manager.create_session("127.0.0.1")
+    s.frames_rgb.extend(synthetic_frames(n=20))
+    finalizer = threading.Thread(target=manager.finalize_real, args=(s.session_id,))
+    finalizer.start()
+    try:
+        assert started.wait(30)
+        t0 = time.perf_counter()
+        manager.end_session(s.session_id)
+        assert time.perf_counter() - t0 < 0.5
+        assert manager.get(s.session_id) is None
+        assert s.released and s.lock.locked()
+    finally:
+        unblock.set()
+        finalizer.join(30)
+    assert s.frames_rgb == []
+    assert not s.lock.locked()
+
+
+def test_streams_beyond_detector_pool_size_time_out(monkeypatch, fake_face_detector, synthetic_frames):
+    class SlowDetector(fake_face_detector):
+        def process(self, arr):
+            time.sleep(0.3)
+            return super().process(arr)
+
+    pool = pyvhr_adapter.FaceDetectorPool(max_size=2, factory=SlowDetector)
+    monkeypatch.setattr(pyvhr_adapter, "DETECTOR_POOL", pool)
+    monkeypatch.setattr(pyvhr_adapter, "_DETECTOR_TIMEOUT_S", 0.2)
+
+    frames = synthetic_frames(n=10)
+    streams = [pyvhr_adapter.RppgStream(fps=8.0) for _ in range(4)]
+    start = threading.Barrier(len(streams))
+    errors = [None] * len(streams)
+
+    def push(i):
+        start.wait()
+        try:
+            streams[i].push_frames(frames)
+        except TimeoutError as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=push, args=(i,)) for i in range(len(streams))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    timed_out = [i for i, e in enumerate(errors) if e is not None]
+    assert len(timed_out) == 2
+    assert all(str(errors[i]) == "face_detector_pool_exhausted" for i in timed_out)
+    assert sorted(s.frames_seen for s in streams) == [0, 0, 10, 10]
+    # every slot was given back
+    with pool.acquire(timeout=0), pool.acquire(timeout=0):
+        pass
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+pyvhr_adapter = pytest.importorskip("backend.app.services.pyvhr_adapter")
+
+
+def test_stream_matches_batch(fake_face_detector, synthetic_frames):
+    frames = synthetic_frames()
+    frames[0] = None
+    frames[50] = None
+    frames[80:83] = [None] * 3  # interpolated
+    frames[120:130] = [None] * 10  # held
+    frames[-2:] = [None] * 2
+
+    batch = pyvhr_adapter.process_rppg_signal(list(frames), fps=8.0, face_detector=fake_face_detector())
+
+    stream = pyvhr_adapter.RppgStream(fps=8.0, face_detector=fake_face_detector())
+    for i in range(0, len(frames), 10):
+        stream.push_frames(frames[i : i + 10])
+    live_bpm = stream.live_bpm()
+    streamed = stream.finalize()
+    stream.close()
+
+    batch.pop("timings_ms")
+    streamed.pop("timings_ms")
+    assert streamed == batch
+    assert abs(streamed["bpm"] - 72.0) < 3.0
+    assert abs(live_bpm - 72.0) < 3.0
+
+
+def test_ring_buffer_wraps_in_order():
+    ring = pyvhr_adapter.RingBuffer(4, columns=None, dtype=np.float64)
+    for i in range(6):
+        ring.append(i)
+    assert ring.view().tolist() == [2.0, 3.0, 4.0, 5.0]
+
+    ring.add_last(np.ones(3))
+    assert ring.view().tolist() == [2.0, 4.0, 5.0, 6.0]
+
+
+def test_timestamps_resample_jittered_capture(fake_face_detector):
+    # ~6 fps capture with jitter, while the session nominally runs at 8 fps.
+    rng = np.random.default_rng(1)
+    ts = np.cumsum(rng.uniform(130.0, 200.0, 160))
+    t_s = ts / 1000.0
+    gains = np.array([0.3, 1.0, 0.5])
+    frames = []
+    for t in t_s:
+        pulse = 0.01 * np.sin(2 * np.pi * (72.0 / 60.0) * t)
+        base = np.array([150.0, 110.0, 90.0]) * (1.0 + pulse * gains)
+        frames.append(np.clip(base + rng.normal(0, 2, (144, 256, 3)), 0, 255).astype(np.uint8))
+    ts_ms = ts.tolist()
+
+    batch = pyvhr_adapter.process_rppg_signal(list(frames), fps=8.0, face_detector=fake_face_detector(), timestamps_ms=ts_ms)
+
+    stream = pyvhr_adapter.RppgStream(fps=8.0, face_detector=fake_face_detector())
+    for i in range(0, len(frames), 10):
+        stream.push_frames(frames[i : i + 10], timestamps_ms=ts_ms[i : i + 10])
+    streamed = stream.finalize()
+    stream.close()
+
+    batch.pop("timings_ms")
+    streamed.pop("timings_ms")
+    assert streamed == batch
+    assert abs(streamed["bpm"] - 72.0) < 3.0
+
+
+def test_failed_chunk_is_dropped_and_stream_kept(monkeypatch, capsys, fake_face_detector, synthetic_frames):
+    import dataclasses
+
+    from backend.app.services import rppg_service
+
+    monkeypatch.setattr(rppg_service, "DEFAULTS", dataclasses.replace(rppg_service.DEFAULTS, streaming_rppg=True))
+
+    class FlakyDetector(fake_face_detector):
+        fail = False
+
+        def process(self, arr):
+            if self.fail:
+                raise RuntimeError("detector crashed")
+            return super().process(arr)
+
+    manager = rppg_service.SessionManager()
+    s = manager.create_session("127.0.0.1")
+    detector = FlakyDetector()
+    s.stream = pyvhr_adapter.RppgStream(fps=8.0, face_detector=detector)
+    reference = pyvhr_adapter.RppgStream(fps=8.0, face_detector=fake_face_detector())
+
+    frames = synthetic_frames()
+    for i in range(0, len(frames), 10):
+        detector.fail = i in (100, 150)
+        assert manager._feed_stream(s, frames[i : i + 10])
+        if not detector.fail:
+            reference.push_frames(frames[i : i + 10])
+
+    assert s.frames_rgb == []
+    assert s.stream_frames_dropped == 20
+    assert s.stream.frames_seen == reference.frames_seen == 180
+    assert capsys.readouterr().out.count("[RPPG] stream chunk dropped") == 1
+
+    streamed = s.stream.finalize()
+    expected = reference.finalize()
+    streamed.pop("timings_ms")
+    expected.pop("timings_ms")
+    assert streamed == expected
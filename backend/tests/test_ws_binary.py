@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import msgpack
+from fastapi.testclient import TestClient
+
+from backend.app.main import create_app
+
+
+def test_ws_binary_chunk_ack_and_result():
+    client = TestClient(create_app())
+    session_id = client.post("/sessions/start", json={"consent": True}).json()["session_id"]
+
+    with client.websocket_connect(f"/ws/sessions/{session_id}") as ws:
+        frames = [b"\xff\xd8jpeg-1\xff\xd9", b"\xff\xd8jpeg-2\xff\xd9"]
+        ws.send_bytes(msgpack.packb({"type": "chunk", "chunk_seq": 0, "frames": frames, "ts_ms": [0.0, 125.0]}))
+        assert ws.receive_json() == {"type": "ack", "chunk_seq": 0, "received": 2}
+
+        ws.send_bytes(msgpack.packb({"type": "chunk", "chunk_seq": 1, "frames": frames, "ts_ms": [250.0]}))
+        assert ws.receive_json() == {"type": "error", "message": "invalid_timestamps"}
+
+        ws.send_bytes(msgpack.packb({"type": "end"}))
+        assert ws.receive_json()["stage"] == "processing"
+        result = ws.receive_json()
+        assert result["type"] == "result"
+        assert result["frames_received"] == 2
@@ -1,6 +1,13 @@
 import { useCallback, useEffect, useRef, useState, type RefObject } from 'react';
 import { captureJpegFrame } from '../utils/image';
-import { getApiBase, type SessionResultMessage } from '../utils/ws';
+import {
+  binaryWsEnabled,
+  getApiBase,
+  getWsBase,
+  RppgWebSocketClient,
+  type SessionResultMessage,
+  type WsServerMessage,
+} from '../utils/ws';
 
 export type UseRppgSessionOpts = {
   sessionId: string;
@@ -22,9 +29,13 @@ type State = {
   chunksSent: number;
   framesSent: number;
   lastAckChunkSeq: number | null;
+  // Preview BPM sent by a streaming backend during capture (binary WS transport only)
+  liveBpm: number | null;
   error: string | null;
 };
 
+const WS_ACK_TIMEOUT_MS = 10000;
+
 function toBase64(u8: Uint8Array): string {
   let s = '';
   const chunk = 0x8000;
@@ -53,7 +64,8 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
   const chunkIntervalRef = useRef<number | null>(null);
   const timerIntervalRef = useRef<number | null>(null);
 
-  const pendingFramesRef = useRef<Uint8Array[]>([]);
+  // Captured JPEGs with their capture time (performance.now(), ms) for backend resampling.
+  const pendingFramesRef = useRef<{ jpeg: Uint8Array; ts: number }[]>([]);
   const chunkSeqRef = useRef(0);
   const lastSendAtRef = useRef<number>(0);
 
@@ -65,12 +77,19 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
   // The parent updates sessionId via React state, which may lag behind the start() call.
   const activeSessionIdRef = useRef<string>('');
 
+  // Binary WS transport (VITE_WS_BINARY): chunks go as msgpack over the session WebSocket
+  // and are acked there. wsRef is cleared once the socket closes (e.g. after the result).
+  const useWsRef = useRef(false);
+  const wsRef = useRef<RppgWebSocketClient | null>(null);
+  const ackWaitersRef = useRef<Map<number, (err: Error | null) => void>>(new Map());
+
   const [state, setState] = useState<State>({
     isCapturing: false,
     secondsElapsed: 0,
     chunksSent: 0,
     framesSent: 0,
     lastAckChunkSeq: null,
+    liveBpm: null,
     error: null,
   });
 
@@ -83,8 +102,59 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
     timerIntervalRef.current = null;
   }, []);
 
+  const closeWs = useCallback(() => {
+    const ws = wsRef.current;
+    wsRef.current = null;
+    ackWaitersRef.current.forEach((done) => done(new Error('Conexão encerrada.')));
+    ackWaitersRef.current.clear();
+    ws?.close();
+  }, []);
+
+  const waitForAck = useCallback((chunkSeq: number) => {
+    return new Promise<void>((resolve, reject) => {
+      const timer = window.setTimeout(() => {
+        ackWaitersRef.current.delete(chunkSeq);
+        reject(new Error('Tempo esgotado aguardando confirmação do chunk.'));
+      }, WS_ACK_TIMEOUT_MS);
+      ackWaitersRef.current.set(chunkSeq, (err) => {
+        window.clearTimeout(timer);
+        if (err) reject(err);
+        else resolve();
+      });
+    });
+  }, []);
+
+  const handleWsMessage = useCallback(
+    (msg: WsServerMessage) => {
+      if (msg.type === 'ack') {
+        const done = ackWaitersRef.current.get(msg.chunk_seq);
+        ackWaitersRef.current.delete(msg.chunk_seq);
+        done?.(null);
+      } else if (msg.type === 'progress') {
+        const liveBpm = msg.live_bpm;
+        if (typeof liveBpm === 'number') setState((s) => ({ ...s, liveBpm }));
+      } else if (msg.type === 'error') {
+        // Errors carry no chunk_seq: they belong to the oldest chunk still waiting.
+        const oldest = ackWaitersRef.current.keys().next();
+        if (!oldest.done) {
+          const done = ackWaitersRef.current.get(oldest.value);
+          ackWaitersRef.current.delete(oldest.value);
+          done?.(new Error(msg.message));
+        } else {
+          setState((s) => ({ ...s, error: msg.message }));
+        }
+      } else {
+        closeWs();
+        onResult(msg);
+      }
+    },
+    [closeWs, onResult],
+  );
+
   const reset = useCallback(() => {
     cleanupTimers();
+    closeWs();
+    useWsRef.current = false;
     pendingFramesRef.current = [];
     chunkSeqRef.current = 0;
     ackedChunkSeqRef.current = -1;
@@ -98,9 +168,10 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
       chunksSent: 0,
       framesSent: 0,
       lastAckChunkSeq: null,
+      liveBpm: null,
       error: null,
     });
-  }, [cleanupTimers]);
+  }, [cleanupTimers, closeWs]);
 
   const postChunkOnce = useCallback(async () => {
     if (inFlightChunkRef.current) return;
@@ -112,34 +183,46 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
       return;
     }
 
+    const ws = wsRef.current;
+    if (useWsRef.current && !ws) return; // socket closed: the session is over
+
     const frames = pendingFramesRef.current.splice(0, maxChunkSize);
     if (frames.length === 0) return;
 
     const chunk_seq = chunkSeqRef.current++;
-    const payload = {
-      chunk_seq,
-      ts_start_ms: Date.now(),
-      fps_est: frames.length,
-      width,
-      height,
-      n: frames.length,
-      frames: frames.map(toBase64),
-    };
 
     inFlightChunkRef.current = true;
     try {
-      const resp = await fetch(`${getApiBase()}/sessions/${encodeURIComponent(sid)}/chunk`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload),
-      });
+      let ack: { chunk_seq: number; received: number };
+      if (ws) {
+        // Raw JPEG bytes in a msgpack frame: no base64/JSON overhead.
+        ws.sendChunkBinary({ chunk_seq, frames: frames.map((f) => f.jpeg), ts_ms: frames.map((f) => f.ts) });
+        await waitForAck(chunk_seq);
+        ack = { chunk_seq, received: frames.length };
+      } else {
+        const payload = {
+          chunk_seq,
+          ts_start_ms: Date.now(),
+          fps_est: frames.length,
+          width,
+          height,
+          n: frames.length,
+          frames: frames.map((f) => toBase64(f.jpeg)),
+          ts_ms: frames.map((f) => f.ts),
+        };
+        const resp = await fetch(`${getApiBase()}/sessions/${encodeURIComponent(sid)}/chunk`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(payload),
+        });
+
+        if (!resp.ok) {
+          const txt = await resp.text();
+          throw new Error(txt || `HTTP ${resp.status}`);
+        }
 
-      if (!resp.ok) {
-        const txt = await resp.text();
-        throw new Error(txt || `HTTP ${resp.status}`);
+        ack = (await resp.json()) as { chunk_seq: number; received: number };
       }
-
-      const ack = (await resp.json()) as { chunk_seq: number; received: number };
       ackedChunkSeqRef.current = Math.max(ackedChunkSeqRef.current, ack.chunk_seq);
 
       setState((s) => ({
@@ -158,11 +241,21 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
     } finally {
       inFlightChunkRef.current = false;
     }
-  }, [height, maxChunkSize, onFaceDetected, sessionId, width]);
+  }, [height, maxChunkSize, onFaceDetected, sessionId, waitForAck, width]);
 
   const finalize = useCallback(async () => {
     const sid = activeSessionIdRef.current || sessionId;
     if (!sid) return;
+    if (useWsRef.current) {
+      // The result comes back on the socket (handleWsMessage). Without a socket it already
+      // did: the backend also finalizes on its own once capture_seconds have elapsed.
+      try {
+        wsRef.current?.sendEndBinary();
+      } catch (e: any) {
+        setState((s) => ({ ...s, error: e?.message ?? 'Falha ao finalizar sessão' }));
+      }
+      return;
+    }
     try {
       const resp = await fetch(`${getApiBase()}/sessions/${encodeURIComponent(sid)}/end`, {
         method: 'POST',
@@ -201,6 +294,28 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
 
       reset();
       activeSessionIdRef.current = sid;
+
+      if (binaryWsEnabled()) {
+        const ws = new RppgWebSocketClient(
+          `${getWsBase()}/ws/sessions/${encodeURIComponent(sid)}`,
+          handleWsMessage,
+          () => {
+            if (wsRef.current !== ws) return;
+            closeWs();
+            setState((s) => ({ ...s, error: 'Conexão encerrada pelo servidor.' }));
+          },
+          () => {},
+        );
+        try {
+          await ws.connect();
+          wsRef.current = ws;
+          useWsRef.current = true;
+        } catch {
+          // Keep the HTTP chunk transport.
+          ws.close();
+        }
+      }
+
       setState((s) => ({ ...s, isCapturing: true, error: null }));
 
       // Capture loop
@@ -216,6 +331,7 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
         if (now - lastSendAtRef.current < captureEveryMs - 5) return;
 
         lastSendAtRef.current = now;
+        const ts = performance.now();
         try {
           const jpeg = await captureJpegFrame({
             video: v,
@@ -224,7 +340,7 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
             height,
             jpegQuality,
           });
-          pendingFramesRef.current.push(jpeg);
+          pendingFramesRef.current.push({ jpeg, ts });
         } catch {
           // ignore
         }
@@ -262,7 +378,9 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
     },
     [
       captureSeconds,
+      closeWs,
       finalize,
+      handleWsMessage,
       height,
       jpegQuality,
       postChunkOnce,
@@ -278,8 +396,9 @@ export function useRppgSession(opts: UseRppgSessionOpts) {
   useEffect(() => {
     return () => {
       cleanupTimers();
+      closeWs();
     };
-  }, [cleanupTimers]);
+  }, [cleanupTimers, closeWs]);
 
   return {
     ...state,
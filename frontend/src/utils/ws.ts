@@ -1,4 +1,4 @@
-import { decode } from '@msgpack/msgpack';
+import { decode, encode } from '@msgpack/msgpack';
 
 export type AckMessage = { type: 'ack'; chunk_seq: number; received: number };
 
@@ -21,7 +21,17 @@ export type SessionResultMessage = {
   stress_level?: number | null;
 };
 
-export type WsServerMessage = AckMessage | SessionResultMessage | { type: 'error'; message: string };
+// Binary chunk (msgpack): raw JPEG bytes instead of base64 strings inside JSON.
+export type BinaryChunk = {
+  chunk_seq: number;
+  frames: Uint8Array[];
+  ts_ms?: number[]; // capture timestamps, one per frame
+};
+
+// 'capturing' carries a preview BPM (streaming backend only); 'processing' precedes the result.
+export type ProgressMessage = { type: 'progress'; stage: 'capturing' | 'processing'; live_bpm?: number };
+
+export type WsServerMessage = AckMessage | ProgressMessage | SessionResultMessage | { type: 'error'; message: string };
 
 export function getApiBase(): string {
   // In Dyad/dev preview, calling http://localhost:8000 from the browser often fails.
@@ -29,6 +39,13 @@ export function getApiBase(): string {
   return (import.meta as any).env?.VITE_API_BASE ?? '';
 }
 
+// Feature flag: send capture chunks as binary msgpack over the session WebSocket
+// instead of base64 JSON over HTTP (VITE_WS_BINARY=1).
+export function binaryWsEnabled(): boolean {
+  const flag = (import.meta as any).env?.VITE_WS_BINARY;
+  return flag === '1' || flag === 'true';
+}
+
 export function getWsBase(): string {
   // Prefer same-origin WS so Vite's proxy can upgrade/forward to the backend.
   const env = (import.meta as any).env?.VITE_WS_BASE;
@@ -95,4 +112,18 @@ export class RppgWebSocketClient {
     }
     this.ws.send(JSON.stringify(payload));
   }
+
+  sendChunkBinary(chunk: BinaryChunk) {
+    if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
+      throw new Error('WebSocket is not open');
+    }
+    this.ws.send(encode({ type: 'chunk', n: chunk.frames.length, ...chunk }));
+  }
+
+  sendEndBinary() {
+    if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
+      throw new Error('WebSocket is not open');
+    }
+    this.ws.send(encode({ type: 'end' }));
+  }
 }
\ No newline at end of file
@@ -11,6 +11,9 @@ from pyVHR.extraction.utils import *
 This module contains classes and methods for transforming a BVP signal in a BPM signal.
 """
 
+# max number of BVP signals in a single Welch_batch call of BVP_to_BPM
+WELCH_BATCH_ROWS = 256
+
 class BVPsignal:
     """
     Manage (multi-channel, row-wise) BVP signals, and transforms them in BPMs.
@@ -125,7 +128,6 @@ class BPMcuda:
         self.maxHz = maxHz
         self.gpuData = cupy.asarray(
             [self.fps, self.nFFT, self.minHz, self.maxHz])
-        self.gmodel = Model(gaussian, independent_vars=['x', 'mu', 'a'])
 
     def BVP_to_BPM(self):
         """
@@ -145,7 +147,7 @@ class BPMcuda:
         return Pfreqs[Pmax.squeeze()]
 
     
-    def BVP_to_BPM_PSD_clustering(self, opt_factor=0.1):
+    def BVP_to_BPM_PSD_clustering(self, opt_factor=0.1, gauss_fit='lmfit'):
         """
         Return the BPM signal as a numpy.float32. 
 
@@ -153,6 +155,8 @@ class BPMcuda:
         This method use the Welch's method to estimate the spectral density of the BVP signal; in case
         of multiple estimators the method sum all the Power Spectums, then it chooses as BPM the 
         maximum Amplitude frequency.
+
+        'gauss_fit' selects the Gaussian fit of the clusters PSDs, see pyVHR.BPM.utils.gaussian_fit ('lmfit' or 'fast').
         """
         # -- interpolation for less than 256 samples
         if self.data.shape[0] == 0:
@@ -205,8 +209,8 @@ class BPMcuda:
         MED = np.median(F[peak_all_idx])
         
         # Gaussian fitting
-        result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1)  # Gaussian fit 
-        result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1)  # Gaussian fit 
+        result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1, method=gauss_fit)  # Gaussian fit 
+        result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1, method=gauss_fit)  # Gaussian fit 
         chis0 = result0.chisqr
         chis1 = result1.chisqr
         rchis0 = result0.redchi
@@ -278,7 +282,6 @@ class BPM:
         self.minHz = minHz
         self.maxHz = maxHz
         # PSD_clustering needs a gaussain fitting model
-        self.gmodel = Model(gaussian, independent_vars=['x', 'mu', 'a'])
 
     def BVP_to_BPM(self):
         """
@@ -294,7 +297,7 @@ class BPM:
         Pmax = np.argmax(Power, axis=1)  # power max
         return Pfreqs[Pmax.squeeze()]
 
-    def BVP_to_BPM_PSD_clustering(self, opt_factor=0.1):
+    def BVP_to_BPM_PSD_clustering(self, opt_factor=0.1, gauss_fit='lmfit'):
         """
         Return the BPM signal as a numpy.float32. 
 
@@ -302,6 +305,8 @@ class BPM:
         This method use the Welch's method to estimate the spectral density of the BVP signal; in case
         of multiple estimators the method sum all the Power Spectums, then it chooses as BPM the 
         maximum Amplitude frequency.
+
+        'gauss_fit' selects the Gaussian fit of the clusters PSDs, see pyVHR.BPM.utils.gaussian_fit ('lmfit' or 'fast').
         """
         # -- interpolation for less than 256 samples
         if self.data.shape[0] == 0:
@@ -352,8 +357,8 @@ class BPM:
         MED = np.median(F[peak_all_idx])
         
         # Gaussian fitting
-        result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1)  # Gaussian fit 
-        result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1)  # Gaussian fit 
+        result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1, method=gauss_fit)  # Gaussian fit 
+        result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1, method=gauss_fit)  # Gaussian fit 
         chis0 = result0.chisqr
         chis1 = result1.chisqr
         rchis0 = result0.redchi
@@ -426,7 +431,7 @@ def BPM_median(bpms):
         MAD[i] = np.float32(mad(bpm))                
     return median_bpms, MAD
 
-def BVP_to_BPM(bvps, fps, minHz=0.65, maxHz=4.):
+def BVP_to_BPM(bvps, fps, minHz=0.65, maxHz=4., method='fft', interp=False):
     """
     Computes BPMs from multiple BVPs (window) using PSDs maxima (CPU version)
 
@@ -435,21 +440,36 @@ def BVP_to_BPM(bvps, fps, minHz=0.65, maxHz=4.):
         fps (float): frames per seconds.
         minHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
         maxHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
+        method (str): Welch's method, 'fft' or 'zoom' (only the subband bins), see pyVHR.BPM.utils.Welch_batch.
+        interp (bool): refine the PSDs maxima between the bins, see pyVHR.BPM.utils.peak_bpm.
 
     Returns:
         A list of length num_windows of BPM signals defined as a float32 Numpy.ndarray with shape [num_estimators, ].
         If any BPM can't be found in a window, then the ndarray has num_estimators == 0.
         
     """
-    bpms = []
-    obj = None
-    for bvp in bvps:
-        if obj is None:
-            obj = BPM(bvp, fps, minHz=minHz, maxHz=maxHz)
-        else:
-            obj.data = bvp
-        bpm_es = obj.BVP_to_BPM()
-        bpms.append(bpm_es)
+    # all the estimators of all the windows go through Welch_batch together (grouped by
+    # window length), in chunks of at most WELCH_BATCH_ROWS signals
+    bpms = [np.float32(0.0)] * len(bvps)
+    groups = {}
+    for i, bvp in enumerate(bvps):
+        bvp = np.asarray(bvp)
+        if bvp.ndim == 1:
+            bvp = bvp.reshape(1, -1)
+        if bvp.shape[0] > 0:
+            groups.setdefault(bvp.shape[1], []).append((i, bvp))
+    for items in groups.values():
+        rows = np.concatenate([bvp for _, bvp in items], axis=0)
+        bpm_rows = np.empty(rows.shape[0], dtype=np.float32)
+        for r0 in range(0, rows.shape[0], WELCH_BATCH_ROWS):
+            Pfreqs, Power = Welch_batch(rows[r0:r0 + WELCH_BATCH_ROWS], fps, minHz=minHz, maxHz=maxHz, method=method)
+            bpm_rows[r0:r0 + WELCH_BATCH_ROWS] = peak_bpm(Pfreqs, Power, interp=interp)
+        r = 0
+        for i, bvp in items:
+            e = bvp.shape[0]
+            # as BPM.BVP_to_BPM: a scalar for a single estimator
+            bpms[i] = bpm_rows[r] if e == 1 else bpm_rows[r:r + e]
+            r += e
     return bpms
 
 def BVP_to_BPM_cuda(bvps, fps, minHz=0.65, maxHz=4.):
@@ -480,7 +500,7 @@ def BVP_to_BPM_cuda(bvps, fps, minHz=0.65, maxHz=4.):
         bpms.append(bpm_es)
     return bpms
 
-def BVP_to_BPM_PSD_clustering_cuda(bvps, fps, minHz=0.65, maxHz=4., opt_factor=.1):
+def BVP_to_BPM_PSD_clustering_cuda(bvps, fps, minHz=0.65, maxHz=4., opt_factor=.1, gauss_fit='lmfit'):
     """
     Computes each BPM from multiple BVPs (window) using circle clustering (GPU version)
 
@@ -489,6 +509,8 @@ def BVP_to_BPM_PSD_clustering_cuda(bvps, fps, minHz=0.65, maxHz=4., opt_factor=.
         fps (float): frames per seconds.
         minHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
         maxHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
+        opt_factor (float): optimization factor of the clusters partition.
+        gauss_fit (str): Gaussian fit of the clusters PSDs, 'lmfit' or 'fast' (see pyVHR.BPM.utils.gaussian_fit).
 
     Returns:
         A list of length num_windows of BPM signals defined as a numpy.float32.
@@ -502,11 +524,11 @@ def BVP_to_BPM_PSD_clustering_cuda(bvps, fps, minHz=0.65, maxHz=4., opt_factor=.
             obj = BPMcuda(bvp, fps, minHz=minHz, maxHz=maxHz)
         else:
             obj.data = bvp
-        bpm_es = obj.BVP_to_BPM_PSD_clustering(opt_factor=opt_factor)
+        bpm_es = obj.BVP_to_BPM_PSD_clustering(opt_factor=opt_factor, gauss_fit=gauss_fit)
         bpms.append(bpm_es)
     return bpms
 
-def BVP_to_BPM_PSD_clustering(patch_bvps, fps, opt_factor=0.1):
+def BVP_to_BPM_PSD_clustering(patch_bvps, fps, opt_factor=0.1, gauss_fit='lmfit'):
     """OLD"""
     bpmES = []
     for X in patch_bvps:
@@ -551,8 +573,8 @@ def BVP_to_BPM_PSD_clustering(patch_bvps, fps, opt_factor=0.1):
         MED = np.median(F[peak_all_idx])
         
         # Gaussian fitting
-        result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1)  # Gaussian fit 
-        result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1)  # Gaussian fit 
+        result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1, method=gauss_fit)  # Gaussian fit 
+        result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1, method=gauss_fit)  # Gaussian fit 
         chis0 = result0.chisqr
         chis1 = result1.chisqr
         rchis0 = result0.redchi
@@ -608,7 +630,7 @@ def BVP_to_BPM_PSD_clustering(patch_bvps, fps, opt_factor=0.1):
 
     return bpmES
 
-def BPM_clustering(ma, patch_bvps, fps, wsize, movement_thrs=[15, 15, 15], opt_factor=0.5):
+def BPM_clustering(ma, patch_bvps, fps, wsize, movement_thrs=[15, 15, 15], opt_factor=0.5, gauss_fit='lmfit'):
   """
     Computes BPM estimates using Circle clustering
 
@@ -617,6 +639,7 @@ def BPM_clustering(ma, patch_bvps, fps, wsize, movement_thrs=[15, 15, 15], opt_f
         - patch_bvps: windowed BVPs
         - movement_thrs: thresholds to trigger motion filter
         - opt_factor: optimization factor
+        - gauss_fit: Gaussian fit of the clusters PSDs, 'lmfit' or 'fast' (see pyVHR.BPM.utils.gaussian_fit)
 
   """
 
@@ -684,8 +707,8 @@ def BPM_clustering(ma, patch_bvps, fps, wsize, movement_thrs=[15, 15, 15], opt_f
     MED = np.median(F[peak_all_idx])
     
     # Gaussian fitting
-    result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1)  # Gaussian fit 
-    result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1)  # Gaussian fit 
+    result0, G0, sigma0 = gaussian_fit(PSD0_mean, F, F0, 1, method=gauss_fit)  # Gaussian fit 
+    result1, G1, sigma1 = gaussian_fit(PSD1_mean, F, F1, 1, method=gauss_fit)  # Gaussian fit 
     chis0 = result0.chisqr
     chis1 = result1.chisqr
     aic0 = result0.aic
@@ -7,38 +7,333 @@ from lmfit import Model
 from scipy.stats import iqr
 import numpy as np
 from scipy.signal import welch
-import cusignal
+from scipy.fft import rfftfreq
+from functools import lru_cache
+from numba import njit
 import cupy
+try:
+    import cusignal
+except ImportError:
+    # GPU-only dependency, needed by Welch_cuda only
+    cusignal = None
 
-def Welch(bvps, fps, minHz=0.65, maxHz=4.0, nfft=2048):
+@lru_cache(maxsize=128)
+def welch_band(fps, n, nfft=2048, minHz=0.65, maxHz=4.0):
     """
-    This function computes Welch'method for spectral density estimation.
+    Welch's parameters for signals of n samples, computed once per (fps, n, nfft, minHz, maxHz).
 
     Args:
-        bvps(flaot32 numpy.ndarray): BVP signal as float32 Numpy.ndarray with shape [num_estimators, num_frames].
         fps (float): frames per seconds.
-        minHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
-        maxHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
-        nfft (int): number of DFT points, specified as a positive integer.
+        n (int): number of samples of the signals.
+        nfft (int): number of DFT points.
+        minHz (float): lower bound of the frequency subband (esclusive).
+        maxHz (float): upper bound of the frequency subband (esclusive).
     Returns:
-        Sample frequencies as float32 numpy.ndarray, and Power spectral density or power spectrum as float32 numpy.ndarray.
+        segment length, segment overlap, indices of the frequency bins in the subband,
+        and the subband frequencies in BPM as float32 numpy.ndarray.
     """
-    _, n = bvps.shape
     if n < 256:
         seglength = n
         overlap = int(0.8*n)  # fixed overlapping
     else:
         seglength = 256
         overlap = 200
-    # -- periodogram by Welch
-    F, P = welch(bvps, nperseg=seglength, noverlap=overlap, fs=fps, nfft=nfft)
-    F = F.astype(np.float32)
-    P = P.astype(np.float32)
-    # -- freq subband (0.65 Hz - 4.0 Hz)
+    F = rfftfreq(nfft, 1/fps).astype(np.float32)
     band = np.argwhere((F > minHz) & (F < maxHz)).flatten()
+    band.setflags(write=False)
     Pfreqs = 60*F[band]
-    Power = P[:, band]
-    return Pfreqs, Power
+    Pfreqs.setflags(write=False)
+    return seglength, overlap, band, Pfreqs
+
+def Welch(bvps, fps, minHz=0.65, maxHz=4.0, nfft=2048, method='fft'):
+    """
+    This function computes Welch'method for spectral density estimation.
+
+    Args:
+        bvps(flaot32 numpy.ndarray): BVP signal as float32 Numpy.ndarray with shape [num_estimators, num_frames].
+        fps (float): frames per seconds.
+        minHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
+        maxHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
+        nfft (int): number of DFT points, specified as a positive integer.
+        method (str): 'fft' (zero-padded FFT over [0, fps/2], then subband) or 'zoom' (only the subband
+            bins, see welch_zoom).
+    Returns:
+        Sample frequencies as float32 numpy.ndarray, and Power spectral density or power spectrum as float32 numpy.ndarray.
+    """
+    return Welch_batch(bvps, fps, minHz=minHz, maxHz=maxHz, nfft=nfft, method=method)
+
+def Welch_batch(bvps, fps, minHz=0.65, maxHz=4.0, nfft=2048, method='fft'):
+    """
+    This function computes Welch'method for spectral density estimation of many signals at once
+    (e.g. all the estimators of all the windows), with a single periodogram/FFT call.
+
+    Args:
+        bvps(flaot32 numpy.ndarray): BVP signals as float32 Numpy.ndarray with shape [..., num_frames],
+            e.g. [num_estimators, num_frames] or [num_windows, num_estimators, num_frames].
+        fps (float): frames per seconds.
+        minHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
+        maxHz (float): frequency in Hz used to isolate a specific subband [minHz, maxHz] (esclusive).
+        nfft (int): number of DFT points, specified as a positive integer.
+        method (str): 'fft' (zero-padded FFT over [0, fps/2], then subband) or 'zoom' (only the subband
+            bins, see welch_zoom).
+    Returns:
+        Sample frequencies as float32 numpy.ndarray with shape [num_freqs], and Power spectral density
+        or power spectrum as float32 numpy.ndarray with shape [..., num_freqs].
+    """
+    if method not in ('fft', 'zoom'):
+        raise ValueError(f"Welch method must be 'fft' or 'zoom', not {method!r}")
+    n = bvps.shape[-1]
+    seglength, overlap, band, Pfreqs = welch_band(float(fps), int(n), int(nfft), float(minHz), float(maxHz))
+    if method == 'zoom':
+        return Pfreqs.copy(), welch_zoom(bvps, fps, seglength, overlap, nfft, band)
+    # -- periodogram by Welch
+    _, P = welch(bvps, nperseg=seglength, noverlap=overlap, fs=fps, nfft=nfft, axis=-1)
+    # -- freq subband (0.65 Hz - 4.0 Hz)
+    Power = P[..., band].astype(np.float32)
+    return Pfreqs.copy(), Power
+
+@lru_cache(maxsize=128)
+def zoom_dft(nperseg, nfft, first, last):
+    """
+    Hann-windowed DFT matrix of a segment of 'nperseg' samples, restricted to the bins first..last
+    of an nfft-points DFT. Computed once per arguments.
+
+    Returns:
+        float64 numpy.ndarray with shape [nperseg, 2*num_bins] (real parts, then imaginary parts), and the
+        density scaling of the bins times fps (one-sided, as scipy.signal.welch).
+    """
+    bins = np.arange(first, last + 1)
+    win = 0.5 - 0.5*np.cos(2*np.pi*np.arange(nperseg)/nperseg)  # scipy's periodic 'hann'
+    arg = 2*np.pi*np.outer(np.arange(nperseg), bins)/nfft
+    D = np.concatenate((np.cos(arg), -np.sin(arg)), axis=1)*win[:, np.newaxis]
+    scale = np.full(bins.size, 2/np.sum(win**2))
+    scale[(bins == 0) | (2*bins == nfft)] /= 2
+    D.setflags(write=False)
+    scale.setflags(write=False)
+    return D, scale
+
+def welch_zoom(bvps, fps, nperseg, noverlap, nfft, band):
+    """
+    Welch's method (Hann window, constant detrending, density scaling, mean of the segments, as
+    scipy.signal.welch) evaluated only at the contiguous DFT bins 'band' of an nfft-points DFT.
+
+    The segments are multiplied by the band DFT matrix (zoom DFT) instead of being zero-padded to
+    nfft and transformed over the whole [0, fps/2] range: the cost depends on the number of bins
+    in the band, so a finer nfft only costs proportionally more bins.
+
+    Args:
+        bvps (numpy.ndarray): signals with shape [..., num_frames].
+        fps (float): frames per seconds.
+        nperseg (int): length of the segments.
+        noverlap (int): overlap of the segments.
+        nfft (int): number of DFT points, setting the bins spacing fps/nfft.
+        band (numpy.ndarray): contiguous indices of the DFT bins to evaluate.
+    Returns:
+        Power spectral density as float32 numpy.ndarray with shape [..., len(band)].
+    """
+    x = np.asarray(bvps, dtype=np.float64)
+    if len(band) == 0:
+        return np.zeros(x.shape[:-1] + (0,), dtype=np.float32)
+    D, scale = zoom_dft(int(nperseg), int(nfft), int(band[0]), int(band[-1]))
+    seg = np.lib.stride_tricks.sliding_window_view(x, int(nperseg), axis=-1)[..., ::int(nperseg) - int(noverlap), :]
+    Y = (seg - np.mean(seg, axis=-1, keepdims=True)) @ D
+    B = len(band)
+    P = np.mean(Y[..., :B]**2 + Y[..., B:]**2, axis=-2)*(scale/fps)
+    return P.astype(np.float32)
+
+def peak_bpm(Pfreqs, Power, interp=False):
+    """
+    Frequencies of the maxima of power spectra.
+
+    Args:
+        Pfreqs (float32 numpy.ndarray): evenly spaced frequencies in BPM with shape [num_freqs].
+        Power (float32 numpy.ndarray): power spectra with shape [..., num_freqs].
+        interp (bool): refine each maximum between the bins with a Gaussian through the three bins around
+            it (a parabola through their log powers), for a sub-bin precision even with a coarse nfft.
+    Returns:
+        BPMs as float32 numpy.ndarray with shape [...].
+    """
+    k = np.argmax(Power, axis=-1)
+    bpm = Pfreqs[k]
+    if not interp or Pfreqs.size < 3:
+        return bpm
+    kk = np.clip(k, 1, Pfreqs.size - 2)[..., np.newaxis]
+    a, b, c = (np.take_along_axis(Power, kk + d, axis=-1)[..., 0].astype(np.float64) for d in (-1, 0, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        la, lb, lc = np.log(a), np.log(b), np.log(c)
+        den = la - 2*lb + lc
+        delta = 0.5*(la - lc)/den
+    ok = (k == kk[..., 0]) & (den < 0) & np.isfinite(delta)
+    delta = np.where(ok, np.clip(delta, -0.5, 0.5), 0.0)
+    return (bpm + delta*(Pfreqs[1] - Pfreqs[0])).astype(np.float32)
+
+@lru_cache(maxsize=32)
+def sliding_welch_tables(fps, n, nfft=2048, minHz=0.65, maxHz=4.0):
+    """
+    Constant tables of SlidingWelch, computed once per (fps, n, nfft, minHz, maxHz).
+
+    Returns:
+        segment length L, lags of the Welch segments, frequencies of the sliding DFT bins (radians
+        per sample), DFT matrix of a segment [L, num_bins], DFT of the Hann window divided by L,
+        density scaling, and the subband frequencies in BPM.
+    """
+    seglength, overlap, band, Pfreqs = welch_band(fps, n, nfft, minHz, maxHz)
+    L = int(seglength)
+    step = L - int(overlap)
+    # lag of the last sample of each Welch segment w.r.t. the last sample of the window
+    lags = n - L - step*np.arange((n - int(overlap)) // step)
+    # bins at w, w - 2pi/L, w + 2pi/L and 0 (hann(j) = 0.5 - 0.25*exp(2pi*i*j/L) - 0.25*exp(-2pi*i*j/L))
+    w = 2*np.pi*band/nfft
+    omega = np.concatenate((w, w - 2*np.pi/L, w + 2*np.pi/L, [0.0]))
+    dft = np.exp(-1j*np.outer(np.arange(L), omega))
+    hann = 0.5 - 0.5*np.cos(2*np.pi*np.arange(L)/L)  # scipy's periodic 'hann'
+    hann_dft = hann @ dft[:, :band.size] / L
+    scale = np.full(band.size, 2/(fps*np.sum(hann**2)))
+    scale[(band == 0) | (2*band == nfft)] /= 2  # one-sided density, as scipy
+    for a in (lags, omega, dft, hann_dft, scale):
+        a.setflags(write=False)
+    return L, lags, omega, dft, hann_dft, scale, Pfreqs
+
+class SlidingWelch:
+    """
+    Incremental Welch spectrum of the last 'n' samples of one or more BVP signals, restricted
+    to the frequency subband (minHz, maxHz).
+
+    Each Welch segment is tracked by a sliding DFT evaluated only on the subband bins: the Hann
+    window is applied in the frequency domain (as a combination of three rectangular-window bins)
+    and the segment mean, itself a sliding DFT bin at 0 Hz, is removed through the DFT of the window.
+    A new sample costs O(num_freqs) instead of a full FFT, and the spectrum of the current window
+    is the one of Welch(last n samples, fps, minHz, maxHz, nfft), up to rounding. The sliding DFTs
+    are recomputed from the samples every 'resync' samples to keep the rounding errors bounded.
+
+    Every sample must be fed once, and must not change afterwards: the signal has to be causal,
+    as the settled POS samples of RppgStream. A BVP recomputed over the whole window at each
+    stride (per-window filtering and normalization, as in the realtime VHRroutine) doesn't
+    qualify: feeding only its newest samples would mix windows, use Welch on each window instead.
+
+    Example:
+        sw = SlidingWelch(fps, n)
+        for chunk in stream:  # chunk: [num_estimators, k] or [k]
+            sw.update(chunk)
+            if sw.ready:
+                bpm = sw.bpm()
+    """
+    def __init__(self, fps, n, minHz=0.65, maxHz=4.0, nfft=2048, num_estimators=1, resync=None):
+        """
+        Args:
+            fps (float): frames per seconds.
+            n (int): number of samples of the window (the num_frames of Welch).
+            minHz (float): lower bound of the frequency subband (esclusive).
+            maxHz (float): upper bound of the frequency subband (esclusive).
+            nfft (int): number of DFT points.
+            num_estimators (int): number of signals tracked together.
+            resync (int): samples between two exact recomputations of the sliding DFTs (default 8*n).
+        """
+        self.fps = float(fps)
+        self.n = int(n)
+        self.num_estimators = int(num_estimators)
+        self.resync = int(resync) if resync is not None else 8*self.n
+        self._L, self._lags, self._omega, self._dft, self._hann_dft, self._scale, self.Pfreqs = sliding_welch_tables(
+            self.fps, self.n, int(nfft), float(minHz), float(maxHz))
+        self._blocks = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all the samples.
+        """
+        self.count = 0
+        self._len = 0
+        self._since_resync = 0
+        self._buf = np.zeros((self.num_estimators, 2*self.n))
+        self._S = np.zeros((self.num_estimators, self._lags.size, self._omega.size), dtype=np.complex128)
+
+    @property
+    def ready(self):
+        """
+        True once the window holds 'n' samples.
+        """
+        return self.count >= self.n
+
+    def _block(self, k):
+        # For k new samples: buffer offsets (from the end) of the samples entering and leaving
+        # each segment, their rotations, and the rotation of the k steps.
+        # S(t) = exp(iw)*(S(t-1) - x(t-L)) + x(t)*exp(-iw(L-1))
+        if k not in self._blocks:
+            L, omega = self._L, self._omega
+            idx = -self._lags[:, np.newaxis] - k + np.arange(k)
+            rot = np.exp(1j*np.outer(np.arange(k-1, -1, -1), omega))
+            rot = np.concatenate((rot*np.exp(-1j*omega*(L-1)), -rot*np.exp(1j*omega)))
+            self._blocks[k] = (np.concatenate((idx, idx - L), axis=1), rot, np.exp(1j*k*omega))
+        return self._blocks[k]
+
+    def _resync(self):
+        idx = self._len - self._lags[:, np.newaxis] - self._L + np.arange(self._L)
+        self._S = self._buf[:, idx] @ self._dft
+        self._since_resync = 0
+
+    def update(self, bvps):
+        """
+        Add new samples at the end of the window.
+
+        Args:
+            bvps (float32 numpy.ndarray): new samples with shape [num_estimators, k], or [k] with a single estimator.
+        """
+        x = np.asarray(bvps, dtype=np.float64).reshape(self.num_estimators, -1)
+        k = x.shape[1]
+        if k == 0:
+            return
+        was_ready = self.ready
+        self.count += k
+        self._since_resync += k
+        if k >= self.n:
+            self._buf[:, :self.n] = x[:, -self.n:]
+            self._len = self.n
+        else:
+            if self._len + k > self._buf.shape[1]:
+                self._buf[:, :self.n] = self._buf[:, self._len-self.n:self._len]
+                self._len = self.n
+            self._buf[:, self._len:self._len+k] = x
+            self._len += k
+        if not self.ready:
+            return
+        if not was_ready or k >= self.n or self._since_resync >= self.resync:
+            self._resync()
+            return
+        idx, rot, rot_k = self._block(k)
+        self._S *= rot_k
+        self._S += self._buf[:, self._len + idx] @ rot
+
+    def spectrum(self):
+        """
+        Welch's spectrum of the current window (all zeros until the window is full).
+
+        Returns:
+            Sample frequencies in BPM as float32 numpy.ndarray with shape [num_freqs], and Power spectral density
+            as float32 numpy.ndarray with shape [num_estimators, num_freqs].
+        """
+        B = self.Pfreqs.size
+        if not self.ready:
+            return self.Pfreqs.copy(), np.zeros((self.num_estimators, B), dtype=np.float32)
+        S = self._S
+        Y = 0.5*S[..., :B] - 0.25*(S[..., B:2*B] + S[..., 2*B:3*B]) - S[..., -1:].real*self._hann_dft
+        Power = np.mean(Y.real**2 + Y.imag**2, axis=1)*self._scale
+        return self.Pfreqs.copy(), Power.astype(np.float32)
+
+    def bpm(self):
+        """
+        BPM of the current window (frequency of the spectrum peak), as in pyVHR.BPM.BPM.BVP_to_BPM.
+
+        Returns:
+            float32 BPM for a single estimator, otherwise float32 numpy.ndarray with shape [num_estimators];
+            0.0 until the window is full.
+        """
+        if not self.ready or self.Pfreqs.size == 0:
+            bpm = np.zeros(self.num_estimators, dtype=np.float32)
+        else:
+            Pfreqs, Power = self.spectrum()
+            bpm = Pfreqs[np.argmax(Power, axis=1)]
+        return bpm[0] if self.num_estimators == 1 else bpm
 
 def Welch_cuda(bvps, fps, minHz=0.65, maxHz=4.0, nfft=2048):
     """
@@ -53,6 +348,8 @@ def Welch_cuda(bvps, fps, minHz=0.65, maxHz=4.0, nfft=2048):
     Returns:
         Sample frequencies as float32 cupy.ndarray, and Power spectral density or power spectrum as float32 cupy.ndarray.
     """
+    if cusignal is None:
+        raise Exception("Welch_cuda needs cusignal, which is not installed!")
     _, n = bvps.shape
     if n < 256:
         seglength = n
@@ -69,39 +366,18 @@ def Welch_cuda(bvps, fps, minHz=0.65, maxHz=4.0, nfft=2048):
     Power = P[:, band]
     return Pfreqs, Power
 
-def circle_clustering(W, eps=0.01, theta0=None):
-    """ Provides a partition of elements with distance matrix W
-        Args:
-            W (float): distance matrix w_ij = w_ji = dist(X_i, X_j)
-        
-        Returns:
-            angles (float): the angles theta_i of elements in a circle representing X_i 
-    """    
-    # general vars
+@njit(['float64[:](float64[:,:], float64[:], float64[:], float64[:], float64)'], nogil=True, error_model='numpy')
+def kernel_circle_clustering(W, theta, C, S, eps):
+    """
+    Main loop of circle_clustering: updates theta (and C = W.cos(theta), S = W.sin(theta)) in place
+    until no angle changes by more than eps. Please refer to pyVHR.BPM.utils.circle_clustering.
+    """
     PI = np.pi
     PI2 = 2*PI
     n = W.shape[0]
-
-    # param check
-    if theta0 is None:
-        theta = PI2*np.random.rand(n)  # init. values in [0, 2*PI]
-    else:
-        theta = theta0
-
-    # preliminar computations 
-    sin_t = np.sin(theta)
-    cos_t = np.cos(theta)
-    C = np.dot(W, cos_t)
-    S = np.dot(W, sin_t)
-
-    # main loop
     ok = True
-    rounds = 0
     while ok:
         ok = False
-        rounds += 1
-        nchanges = 0
-
         # loop on thetas
         for k in range(n):
             old = theta[k]
@@ -116,51 +392,55 @@ def circle_clustering(W, eps=0.01, theta0=None):
             # check condition
             if abs(old-theta[k]) > eps:
                 ok = True
-                nchanges += 1
-                # update Ck & Sk by elementwise product and diff
-                C += np.multiply(W[k,:], np.repeat(np.cos(theta[k]) - np.cos(old), n))
-                S += np.multiply(W[k,:], np.repeat(np.sin(theta[k]) - np.sin(old), n)) 
-
+                # update Ck & Sk
+                dc = np.cos(theta[k]) - np.cos(old)
+                ds = np.sin(theta[k]) - np.sin(old)
+                for j in range(n):
+                    C[j] += W[k, j]*dc
+                for j in range(n):
+                    S[j] += W[k, j]*ds
     return theta
 
+def circle_clustering(W, eps=0.01, theta0=None):
+    """ Provides a partition of elements with distance matrix W
+        Args:
+            W (float): distance matrix w_ij = w_ji = dist(X_i, X_j)
+            eps (float): convergence threshold on the angles.
+            theta0 (float): initial angles (updated in place when float64); random in [0, 2*PI] if None,
+                so a fixed theta0 makes the result deterministic.
+        
+        Returns:
+            angles (float): the angles theta_i of elements in a circle representing X_i 
+    """    
+    W = np.asarray(W, dtype=np.float64)
+    n = W.shape[0]
+
+    # param check
+    if theta0 is None:
+        theta = 2*np.pi*np.random.rand(n)  # init. values in [0, 2*PI]
+    else:
+        theta = np.asarray(theta0, dtype=np.float64)
+
+    # preliminar computations 
+    C = np.dot(W, np.cos(theta))
+    S = np.dot(W, np.sin(theta))
+
+    # main loop (numba)
+    return kernel_circle_clustering(W, theta, C, S, np.float64(eps))
+
 def optimize_partition(theta, opt_factor=.5):
   n = theta.shape[0]
   T = theta[:,None] - theta  # x[:,None] adds a second axis to the array
   T = np.cos(T) - np.eye(n)  # matrix of cosine diff
   
   # compute partitions P,Q
-  P = []
-  Q = []
   Tmean = np.mean(theta)
-  for idx,th in enumerate(theta):
-    if np.sign(np.sin(Tmean-th)) > 0:
-      P.append(idx)
-    else:
-      Q.append(idx)
-
-  # adjust partitions P,Q
-  OK = False
-  while OK:
-    OK = False
-    for i in range(n):
-      if i in P:
-        if np.sum(T[i,P]) < np.sum(T[i,Q]) and len(P) > 1:
-          Q.append(i)
-          P.remove(i)
-          OK = True
-      else: 
-        if np.sum(T[i,P]) > np.sum(T[i,Q]) and len(Q) > 1:
-          Q.remove(i)
-          P.append(i)
-          OK = True
-    
-  # pull out outliers from P and Q
-  A = []
-  B = []
-  Z = []
-  for i in P:
-    A.append(np.sum(T[i,P]) / (T[i,P].shape[0]-1))
-  
+  inP = np.sign(np.sin(Tmean-theta)) > 0
+  P = np.flatnonzero(inP)
+  Q = np.flatnonzero(~inP)
+
+  # pull out outliers from P and Q (mean cosine with the other members of the same partition)
+  A = np.sum(T[np.ix_(P, P)], axis=1) / (P.shape[0]-1)
   M = np.max(A)
   M_idx = np.argmax(A)
   S = np.std(A)
@@ -168,13 +448,10 @@ def optimize_partition(theta, opt_factor=.5):
   L = M - opt_factor*S 
 
   # prune outliers in P
-  for idx,i in enumerate(P):
-    if M_idx != idx and A[idx] < L:
-      Z.append(i)  
+  outP = A < L
+  outP[M_idx] = False
 
-  for i in Q:
-    B.append(np.sum(T[i,Q]) / (T[i,Q].shape[0]-1))
-  
+  B = np.sum(T[np.ix_(Q, Q)], axis=1) / (Q.shape[0]-1)
   M = np.max(B)
   M_idx = np.argmax(B)
   S = np.std(B)
@@ -182,14 +459,14 @@ def optimize_partition(theta, opt_factor=.5):
   L = M - opt_factor*S  
 
   # prune outliers in Q
-  for idx,i in enumerate(Q):
-    if M_idx != idx and B[idx] < L:
-      Z.append(i)
+  outQ = B < L
+  outQ[M_idx] = False
 
-  P = list(set(P) - set(Z))
+  Z = P[outP].tolist() + Q[outQ].tolist()
+  P = list(set(P.tolist()) - set(Z))
   if len(P) == 0:
     print('ERROR empty list!')
-  Q = list(set(Q) - set(Z))
+  Q = list(set(Q.tolist()) - set(Z))
   if len(Q) == 0:
     print('ERROR empty list!')
 
@@ -198,13 +475,86 @@ def optimize_partition(theta, opt_factor=.5):
 def gaussian(x,a,mu,sigma):
     return a*np.exp(-(x-mu)**2/(2*sigma**2))
 
-def gaussian_fit(p, x, mu, max):
+class GaussianFitResult:
+  """
+  Fit statistics of gaussian_fit(..., method='fast'), as in lmfit's ModelResult (one varying parameter).
+  """
+  def __init__(self, residual, sigma):
+    self.ndata = residual.size
+    self.nvarys = 1
+    self.nfree = self.ndata - self.nvarys
+    self.residual = residual
+    self.sigma = sigma
+    self.chisqr = max(float(residual @ residual), 1.e-250*self.ndata)
+    self.redchi = self.chisqr / max(1, self.nfree)
+    neg2_log_likel = self.ndata*np.log(self.chisqr/self.ndata)
+    self.aic = neg2_log_likel + 2*self.nvarys
+    self.bic = neg2_log_likel + np.log(self.ndata)*self.nvarys
+
+def gaussian_fit(p, x, mu, max, method='lmfit'):
+  """
+  Least squares fit of the Gaussian max*exp(-(x-mu)^2/(2*sigma^2)) to p, with fixed mu and max.
+
+  Args:
+    p (float32 numpy.ndarray): PSD values.
+    x (float32 numpy.ndarray): PSD frequencies.
+    mu (float): Gaussian mean (the peak frequency).
+    max (float): Gaussian amplitude.
+    method (str): 'lmfit' fits with an lmfit.Model; 'fast' starts from the parabola through the log powers of
+      the three bins around mu (ln p = ln max - (x-mu)^2/(2*sigma^2)) and refines sigma with a few damped
+      Gauss-Newton steps, giving the same sigma, chisqr and aic up to the fit tolerance in a fraction of the time.
+  Returns:
+    the fit result (lmfit's ModelResult or GaussianFitResult, both with chisqr, redchi and aic), the fitted
+    Gaussian evaluated at x, and sigma.
+  """
+  if method == 'fast':
+    return _gaussian_fit_fast(p, x, mu, max)
   gmodel = Model(gaussian, independent_vars=['x', 'mu', 'a'])
   result = gmodel.fit(p, x=x, a=max, mu=mu, sigma=1)
   sigma = result.params['sigma'].value
   g = gaussian(x, max, mu, sigma)
   return result, g, sigma
 
+def _gaussian_fit_fast(p, x, mu, max, max_iter=30, tol=1e-8):
+  p = np.asarray(p, dtype=np.float64)
+  x = np.asarray(x, dtype=np.float64)
+  d2 = (x - mu)**2
+
+  # initial sigma: log-parabola at mu (one bin if it can't be computed)
+  k = int(np.argmin(d2))
+  h = abs(x[1] - x[0]) if x.size > 1 else 1.0
+  sigma = h
+  if 0 < k < x.size-1 and np.all(p[k-1:k+2] > 0):
+    curv = (np.log(p[k-1]) - 2*np.log(p[k]) + np.log(p[k+1])) / h**2  # -1/sigma^2
+    if curv < 0:
+      sigma = 1/np.sqrt(-curv)
+
+  # damped Gauss-Newton on sigma
+  g = max*np.exp(-d2/(2*sigma**2))
+  r = p - g
+  chisqr = r @ r
+  for _ in range(max_iter):
+    J = g*d2/sigma**3  # d g / d sigma
+    JJ = J @ J
+    if JJ <= 0:
+      break
+    step = (J @ r) / JJ
+    if not np.isfinite(step):
+      break
+    while abs(step) > tol*sigma:
+      if sigma + step > 0:
+        g_new = max*np.exp(-d2/(2*(sigma + step)**2))
+        r_new = p - g_new
+        chisqr_new = r_new @ r_new
+        if chisqr_new <= chisqr:
+          break
+      step /= 2
+    if abs(step) <= tol*sigma:
+      break
+    sigma += step
+    g, r, chisqr = g_new, r_new, chisqr_new
+  return GaussianFitResult(r, sigma), g, sigma
+
 def PSD_SNR(PSD, f_peak, sigma, freqs):
   """ PSD estimate based SNR """
   
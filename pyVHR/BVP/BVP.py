@@ -115,6 +115,10 @@ def RGB_sig_to_BVP(windowed_sig, fps, device_type=None, method=None, params={}):
     if 'fps' in params and params['fps'] == 'adaptive':
         params['fps'] = np.float32(fps)
 
+    batch_method = getattr(method, 'batch_method', None) if device_type == 'cpu' else None
+    if batch_method is not None and _can_batch(windowed_sig):
+        return _RGB_sig_to_BVP_batched(windowed_sig, batch_method, params)
+
     bvps = []
     for sig in windowed_sig:
         copy_signal = np.copy(sig)
@@ -125,20 +129,61 @@ def RGB_sig_to_BVP(windowed_sig, fps, device_type=None, method=None, params={}):
             bvp = signals_to_bvps_torch(copy_signal, method, params)
         elif device_type == 'cuda':
             bvp = signals_to_bvps_cuda(copy_signal, method, params)
+        bvps.append(_drop_nan_estimators(bvp))
 
-	# check for nan  
-        bvp_nonan = []
-        for i in range(bvp.shape[0]):
-           if not np.isnan(bvp[i]).any():
-              bvp_nonan.append(bvp[i])
-        if len(bvp_nonan) == 0:            # if empty
-           bvps.append(np.zeros((0, 1), dtype=np.float32))
-        else:
-           bvps.append(np.array(bvp_nonan, dtype=np.float32))
+    return bvps
+
+
+# max number of elements of a stack of windows passed to a 'batch_method' at once
+BATCH_MAX_ELEMENTS = 2**18
+
+
+def _can_batch(windowed_sig):
+    """
+    True if the windows can be stacked: RGB windows that all have the same (non empty) shape.
+    """
+    if len(windowed_sig) == 0:
+        return False
+    shape = np.shape(windowed_sig[0])
+    return len(shape) == 3 and shape[0] > 0 and shape[1] == 3 and all(np.shape(w) == shape for w in windowed_sig)
 
+
+def _RGB_sig_to_BVP_batched(windowed_sig, batch_method, params):
+    """
+    RGB_sig_to_BVP for a method with batch support (see pyVHR.BVP.methods): windows are
+    stacked along the estimators axis and converted with one call per chunk of windows.
+    """
+    e, c, f = np.shape(windowed_sig[0])
+    chunk = max(1, BATCH_MAX_ELEMENTS // (e * c * f))
+    bvps = []
+    for w0 in range(0, len(windowed_sig), chunk):
+        windows = windowed_sig[w0:w0 + chunk]
+        # copies only this chunk of windows when they are views on the whole signal
+        stack = np.stack(windows).reshape(len(windows) * e, c, f)
+        if len(params) > 0:
+            bvp = batch_method(stack, **params)
+        else:
+            bvp = batch_method(stack)
+        bvp = np.asarray(bvp).reshape(len(windows), e, -1)
+        nan_est = np.isnan(bvp).any(axis=2)
+        for i in range(len(windows)):
+            bvps.append(_drop_nan_estimators(bvp[i], nan_est[i]))
     return bvps
 
 
+def _drop_nan_estimators(bvp, nan_est=None):
+    """
+    Remove the estimators with NaN values from a BVP window [num_estimators, num_frames].
+    """
+    if nan_est is None:
+        nan_est = np.isnan(bvp).any(axis=1)
+    if nan_est.all():            # if empty
+       return np.zeros((0, 1), dtype=np.float32)
+    if nan_est.any():
+        bvp = bvp[~nan_est]
+    return np.array(bvp, dtype=np.float32)
+
+
 def concatenate_BVPs(list_of_BVPs):
     """
     Join a list of windowed BVPs. There must be the same number of windows, and each one must have the same number of frames.
@@ -16,6 +16,12 @@ An rPPG method must accept theese parameters:
     > signal -> RGB signal as float32 ndarray with shape [num_estimators, rgb_channels, num_frames], or a custom signal.
     > **kargs [OPTIONAL] -> usefull parameters passed to the filter method.
 It must return a BVP signal as float32 ndarray with shape [num_estimators, num_frames].
+
+BATCH SUPPORT
+A method that processes every estimator independently can declare it with the attribute
+'batch_method' (itself, or an equivalent method that scales better with num_estimators).
+pyVHR.BVP.BVP.RGB_sig_to_BVP then stacks all the windows along the estimators axis and
+calls 'batch_method' once, instead of once per window.
 """
 
 
@@ -84,7 +90,8 @@ def cpu_LGI(signal):
     Pilz, C. S., Zaunseder, S., Krajewski, J., & Blazek, V. (2018). Local group invariance for heart rate estimation from face videos in the wild. In Proceedings of the IEEE Conference on Computer Vision and Pattern Recognition Workshops (pp. 1254-1262).
     """
     X = signal
-    U, _, _ = np.linalg.svd(X)
+    # only U (3x3) is needed: skip the [num_frames, num_frames] right singular vectors
+    U, _, _ = np.linalg.svd(X, full_matrices=False)
     S = U[:, :, 0]
     S = np.expand_dims(S, 2)
     sst = np.matmul(S, np.swapaxes(S, 1, 2))
@@ -143,6 +150,60 @@ def cpu_POS(signal, **kargs):
     return H
 
 
+def cpu_POS_fast(signal, **kargs):
+    """
+    POS method on CPU using Numpy, with all the sliding windows processed at once.
+
+    Same output as cpu_POS: windows are built with sliding_window_view and normalized,
+    projected and tuned in batches of up to 'batch' windows (fewer when num_estimators is large,
+    so that a batch holds at most ~4M samples); the overlap-add runs over the
+    window offsets, adding window contributions to each frame in the same order as cpu_POS.
+
+    The dictionary parameters are: {'fps':float, 'batch':int (optional, default 1024)}.
+
+    Wang, W., den Brinker, A. C., Stuijk, S., & de Haan, G. (2016). Algorithmic principles of remote PPG. IEEE Transactions on Biomedical Engineering, 64(7), 1479-1491.
+    """
+    eps = 10**-9
+    X = signal
+    e, c, f = X.shape            # e = #estimators, c = 3 rgb ch., f = #frames
+    w = int(1.6 * kargs['fps'])   # window length
+    batch = max(1, min(int(kargs.get('batch', 1024)), 2**22 // max(1, e * c * w)))
+
+    H = np.zeros((e, f))
+    if w <= 0 or f <= w:
+        return H
+    # windows m = 1 .. f-w (as in cpu_POS, which starts at n = w)
+    win = np.lib.stride_tricks.sliding_window_view(X, w, axis=2)   # [e, c, f-w+1, w]
+    # Copy windows keeping the memory order of the channel/time axes of the input, so
+    # that Numpy sums each window mean in the same order as cpu_POS does.
+    time_inner = X.strides[2] <= X.strides[1]
+    for m0 in range(1, f - w + 1, batch):
+        m1 = min(m0 + batch, f - w + 1)
+        # Temporal normalization (5)
+        if time_inner:
+            Cn = np.ascontiguousarray(win[:, :, m0:m1, :])         # [e, c, b, w]
+        else:
+            Cn = np.ascontiguousarray(win[:, :, m0:m1, :].transpose(0, 2, 3, 1)).transpose(0, 3, 1, 2)
+        M = 1.0 / (np.mean(Cn, axis=3) + eps)
+        Cn = np.multiply(np.expand_dims(M, axis=3), Cn)
+
+        # Projection (6): P = [[0, 1, -1], [-2, 1, 1]]
+        Cn = Cn.astype(np.float64)
+        S1 = Cn[:, 1] - Cn[:, 2]                                   # [e, b, w]
+        S2 = -2 * Cn[:, 0] + Cn[:, 1] + Cn[:, 2]
+
+        # Tuning (7)
+        alpha = np.std(S1, axis=2) / (eps + np.std(S2, axis=2))
+        Hn = np.add(S1, np.expand_dims(alpha, axis=2) * S2)
+        Hnm = Hn - np.expand_dims(np.mean(Hn, axis=2), axis=2)
+
+        # Overlap-adding (8): offsets in decreasing order add earlier windows first
+        for j in range(w - 1, -1, -1):
+            H[:, m0 + j:m1 + j] += Hnm[:, :, j]
+
+    return H
+
+
 def cupy_POS(signal, **kargs):
     """
     POS method on GPU using Cupy.
@@ -259,15 +320,12 @@ def cpu_OMIT(signal):
     Álvarez Casado, C., Bordallo López, M. (2022). Face2PPG: An unsupervised pipeline for blood volume pulse extraction from faces. arXiv (eprint 2202.04101).
     """
 
-    bvp = []
-    for i in range(signal.shape[0]):
-        X = signal[i]
-        Q, R = np.linalg.qr(X)
-        S = Q[:, 0].reshape(1, -1)
-        P = np.identity(3) - np.matmul(S.T, S)
-        Y = np.dot(P, X)
-        bvp.append(Y[1, :])
-    bvp = np.array(bvp)
+    X = signal
+    Q, R = np.linalg.qr(X)                                   # stacked QR, Q: [e, 3, 3]
+    S = Q[:, :, 0]
+    P = np.identity(3) - np.expand_dims(S, 2) * np.expand_dims(S, 1)
+    Y = np.matmul(P, X)
+    bvp = Y[:, 1, :]
     return bvp
     
 def cpu_ICA(signal, **kargs):
@@ -433,3 +491,14 @@ def cpu_SSR(raw_signal,**kargs):
     bvp = P
     bvp = np.expand_dims(bvp,axis=0)
     return bvp
+
+
+# ------------------------------------------------------------------------------------- #
+#                                     BATCH SUPPORT                                     #
+# ------------------------------------------------------------------------------------- #
+
+for _method in (cpu_CHROM, cpu_LGI, cpu_POS_fast, cpu_PBV, cpu_GREEN, cpu_OMIT):
+    _method.batch_method = _method
+# cpu_POS stacks its projection matrix num_estimators times (quadratic in the stack
+# size): batches go to cpu_POS_fast, which gives the same output.
+cpu_POS.batch_method = cpu_POS_fast
@@ -72,6 +72,8 @@ class MultiMethodSuite():
 
         # -- SIG processing
         sig_processing = SignalProcessing()
+        if self.sigdict.get('cache_dir', 'None') != 'None':
+            sig_processing.set_cache_dir(self.sigdict['cache_dir'])
         if bool(self.sigdict['cuda']):
             sig_processing.display_cuda_device()
             sig_processing.choose_cuda_device(int(self.sigdict['cuda_device']))
@@ -263,10 +265,10 @@ class MultiMethodSuite():
                 elif str(self.bpmdict['type']) == 'clustering':
                     if bool(self.sigdict['cuda']):
                         bpmES = BVP_to_BPM_PSD_clustering_cuda(bvp_element, fps, minHz=float(
-                            self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+                            self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']), gauss_fit=self.bpmdict.get('gauss_fit', 'lmfit'))
                     else:
                         bpmES = BVP_to_BPM_PSD_clustering(bvp_element, fps, minHz=float(
-                            self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+                            self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']), gauss_fit=self.bpmdict.get('gauss_fit', 'lmfit'))
                 if bpmES is None:
                     print("[ERROR] BPM extraction error; check cfg params!")
                     continue
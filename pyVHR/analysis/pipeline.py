@@ -15,6 +15,10 @@ from pyVHR.BVP.methods import *
 from pyVHR.BVP.filters import *
 from inspect import getmembers, isfunction
 import os.path
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pyVHR.deepRPPG.mtts_can import *
 from pyVHR.deepRPPG.hr_cnn import *
 from pyVHR.extraction.utils import *
@@ -40,12 +44,14 @@ class Pipeline():
                     methods=['cpu_CHROM, cpu_POS, cpu_LGI'], 
                     estimate='holistic', 
                     movement_thrs=[10, 5, 2],
+                    gauss_fit='lmfit',
                     patch_size=30, 
                     RGB_LOW_HIGH_TH = (75,230),
                     Skin_LOW_HIGH_TH = (75, 230),
                     pre_filt=False, 
                     post_filt=True, 
-                    verb=True):
+                    verb=True,
+                    cache_dir=None):
         """ 
         Runs the pipeline on a specific video file.
 
@@ -70,6 +76,8 @@ class Pipeline():
                 - if patches: 'medians', 'clustering', the method for BPM estimate on each window 
             movement_thrs:
                 - Thresholds for movements filtering (eg.:[10, 5, 2])
+            gauss_fit:
+                - 'lmfit' (default) or 'fast', the Gaussian fit of the clusters PSDs used by 'clustering' (see pyVHR.BPM.utils.gaussian_fit)
             patch_size:
                 - the size of the square patch, in pixels
             RGB_LOW_HIGH_TH: 
@@ -82,6 +90,8 @@ class Pipeline():
                 - True, uses bandpass filter on the estimated BVP signal
             verb:
                 - True, shows the main steps  
+            cache_dir:
+                - (default None) directory where the extracted RGB signal is cached and re-used
         """
 
         # set landmark list
@@ -92,6 +102,7 @@ class Pipeline():
         assert os.path.isfile(videoFileName), "The video file does not exists!"
         
         sig_processing = SignalProcessing()
+        sig_processing.set_cache_dir(cache_dir)
         av_meths = getmembers(pyVHR.BVP.methods, isfunction)
         available_methods = [am[0] for am in av_meths]
 
@@ -236,7 +247,7 @@ class Pipeline():
                 #else:
                 #bpmES = BPM_clustering(sig_processing, bvps_win, winsize, movement_thrs=[15, 15, 15], fps=fps, opt_factor=0.5)
                 ma = MotionAnalysis(sig_processing, winsize, fps)
-                bpmES = BPM_clustering(ma, bvps_win, fps, winsize, movement_thrs=movement_thrs, opt_factor=0.5)
+                bpmES = BPM_clustering(ma, bvps_win, fps, winsize, movement_thrs=movement_thrs, opt_factor=0.5, gauss_fit=gauss_fit)
 
 
 
@@ -265,12 +276,14 @@ class Pipeline():
                     method='cupy_POS', 
                     estimate='holistic', 
                     movement_thrs=[10, 5, 2],
+                    gauss_fit='lmfit',
                     patch_size=30, 
                     RGB_LOW_HIGH_TH = (75,230),
                     Skin_LOW_HIGH_TH = (75, 230),
                     pre_filt=False, 
                     post_filt=True, 
-                    verb=True):
+                    verb=True,
+                    cache_dir=None):
         """ 
         Runs the pipeline on a specific video file.
 
@@ -295,6 +308,8 @@ class Pipeline():
                 - if patches: 'medians', 'clustering', the method for BPM estimate on each window 
             movement_thrs:
                 - Thresholds for movements filtering (eg.:[10, 5, 2])
+            gauss_fit:
+                - 'lmfit' (default) or 'fast', the Gaussian fit of the clusters PSDs used by 'clustering' (see pyVHR.BPM.utils.gaussian_fit)
             patch_size:
                 - the size of the square patch, in pixels
             RGB_LOW_HIGH_TH: 
@@ -307,6 +322,8 @@ class Pipeline():
                 - True, uses bandpass filter on the estimated BVP signal
             verb:
                 - True, shows the main steps  
+            cache_dir:
+                - (default None) directory where the extracted RGB signal is cached and re-used
         """
 
         # set landmark list
@@ -317,6 +334,7 @@ class Pipeline():
         assert os.path.isfile(videoFileName), "The video file does not exists!"
         
         sig_processing = SignalProcessing()
+        sig_processing.set_cache_dir(cache_dir)
         av_meths = getmembers(pyVHR.BVP.methods, isfunction)
         available_methods = [am[0] for am in av_meths]
 
@@ -450,7 +468,7 @@ class Pipeline():
                 #else:
                 #bpmES = BPM_clustering(sig_processing, bvps_win, winsize, movement_thrs=[15, 15, 15], fps=fps, opt_factor=0.5)
                 ma = MotionAnalysis(sig_processing, winsize, fps)
-                bpmES = BPM_clustering(ma, bvps_win, fps, winsize, movement_thrs=movement_thrs, opt_factor=0.5)
+                bpmES = BPM_clustering(ma, bvps_win, fps, winsize, movement_thrs=movement_thrs, opt_factor=0.5, gauss_fit=gauss_fit)
 
 
 
@@ -470,7 +488,7 @@ class Pipeline():
 
         return bvps_win, timesES, bpmES
 
-    def run_on_dataset(self, configFilename, verb=True):
+    def run_on_dataset(self, configFilename, verb=True, workers=None):
         """ 
         Like the 'run_on_video' function, it runs on all videos of a specific 
         dataset as specified by the loaded configuration file.
@@ -481,20 +499,52 @@ class Pipeline():
             verb:
                 - False - not verbose
                 - True - show the main steps
+            workers:
+                - None - process the videos one after the other in this process
+                - int - process the videos in a pool of 'workers' processes, each one
+                  with its own SignalProcessing and skin extractor. A video that raises
+                  (or crashes its worker) is reported and skipped, the other videos
+                  are still processed; its index is stored in 'self.failedVideoIdx'.
+
+        Returns:
+            A TestResult with the rows ordered by video index, as in the sequential run.
         """
         # -- cfg file  
         self.configFilename = configFilename
         self.parse_cfg(self.configFilename)
-        
-        # -- cfg parser
-        parser = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
-        parser.optionxform = str
-        if not parser.read(self.configFilename):
-            raise FileNotFoundError(self.configFilename)
         if verb:
             self.__verbose('a')
 
         # -- dataset & cfg params
+        dataset = self._load_dataset()
+
+        # -- catch data (object)
+        res = TestResult()
+
+        # set video idx
+        self.videoIdx = [int(v) for v in range(len(dataset.videoFilenames))]
+        self.failedVideoIdx = []
+
+        if workers is None:
+            # -- SIG processing
+            sig_processing = self._make_sig_processing(verb)
+
+            # -- loop on videos
+            for v in self.videoIdx:
+                rows = self._run_video(v, dataset, sig_processing, verb)
+                for row in rows or []:
+                    self._add_row(res, row)
+            return res
+
+        if verb:
+            print(f" -  workers: {workers}")
+        video_rows = self._run_videos_parallel(int(workers), verb)
+        for v in self.videoIdx:
+            for row in video_rows.get(v) or []:
+                self._add_row(res, row)
+        return res
+
+    def _load_dataset(self):
         if 'path' in self.datasetdict and self.datasetdict['path'] != 'None':
             dataset = datasetFactory(self.datasetdict['dataset'], 
                                     videodataDIR=self.datasetdict['videodataDIR'], 
@@ -504,12 +554,16 @@ class Pipeline():
             dataset = datasetFactory(self.datasetdict['dataset'], 
                                     videodataDIR=self.datasetdict['videodataDIR'], 
                                     BVPdataDIR=self.datasetdict['BVPdataDIR'])
+        return dataset
 
-        # -- catch data (object)
-        res = TestResult()
-
-        # -- SIG processing
+    def _make_sig_processing(self, verb):
+        """ 
+        Builds the SignalProcessing (skin extractor, patches, color thresholds) 
+        described by the [SIG] section of the loaded configuration file.
+        """
         sig_processing = SignalProcessing()
+        if self.sigdict.get('cache_dir', 'None') != 'None':
+            sig_processing.set_cache_dir(self.sigdict['cache_dir'])
         if eval(self.sigdict['cuda']):
             sig_processing.display_cuda_device()
             sig_processing.choose_cuda_device(int(self.sigdict['cuda_device']))
@@ -558,171 +612,217 @@ class Pipeline():
             self.sigdict['skin_color_low_threshold'])
         SkinProcessingParams.RGB_HIGH_TH = np.int32(
             self.sigdict['skin_color_high_threshold'])
+        return sig_processing
 
-        # set video idx
-        self.videoIdx = [int(v) for v in range(len(dataset.videoFilenames))]
-
-        # -- loop on videos
-        for v in self.videoIdx:
-
-            ####if v != 5: continue     ##### to remove
-
-            if verb:
-                print("\n## videoID: %d" % (v))
-
-            # -- ground-truth signal
-            try:
-                fname = dataset.getSigFilename(v)
-                sigGT = dataset.readSigfile(fname)
-            except:
-                continue
-            winSizeGT = int(self.sigdict['winSize'])
-            bpmGT, timesGT = sigGT.getBPM(winSizeGT)
+    def _run_videos_parallel(self, workers, verb):
+        """ 
+        Runs '_run_video' on every video of 'self.videoIdx' in a spawned process pool.
+        Returns a dict {videoIdx: rows}; failed videos are left out.
 
-            # -- video file name
-            videoFileName = dataset.getVideoFilename(v)
-            print(videoFileName)
-            fps = get_fps(videoFileName)
+        A worker that dies (e.g. a segfault in a decoder) breaks the whole pool, so the
+        videos still pending at that point are run again one at a time: the first one
+        that breaks the single-worker pool is the culprit and gets dropped.
+        """
+        video_rows = {}
+        pending = list(self.videoIdx)
+        max_workers = max(1, workers)
+        while pending:
+            broken = []
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(pending)),
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_dataset_worker_init,
+                                     initargs=(type(self), self.configFilename, verb)) as pool:
+                futures = [(v, pool.submit(_dataset_worker_run, v)) for v in pending]
+                for v, future in futures:
+                    try:
+                        rows, error = future.result()
+                    except BrokenProcessPool:
+                        broken.append(v)
+                        continue
+                    if error is not None:
+                        self._video_failed(v, error)
+                    else:
+                        video_rows[v] = rows
+            if broken and max_workers == 1:
+                self._video_failed(broken.pop(0), "worker process died")
+            max_workers = 1
+            pending = broken
+        return video_rows
+
+    def _video_failed(self, v, error):
+        print(f"[ERROR] videoID {v} skipped: {error}")
+        self.failedVideoIdx.append(v)
+
+    def _add_row(self, res, row):
+        res.newDataSerie()
+        for key, value in row.items():
+            res.addData(key, value)
+        res.addDataSerie()
+
+    def _run_video(self, v, dataset, sig_processing, verb=True):
+        """ 
+        Runs the pipeline of the loaded configuration file on the v-th video of 'dataset'.
 
-            sig_processing.set_total_frames(
-                int(self.sigdict['tot_sec'])*fps)
+        Returns:
+            The list of the result rows (one for each method), or None if the 
+            ground-truth signal can't be read.
+        """
+        if verb:
+            print("\n## videoID: %d" % (v))
+
+        # -- ground-truth signal
+        try:
+            fname = dataset.getSigFilename(v)
+            sigGT = dataset.readSigfile(fname)
+        except:
+            return None
+        winSizeGT = int(self.sigdict['winSize'])
+        bpmGT, timesGT = sigGT.getBPM(winSizeGT)
+
+        # -- video file name
+        videoFileName = dataset.getVideoFilename(v)
+        print(videoFileName)
+        fps = get_fps(videoFileName)
 
-            ## 3. ROI selection
-            sig = []
-            if str(self.sigdict['approach']) == 'holistic':
-                # mean extraction with holistic
-                sig = sig_processing.extract_holistic(videoFileName)
-            elif str(self.sigdict['approach']) == 'patches':
-                # mean extraction with patches
-                sig = sig_processing.extract_patches(
-                    videoFileName, str(self.sigdict['patches']), str(self.sigdict['type']))
+        sig_processing.set_total_frames(
+            int(self.sigdict['tot_sec'])*fps)
 
-            ## 4. sig windowing
-            windowed_sig, timesES = sig_windowing(sig, int(self.sigdict['winSize']), 1, fps)
+        ## 3. ROI selection
+        sig = []
+        if str(self.sigdict['approach']) == 'holistic':
+            # mean extraction with holistic
+            sig = sig_processing.extract_holistic(videoFileName)
+        elif str(self.sigdict['approach']) == 'patches':
+            # mean extraction with patches
+            sig = sig_processing.extract_patches(
+                videoFileName, str(self.sigdict['patches']), str(self.sigdict['type']))
 
-            # -- loop on methods
-            for m in self.methods:
-                if verb:
-                    app = str(self.sigdict['approach'])
-                    print(f'## method: {str(m)} ({app})')
-
-                ## 5. PRE FILTERING
-                filtered_windowed_sig = windowed_sig
-
-                # -- color threshold - applied only with patches
-                #if str(self.sigdict['approach']) == 'patches':
-                #    filtered_windowed_sig = apply_filter(windowed_sig, rgb_filter_th,
-                #        params={'RGB_LOW_TH':  np.int32(self.bvpdict['color_low_threshold']),
-                #                'RGB_HIGH_TH': np.int32(self.bvpdict['color_high_threshold'])})
-
-                # -- custom filters
-                prefilter_list = ast.literal_eval(self.methodsdict[m]['pre_filtering'])
-                if len(prefilter_list) > 0:
-                    for f in prefilter_list:
-                        if verb:
-                            print("  pre-filter: %s" % f)
-                        fdict = dict(parser[f].items())
-                        if fdict['path'] != 'None':
-                            # custom path
-                            spec = util.spec_from_file_location(fdict['name'], fdict['path'])
-                            mod = util.module_from_spec(spec)
-                            spec.loader.exec_module(mod)
-                            method_to_call = getattr(mod, fdict['name'])
-                        else:
-                            # package path
-                            module = import_module('pyVHR.BVP.filters')
-                            method_to_call = getattr(module, fdict['name'])
-                        filtered_windowed_sig = apply_filter(filtered_windowed_sig, method_to_call, fps=fps, params=ast.literal_eval(fdict['params']))
-
-                ## 6. BVP extraction
-                if self.methodsdict[m]['path'] != 'None':
-                    # custom path
-                    spec = util.spec_from_file_location(self.methodsdict[m]['name'], self.methodsdict[m]['path'])
-                    mod = util.module_from_spec(spec)
-                    spec.loader.exec_module(mod)
-                    method_to_call = getattr(mod, self.methodsdict[m]['name'])
-                else:
-                    # package path
-                    module = import_module('pyVHR.BVP.methods')
-                    method_to_call = getattr(module, self.methodsdict[m]['name'])
-                bvps_win = RGB_sig_to_BVP(filtered_windowed_sig, fps,
-                                      device_type=self.methodsdict[m]['device_type'], 
-                                      method=method_to_call, 
-                                      params=ast.literal_eval(self.methodsdict[m]['params']))
-
-                ## 7. POST FILTERING
-                postfilter_list = ast.literal_eval(self.methodsdict[m]['post_filtering'])
-                if len(postfilter_list) > 0:
-                    for f in postfilter_list:
-                        if verb:
-                            print("  post-filter: %s" % f)
-                        fdict = dict(parser[f].items())
-                        if fdict['path'] != 'None':
-                            # custom path
-                            spec = util.spec_from_file_location(
-                                fdict['name'], fdict['path'])
-                            mod = util.module_from_spec(spec)
-                            spec.loader.exec_module(mod)
-                            method_to_call = getattr(mod, fdict['name'])
-                        else:
-                            # package path
-                            module = import_module('pyVHR.BVP.filters')
-                            method_to_call = getattr(module, fdict['name'])
-                        
-                        bvps_win = apply_filter(bvps_win, method_to_call, fps=fps, params=ast.literal_eval(fdict['params']))
+        ## 4. sig windowing
+        windowed_sig, timesES = sig_windowing(sig, int(self.sigdict['winSize']), 1, fps)
 
-                ## 8. BPM extraction
-                MAD = []
-                if self.bpmdict['estimate'] == 'holistic' or self.bpmdict['estimate'] == 'median':
-                    if eval(self.sigdict['cuda']):
-                        bpmES = BVP_to_BPM_cuda(bvps_win, fps, minHz=float(
-                            self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+        # -- loop on methods
+        rows = []
+        for m in self.methods:
+            if verb:
+                app = str(self.sigdict['approach'])
+                print(f'## method: {str(m)} ({app})')
+
+            ## 5. PRE FILTERING
+            filtered_windowed_sig = windowed_sig
+
+            # -- color threshold - applied only with patches
+            #if str(self.sigdict['approach']) == 'patches':
+            #    filtered_windowed_sig = apply_filter(windowed_sig, rgb_filter_th,
+            #        params={'RGB_LOW_TH':  np.int32(self.bvpdict['color_low_threshold']),
+            #                'RGB_HIGH_TH': np.int32(self.bvpdict['color_high_threshold'])})
+
+            # -- custom filters
+            prefilter_list = ast.literal_eval(self.methodsdict[m]['pre_filtering'])
+            if len(prefilter_list) > 0:
+                for f in prefilter_list:
+                    if verb:
+                        print("  pre-filter: %s" % f)
+                    fdict = dict(self.parser[f].items())
+                    if fdict['path'] != 'None':
+                        # custom path
+                        spec = util.spec_from_file_location(fdict['name'], fdict['path'])
+                        mod = util.module_from_spec(spec)
+                        spec.loader.exec_module(mod)
+                        method_to_call = getattr(mod, fdict['name'])
                     else:
-                        bpmES = BVP_to_BPM(bvps_win, fps, minHz=float(
-                            self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
-                      
-                    if self.bpmdict['estimate'] == 'median':
-                        # median BPM from multiple estimators BPM
-                        bpmES, MAD = BPM_median(bpmES)
-
-                elif self.bpmdict['estimate'] == 'clustering':
-                    # if eval(self.sigdict['cuda']):
-                    #     bpmES = BVP_to_BPM_PSD_clustering_cuda(bvps_win, fps, minHz=float(
-                    #         self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
-                    # else:
-                    #bpmES = BPM_clustering(sig_processing, bvps_win, winSizeGT, movement_thrs=[15, 15, 15], fps=fps, opt_factor=0.5)
-                    ma = MotionAnalysis(sig_processing, winSizeGT, fps)
-                    mthrs = self.bpmdict['movement_thrs']
-                    mthrs = mthrs.replace('[', '')
-                    mthrs = mthrs.replace(']', '')
-                    movement_thrs = [float(i) for i in mthrs.split(",")]
-                    bpmES = BPM_clustering(ma, bvps_win, fps, winSizeGT, movement_thrs=movement_thrs, opt_factor=0.5)
-              
-
-                ## 9. error metrics
-                RMSE, MAE, MAX, PCC, CCC, SNR = getErrors(bvps_win, fps, bpmES, bpmGT, timesES, timesGT)
+                        # package path
+                        module = import_module('pyVHR.BVP.filters')
+                        method_to_call = getattr(module, fdict['name'])
+                    filtered_windowed_sig = apply_filter(filtered_windowed_sig, method_to_call, fps=fps, params=ast.literal_eval(fdict['params']))
+
+            ## 6. BVP extraction
+            if self.methodsdict[m]['path'] != 'None':
+                # custom path
+                spec = util.spec_from_file_location(self.methodsdict[m]['name'], self.methodsdict[m]['path'])
+                mod = util.module_from_spec(spec)
+                spec.loader.exec_module(mod)
+                method_to_call = getattr(mod, self.methodsdict[m]['name'])
+            else:
+                # package path
+                module = import_module('pyVHR.BVP.methods')
+                method_to_call = getattr(module, self.methodsdict[m]['name'])
+            bvps_win = RGB_sig_to_BVP(filtered_windowed_sig, fps,
+                                  device_type=self.methodsdict[m]['device_type'], 
+                                  method=method_to_call, 
+                                  params=ast.literal_eval(self.methodsdict[m]['params']))
 
-                # -- save results
-                res.newDataSerie()
-                res.addData('dataset', str(self.datasetdict['dataset']))
-                res.addData('method', str(m))
-                res.addData('videoIdx', v)
-                res.addData('RMSE', RMSE)
-                res.addData('MAE', MAE)
-                res.addData('MAX', MAX)
-                res.addData('PCC', PCC)
-                res.addData('CCC', CCC)
-                res.addData('SNR', SNR)
-                res.addData('MAD', MAD)
-                res.addData('bpmGT', bpmGT)
-                res.addData('bpmES', bpmES)
-                res.addData('timeGT', timesGT)
-                res.addData('timeES', timesES)
-                res.addData('videoFilename', videoFileName)
-                res.addDataSerie()
-                if verb:
-                    printErrors(RMSE, MAE, MAX, PCC, CCC, SNR)
-        return res
+            ## 7. POST FILTERING
+            postfilter_list = ast.literal_eval(self.methodsdict[m]['post_filtering'])
+            if len(postfilter_list) > 0:
+                for f in postfilter_list:
+                    if verb:
+                        print("  post-filter: %s" % f)
+                    fdict = dict(self.parser[f].items())
+                    if fdict['path'] != 'None':
+                        # custom path
+                        spec = util.spec_from_file_location(
+                            fdict['name'], fdict['path'])
+                        mod = util.module_from_spec(spec)
+                        spec.loader.exec_module(mod)
+                        method_to_call = getattr(mod, fdict['name'])
+                    else:
+                        # package path
+                        module = import_module('pyVHR.BVP.filters')
+                        method_to_call = getattr(module, fdict['name'])
+                    
+                    bvps_win = apply_filter(bvps_win, method_to_call, fps=fps, params=ast.literal_eval(fdict['params']))
+
+            ## 8. BPM extraction
+            MAD = []
+            if self.bpmdict['estimate'] == 'holistic' or self.bpmdict['estimate'] == 'median':
+                if eval(self.sigdict['cuda']):
+                    bpmES = BVP_to_BPM_cuda(bvps_win, fps, minHz=float(
+                        self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+                else:
+                    bpmES = BVP_to_BPM(bvps_win, fps, minHz=float(
+                        self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+                  
+                if self.bpmdict['estimate'] == 'median':
+                    # median BPM from multiple estimators BPM
+                    bpmES, MAD = BPM_median(bpmES)
+
+            elif self.bpmdict['estimate'] == 'clustering':
+                # if eval(self.sigdict['cuda']):
+                #     bpmES = BVP_to_BPM_PSD_clustering_cuda(bvps_win, fps, minHz=float(
+                #         self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+                # else:
+                #bpmES = BPM_clustering(sig_processing, bvps_win, winSizeGT, movement_thrs=[15, 15, 15], fps=fps, opt_factor=0.5)
+                ma = MotionAnalysis(sig_processing, winSizeGT, fps)
+                mthrs = self.bpmdict['movement_thrs']
+                mthrs = mthrs.replace('[', '')
+                mthrs = mthrs.replace(']', '')
+                movement_thrs = [float(i) for i in mthrs.split(",")]
+                bpmES = BPM_clustering(ma, bvps_win, fps, winSizeGT, movement_thrs=movement_thrs, opt_factor=0.5,
+                                       gauss_fit=self.bpmdict.get('gauss_fit', 'lmfit'))
+          
+
+            ## 9. error metrics
+            RMSE, MAE, MAX, PCC, CCC, SNR = getErrors(bvps_win, fps, bpmES, bpmGT, timesES, timesGT)
+
+            # -- save results
+            rows.append({'dataset': str(self.datasetdict['dataset']),
+                         'method': str(m),
+                         'videoIdx': v,
+                         'RMSE': RMSE,
+                         'MAE': MAE,
+                         'MAX': MAX,
+                         'PCC': PCC,
+                         'CCC': CCC,
+                         'SNR': SNR,
+                         'MAD': MAD,
+                         'bpmGT': bpmGT,
+                         'bpmES': bpmES,
+                         'timeGT': timesGT,
+                         'timeES': timesES,
+                         'videoFilename': videoFileName})
+            if verb:
+                printErrors(RMSE, MAE, MAX, PCC, CCC, SNR)
+        return rows
 
     def parse_cfg(self, configFilename):
         """ parses the given configuration file for loading the test's parameters.
@@ -765,6 +865,27 @@ class Pipeline():
             print("      dataset: " + self.datasetdict['dataset'].upper())
             print("      methods: " + str(self.methods))
 
+_DATASET_WORKER = None
+
+def _dataset_worker_init(pipeline_cls, configFilename, verb):
+    """ 
+    Process pool initializer of Pipeline.run_on_dataset: every worker builds its own
+    pipeline, dataset and SignalProcessing (skin extractor included) once.
+    """
+    global _DATASET_WORKER
+    pipe = pipeline_cls()
+    pipe.configFilename = configFilename
+    pipe.parse_cfg(configFilename)
+    _DATASET_WORKER = (pipe, pipe._load_dataset(), pipe._make_sig_processing(False), verb)
+
+def _dataset_worker_run(v):
+    """ Runs the v-th video in a worker; returns (rows, None) or (None, error message). """
+    pipe, dataset, sig_processing, verb = _DATASET_WORKER
+    try:
+        return pipe._run_video(v, dataset, sig_processing, verb), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
 class DeepPipeline(Pipeline):
     """ 
     This class runs the pyVHR Deep pipeline on a single video or dataset
@@ -773,7 +894,7 @@ class DeepPipeline(Pipeline):
     def __init__(self):
         pass
 
-    def run_on_video(self, videoFileName, cuda=True, method='MTTS_CAN', bpm_type='welch', post_filt=False, verb=True, crop_face=False):
+    def run_on_video(self, videoFileName, cuda=True, method='MTTS_CAN', bpm_type='welch', post_filt=False, verb=True, crop_face=False, memmap_dir=None):
         """ 
         Runs the pipeline on a specific video file.
 
@@ -793,6 +914,10 @@ class DeepPipeline(Pipeline):
             verb:
                - False - not verbose
                - True - show the main steps  
+            memmap_dir:
+               - None - the video frames are loaded in memory
+               - str - the video frames are streamed into a temporary np.memmap file in this directory
+                 (for long videos that don't fit in RAM); the file is removed at the end
         """
 
         if verb:
@@ -801,21 +926,30 @@ class DeepPipeline(Pipeline):
         wsize = 6
         
         sp = SignalProcessing()
-        frames = sp.extract_raw(videoFileName)
-        print('Frames shape:', frames.shape)
-
-        # -- BVP extraction
-        if verb:
-            print("\nBVP extraction with method: %s" % (method))
-        if method == 'MTTS_CAN':
-            bvps_pred = MTTS_CAN_deep(frames, fps, verb=1, filter_pred=True)
-            bvps, timesES = BVP_windowing(bvps_pred, wsize, fps, stride=1)
-        elif method == 'HR_CNN':
-            bvps_pred = HR_CNN_bvp_pred(frames)
-            bvps, timesES = BVP_windowing(bvps_pred, wsize, fps, stride=1)
-        else:
-            print("Deep Method unsupported!")
-            return
+        memmap_file = None
+        if memmap_dir is not None:
+            fd, memmap_file = tempfile.mkstemp(suffix='.frames', dir=memmap_dir)
+            os.close(fd)
+        try:
+            frames = sp.extract_raw(videoFileName, memmap_file=memmap_file)
+            print('Frames shape:', frames.shape)
+
+            # -- BVP extraction
+            if verb:
+                print("\nBVP extraction with method: %s" % (method))
+            if method == 'MTTS_CAN':
+                bvps_pred = MTTS_CAN_deep(frames, fps, verb=1, filter_pred=True)
+                bvps, timesES = BVP_windowing(bvps_pred, wsize, fps, stride=1)
+            elif method == 'HR_CNN':
+                bvps_pred = HR_CNN_bvp_pred(frames)
+                bvps, timesES = BVP_windowing(bvps_pred, wsize, fps, stride=1)
+            else:
+                print("Deep Method unsupported!")
+                return
+        finally:
+            frames = None
+            if memmap_file is not None:
+                os.remove(memmap_file)
 
         if post_filt:
             module = import_module('pyVHR.BVP.filters')
@@ -957,7 +1091,7 @@ class DeepPipeline(Pipeline):
                         self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
                 elif self.bpmdict['type'] == 'clustering':
                     bpmES = BVP_to_BPM_PSD_clustering_cuda(bvps_win, fps, minHz=float(
-                        self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']))
+                        self.bpmdict['minHz']), maxHz=float(self.bpmdict['maxHz']), gauss_fit=self.bpmdict.get('gauss_fit', 'lmfit'))
                    
                 # median BPM from multiple estimators BPM
                 median_bpmES, mad_bpmES = BPM_median(bpmES)
@@ -64,6 +64,52 @@ def holistic_mean(im, RGB_LOW_TH, RGB_HIGH_TH):
     return mean
 
 
+@njit(['float32[:,:](uint8[:,:,:], uint8[:,:], int32, int32, int32, int32)', ], parallel=True, fastmath=True, nogil=True)
+def holistic_mean_mask(im, mask, row0, col0, RGB_LOW_TH, RGB_HIGH_TH):
+    """
+    This method computes the same RGB-Mean Signal as :py:func:`holistic_mean` on the skin of 'im',
+    reading the pixels through a skin mask instead of a masked copy of the image.
+
+    Args: 
+        im (uint8 ndarray): full image with shape [rows, columns, rgb_channels].
+        mask (uint8 ndarray): skin mask with shape [mask_rows, mask_columns]; mask[x, y] != 0 selects im[row0+x, col0+y].
+        row0 (numpy.int32): image row of the first mask row.
+        col0 (numpy.int32): image column of the first mask column.
+        RGB_LOW_TH (numpy.int32): RGB low threshold value.
+        RGB_HIGH_TH (numpy.int32): RGB high threshold value.
+    
+    Returns:
+        RGB-Mean Signal as float32 ndarray with shape [1,3], where 1 is the single estimator,
+        and 3 are r-mean, g-mean and b-mean.
+    """
+    mean = np.zeros((1, 3), dtype=np.float32)
+    mean_r = np.float32(0.0)
+    mean_g = np.float32(0.0)
+    mean_b = np.float32(0.0)
+    num_elems = np.float32(0.0)
+    for x in prange(mask.shape[0]):
+        for y in prange(mask.shape[1]):
+            if mask[x, y] != 0:
+                r = im[row0 + x, col0 + y, 0]
+                g = im[row0 + x, col0 + y, 1]
+                b = im[row0 + x, col0 + y, 2]
+                if not((r <= RGB_LOW_TH and g <= RGB_LOW_TH and b <= RGB_LOW_TH)
+                        or (r >= RGB_HIGH_TH and g >= RGB_HIGH_TH and b >= RGB_HIGH_TH)):
+                    mean_r += r
+                    mean_g += g
+                    mean_b += b
+                    num_elems += 1.0
+    if num_elems > 1.0:
+        mean[0, 0] = mean_r / num_elems
+        mean[0, 1] = mean_g / num_elems
+        mean[0, 2] = mean_b / num_elems
+    else:
+        mean[0, 0] = mean_r
+        mean[0, 1] = mean_g
+        mean[0, 2] = mean_b 
+    return mean
+
+
 @njit(['float32[:,:](float32[:,:],uint8[:,:,:],float32, int32, int32)', ], parallel=True, fastmath=True, nogil=True)
 def landmarks_mean(ldmks, im, square, RGB_LOW_TH, RGB_HIGH_TH):
     """
@@ -105,6 +151,48 @@ def landmarks_mean(ldmks, im, square, RGB_LOW_TH, RGB_HIGH_TH):
     return r_ldmks
 
 
+@njit(['void(uint8[:,:,:], int64, int64, int64, int64, int32, int32, float32[:])', ], fastmath=True, nogil=True)
+def patch_median_hist(im, x_s, x_e, y_s, y_e, RGB_LOW_TH, RGB_HIGH_TH, out):
+    """
+    This method writes in 'out' the per-channel median of the 'im[x_s:x_e, y_s:y_e]' pixels
+    that are inside the RGB range [RGB_LOW_TH, RGB_HIGH_TH] (zeros if there are none).
+    Medians are read from 256-bin histograms, so no sort is needed; they are the same values
+    np.median gives (mean of the two central values for an even count).
+    """
+    hist = np.zeros((3, 256), dtype=np.int32)
+    n = 0
+    for x in range(x_s, x_e):
+        for y in range(y_s, y_e):
+            r = im[x, y, 0]
+            g = im[x, y, 1]
+            b = im[x, y, 2]
+            if not((r <= RGB_LOW_TH and g <= RGB_LOW_TH and b <= RGB_LOW_TH) or
+                   (r >= RGB_HIGH_TH and g >= RGB_HIGH_TH and b >= RGB_HIGH_TH)):
+                hist[0, r] += 1
+                hist[1, g] += 1
+                hist[2, b] += 1
+                n += 1
+    if n == 0:
+        out[0] = np.float32(0.0)
+        out[1] = np.float32(0.0)
+        out[2] = np.float32(0.0)
+        return
+    k_lo = (n - 1) // 2
+    k_hi = n // 2
+    for c in range(3):
+        cum = 0
+        v_lo = -1
+        v_hi = -1
+        for v in range(256):
+            cum += hist[c, v]
+            if v_lo < 0 and cum > k_lo:
+                v_lo = v
+            if cum > k_hi:
+                v_hi = v
+                break
+        out[c] = np.float32((v_lo + v_hi) / 2.0)
+
+
 @njit(['float32[:,:](float32[:,:],uint8[:,:,:],float32, int32, int32)', ], parallel=True, fastmath=True, nogil=True)
 def landmarks_median(ldmks, im, square, RGB_LOW_TH, RGB_HIGH_TH):
     """
@@ -140,27 +228,7 @@ def landmarks_median(ldmks, im, square, RGB_LOW_TH, RGB_HIGH_TH):
             y_e = r_ldmks[ld_id, 1] + S
             if y_e >= width:
                 y_e = width
-            ar = np.copy(im[int(x_s):int(x_e), int(y_s):int(y_e), :])
-            f_ar = ar.flatten()
-            r = ar[:, :, 0].flatten()
-            g = ar[:, :, 1].flatten()
-            b = ar[:, :, 2].flatten()
-            goodidx = np.ones((ar.shape[0]*ar.shape[1],), dtype=np.int32)
-            targets = np.arange(3, f_ar.shape[0], 3)
-            for idx in prange(targets.shape[0]):
-                i = targets[idx]
-                if ((f_ar[i-2] <= RGB_LOW_TH and f_ar[i-1] <= RGB_LOW_TH and f_ar[i] <= RGB_LOW_TH) or
-                        (f_ar[i-2] >= RGB_HIGH_TH and f_ar[i-1] >= RGB_HIGH_TH and f_ar[i] >= RGB_HIGH_TH)):
-                    goodidx[i % 3] = 0
-            goodidx = np.argwhere(goodidx).flatten()
-            if goodidx.size < 1 or r.size < 1:
-                r_ldmks[ld_id, 2] = np.float32(0.0)
-                r_ldmks[ld_id, 3] = np.float32(0.0)
-                r_ldmks[ld_id, 4] = np.float32(0.0)
-            else:
-                r_ldmks[ld_id, 2] = np.float32(np.median(r[goodidx]))
-                r_ldmks[ld_id, 3] = np.float32(np.median(g[goodidx]))
-                r_ldmks[ld_id, 4] = np.float32(np.median(b[goodidx]))
+            patch_median_hist(im, int(x_s), int(x_e), int(y_s), int(y_e), RGB_LOW_TH, RGB_HIGH_TH, r_ldmks[ld_id, 2:])
     return r_ldmks
 
 
@@ -207,6 +275,164 @@ def landmarks_mean_custom_rect(ldmks, im, rects, RGB_LOW_TH, RGB_HIGH_TH):
     return r_ldmks
 
 
+@njit(['int32[:,:,:](uint8[:,:,:], int64, int64, int64, int64, int32, int32)', ], parallel=True, fastmath=True, nogil=True)
+def summed_area_tables(im, r0, r1, c0, c1, RGB_LOW_TH, RGB_HIGH_TH):
+    """
+    This method computes the summed-area tables of r, g, b and of the count of the 'im[r0:r1, c0:c1]' pixels
+    that are inside the RGB range [RGB_LOW_TH, RGB_HIGH_TH] (extremes are included).
+    The box area must be less than 2**31/255 pixels (a 4K frame fits).
+
+    Returns:
+        int32 ndarray with shape [4, r1-r0+1, c1-c0+1]; the sums of the pixels im[xs:xe, ys:ye] are
+        sat[:, xe-r0, ye-c0] - sat[:, xs-r0, ye-c0] - sat[:, xe-r0, ys-c0] + sat[:, xs-r0, ys-c0].
+    """
+    h = r1 - r0
+    w = c1 - c0
+    sat = np.zeros((4, h + 1, w + 1), dtype=np.int32)
+    # prefix sums along the rows, then along the columns
+    for i in prange(h):
+        x = r0 + i
+        acc_r = np.int32(0)
+        acc_g = np.int32(0)
+        acc_b = np.int32(0)
+        acc_n = np.int32(0)
+        for j in range(w):
+            r = np.int32(im[x, c0 + j, 0])
+            g = np.int32(im[x, c0 + j, 1])
+            b = np.int32(im[x, c0 + j, 2])
+            keep = np.int32(1) - np.int32((r <= RGB_LOW_TH) & (g <= RGB_LOW_TH) & (b <= RGB_LOW_TH)) \
+                - np.int32((r >= RGB_HIGH_TH) & (g >= RGB_HIGH_TH) & (b >= RGB_HIGH_TH))
+            acc_r += r * keep
+            acc_g += g * keep
+            acc_b += b * keep
+            acc_n += keep
+            sat[0, i + 1, j + 1] = acc_r
+            sat[1, i + 1, j + 1] = acc_g
+            sat[2, i + 1, j + 1] = acc_b
+            sat[3, i + 1, j + 1] = acc_n
+    for k in prange(4):
+        for i in range(1, h + 1):
+            for j in range(1, w + 1):
+                sat[k, i, j] += sat[k, i - 1, j]
+    return sat
+
+
+@njit(['float32[:,:](float32[:,:],uint8[:,:,:],int64[:],int64[:], int32, int32)', ], parallel=True, fastmath=True, nogil=True)
+def kernel_landmarks_mean_integral(ldmks, im, half_rows, half_cols, RGB_LOW_TH, RGB_HIGH_TH):
+    """
+    This method computes the RGB-Mean Signal of rectangular patches with summed-area tables.
+    Please refer to pyVHR.extraction.sig_extraction_methods.landmarks_mean_integral.
+    """
+    r_ldmks = ldmks.astype(np.float32)
+    width = im.shape[1]
+    height = im.shape[0]
+    num = r_ldmks.shape[0]
+    # patches clipped to the image, and their bounding box
+    bounds = np.zeros((num, 4), dtype=np.int64)
+    r0, r1, c0, c1 = height, 0, width, 0
+    patches_area = 0
+    for ld_id in range(num):
+        if r_ldmks[ld_id, 0] >= 0.0:
+            xs = max(int(r_ldmks[ld_id, 0]) - half_rows[ld_id], 0)
+            xe = min(int(r_ldmks[ld_id, 0]) + half_rows[ld_id] + 1, height)
+            ys = max(int(r_ldmks[ld_id, 1]) - half_cols[ld_id], 0)
+            ye = min(int(r_ldmks[ld_id, 1]) + half_cols[ld_id] + 1, width)
+            if xe > xs and ye > ys:
+                bounds[ld_id, 0] = xs
+                bounds[ld_id, 1] = xe
+                bounds[ld_id, 2] = ys
+                bounds[ld_id, 3] = ye
+                patches_area += (xe - xs) * (ye - ys)
+                r0 = min(r0, xs)
+                r1 = max(r1, xe)
+                c0 = min(c0, ys)
+                c1 = max(c1, ye)
+    if r1 <= r0 or c1 <= c0:
+        return r_ldmks
+    box_area = (r1 - r0) * (c1 - c0)
+    sums = np.zeros((num, 4), dtype=np.int64)
+    if patches_area > box_area and box_area * 255 < 2**31:
+        # overlapping patches: the tables (one pass on the bounding box) are cheaper
+        sat = summed_area_tables(im, r0, r1, c0, c1, RGB_LOW_TH, RGB_HIGH_TH)
+        for ld_id in prange(num):
+            xs = bounds[ld_id, 0] - r0
+            xe = bounds[ld_id, 1] - r0
+            ys = bounds[ld_id, 2] - c0
+            ye = bounds[ld_id, 3] - c0
+            for c in range(4):
+                sums[ld_id, c] = np.int64(sat[c, xe, ye]) - sat[c, xs, ye] - sat[c, xe, ys] + sat[c, xs, ys]
+    else:
+        # few or small patches: summing their pixels is cheaper
+        for ld_id in prange(num):
+            acc_r = 0
+            acc_g = 0
+            acc_b = 0
+            acc_n = 0
+            for x in range(bounds[ld_id, 0], bounds[ld_id, 1]):
+                for y in range(bounds[ld_id, 2], bounds[ld_id, 3]):
+                    if not((im[x, y, 0] <= RGB_LOW_TH and im[x, y, 1] <= RGB_LOW_TH and im[x, y, 2] <= RGB_LOW_TH) or
+                           (im[x, y, 0] >= RGB_HIGH_TH and im[x, y, 1] >= RGB_HIGH_TH and im[x, y, 2] >= RGB_HIGH_TH)):
+                        acc_r += im[x, y, 0]
+                        acc_g += im[x, y, 1]
+                        acc_b += im[x, y, 2]
+                        acc_n += 1
+            sums[ld_id, 0] = acc_r
+            sums[ld_id, 1] = acc_g
+            sums[ld_id, 2] = acc_b
+            sums[ld_id, 3] = acc_n
+    for ld_id in range(num):
+        n = sums[ld_id, 3]
+        if n > 1:
+            for c in range(3):
+                r_ldmks[ld_id, 2 + c] = np.float32(sums[ld_id, c]) / np.float32(n)
+    return r_ldmks
+
+
+def landmarks_mean_integral(ldmks, im, square, RGB_LOW_TH, RGB_HIGH_TH):
+    """
+    This method computes the same RGB-Mean Signal as :py:func:`landmarks_mean`, but every patch sum is
+    read in O(1) from per-frame summed-area tables (of the RGB values and of the in-threshold pixels),
+    built once over the bounding box of all the patches. Pick it for many or large overlapping patches
+    (e.g. all the 468 landmarks with 30 pixels or larger sides), i.e. when the patches total area is larger
+    than their bounding box area; otherwise the patch pixels are summed directly, as landmarks_mean does.
+
+    Args: 
+        ldmks (float32 ndarray): landmakrs as ndarray with shape [num_landmarks, 5],
+             where the second dimension contains y-coord, x-coord, r-mean (value is not important), g-mean (value is not important), b-mean (value is not important).
+        im (uint8 ndarray): ndarray with shape [rows, columns, rgb_channels].
+        square (numpy.float32): side size of square patches.
+        RGB_LOW_TH (numpy.int32): RGB low threshold value.
+        RGB_HIGH_TH (numpy.int32): RGB high threshold value.
+    
+    Returns:
+        RGB-Mean Signal as float32 ndarray with shape [num_landmarks, 5], where the second dimension contains y-coord, x-coord, r-mean, g-mean, b-mean.
+    """
+    S = np.full((ldmks.shape[0],), math.floor(square/2), dtype=np.int64)
+    return kernel_landmarks_mean_integral(np.asarray(ldmks, dtype=np.float32), im, S, S, RGB_LOW_TH, RGB_HIGH_TH)
+
+
+def landmarks_mean_custom_rect_integral(ldmks, im, rects, RGB_LOW_TH, RGB_HIGH_TH):
+    """
+    This method computes the same RGB-Mean Signal as :py:func:`landmarks_mean_custom_rect` with
+    summed-area tables, see :py:func:`landmarks_mean_integral`.
+
+    Args: 
+        ldmks (float32 ndarray): landmakrs as ndarray with shape [num_landmarks, 5],
+             where the second dimension contains y-coord, x-coord, r-mean (value is not important), g-mean (value is not important), b-mean (value is not important).
+        im (uint8 ndarray): ndarray with shape [rows, columns, rgb_channels].
+        rects (float32 ndarray): positive float32 np.ndarray of shape [num_landmarks, 2]. If the list of used landmarks is [1,2,3] 
+            and rects_dim is [[10,20],[12,13],[40,40]] then the landmark number 2 will have a rectangular patch of xy-dimension 12x13.
+        RGB_LOW_TH (numpy.int32): RGB low threshold value.
+        RGB_HIGH_TH (numpy.int32): RGB high threshold value.
+    
+    Returns:
+        RGB-Mean Signal as float32 ndarray with shape [num_landmarks, 5], where the second dimension contains y-coord, x-coord, r-mean, g-mean, b-mean.
+    """
+    half_rows = np.floor(rects[:, 1]/2).astype(np.int64)
+    half_cols = np.floor(rects[:, 0]/2).astype(np.int64)
+    return kernel_landmarks_mean_integral(np.asarray(ldmks, dtype=np.float32), im, half_rows, half_cols, RGB_LOW_TH, RGB_HIGH_TH)
+
+
 @njit(['float32[:,:](float32[:,:],uint8[:,:,:],float32[:,:], int32, int32)', ], parallel=True, fastmath=True, nogil=True)
 def landmarks_median_custom_rect(ldmks, im, rects, RGB_LOW_TH, RGB_HIGH_TH):
     """
@@ -244,25 +470,7 @@ def landmarks_median_custom_rect(ldmks, im, rects, RGB_LOW_TH, RGB_HIGH_TH):
             y_e = r_ldmks[ld_id, 1] + Sy
             if y_e >= width:
                 y_e = width
-            ar = np.copy(im[int(x_s):int(x_e), int(y_s):int(y_e), :])
-            f_ar = ar.flatten()
-            r = ar[:, :, 0].flatten()
-            g = ar[:, :, 1].flatten()
-            b = ar[:, :, 2].flatten()
-            goodidx = np.ones((ar.shape[0]*ar.shape[1],), dtype=np.int32)
-            targets = np.arange(3, f_ar.shape[0], 3)
-            for idx in prange(targets.shape[0]):
-                i = targets[idx]
-                if ((f_ar[i-2] <= RGB_LOW_TH and f_ar[i-1] <= RGB_LOW_TH and f_ar[i] <= RGB_LOW_TH) or
-                        (f_ar[i-2] >= RGB_HIGH_TH and f_ar[i-1] >= RGB_HIGH_TH and f_ar[i] >= RGB_HIGH_TH)):
-                    goodidx[i % 3] = 0
-            goodidx = np.argwhere(goodidx).flatten()
-            if goodidx.size < 1 or r.size < 1:
-                r_ldmks[ld_id, 2] = np.int32(0)
-                r_ldmks[ld_id, 3] = np.int32(0)
-                r_ldmks[ld_id, 4] = np.int32(0)
-            else:
-                r_ldmks[ld_id, 2] = np.int32(np.median(r[goodidx]))
-                r_ldmks[ld_id, 3] = np.int32(np.median(g[goodidx]))
-                r_ldmks[ld_id, 4] = np.int32(np.median(b[goodidx]))
+            patch_median_hist(im, int(x_s), int(x_e), int(y_s), int(y_e), RGB_LOW_TH, RGB_HIGH_TH, r_ldmks[ld_id, 2:])
+            for c in range(2, 5):
+                r_ldmks[ld_id, c] = np.int32(r_ldmks[ld_id, c])
     return r_ldmks
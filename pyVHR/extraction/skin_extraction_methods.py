@@ -8,9 +8,9 @@ from numba import prange, njit, cuda
 from pyVHR.resources.faceparsing.model import BiSeNet
 import os
 import pyVHR
-from scipy.spatial import ConvexHull
-from PIL import Image, ImageDraw
 import requests
+import cv2
+from contextlib import contextmanager
 
 """
 This module defines classes or methods used for skin extraction.
@@ -76,12 +76,20 @@ class SkinExtractionFaceParsing():
         This class performs skin extraction on CPU/GPU using Face Parsing.
         https://github.com/zllrunning/face-parsing.PyTorch
     """
-    def __init__(self, device='CPU'):
+    def __init__(self, device='CPU', batch_size=8, input_size=512, num_threads=None):
         """
         Args:
             device (str): This class can execute code on 'CPU' or 'GPU'.
+            batch_size (int): number of frames per network forward pass used by
+                pyVHR.extraction.sig_processing.SignalProcessing with :py:meth:`extract_skin_batch`.
+            input_size (int): side of the square network input the face crops are resized to by :py:meth:`extract_skin_batch`.
+            num_threads (int): if given, number of torch intra-op threads used by the network forward passes;
+                the previous torch.get_num_threads() value is restored after each pass.
         """
         self.device = device
+        self.batch_size = max(1, int(batch_size))
+        self.input_size = int(input_size)
+        self.num_threads = None if num_threads is None else int(num_threads)
         n_classes = 19
         self.net = BiSeNet(n_classes=n_classes)
         if self.device == 'GPU':
@@ -99,21 +107,37 @@ class SkinExtractionFaceParsing():
             transforms.ToTensor(),
             transforms.Normalize((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
         ])
+        self.norm_mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+        self.norm_std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
 
-    def extract_skin(self, image, ldmks):
+    @contextmanager
+    def torch_threads(self):
         """
-        This method extract the skin from an image using Face Parsing. 
-        Landmarks (ldmks) are used to create a facial bounding box for cropping the face; this way
-        the network used in Face Parsing is more accurate. 
+        Context manager that sets the torch intra-op threads to num_threads (if given) and restores
+        the previous value on exit, since torch.set_num_threads is process-wide.
+        """
+        if self.num_threads is None:
+            yield
+            return
+        prev = torch.get_num_threads()
+        torch.set_num_threads(self.num_threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(prev)
+
+    def face_box(self, image, ldmks):
+        """
+        Facial bounding box used to crop the face before Face Parsing: the landmarks bounding
+        box, enlarged because the network works better with a bigger box.
 
         Args:
             image (uint8 ndarray): ndarray with shape [rows, columns, rgb_channels].
             ldmks (float32 ndarray): ndarray with shape [num_landmarks, xy_coordinates].
 
         Returns:
-            Cropped skin-image and non-cropped skin-image; both are uint8 ndarray with shape [rows, columns, rgb_channels].
+            tuple of int (min_y, max_y, min_x, max_x).
         """
-        # crop with bounding box of ldmks; the network works better if the bounding box is bigger
         aviable_ldmks = ldmks[ldmks[:,0] >= 0][:,:2]  
         min_y, min_x = np.min(aviable_ldmks, axis=0)
         max_y, max_x = np.max(aviable_ldmks, axis=0)
@@ -121,7 +145,24 @@ class SkinExtractionFaceParsing():
         min_x *= 0.90
         max_y = max_y * 1.10 if max_y * 1.10 < image.shape[0] else image.shape[0]
         max_x = max_x * 1.10 if max_x * 1.10 < image.shape[1] else image.shape[1]
-        cropped_image = np.copy(image[int(min_y):int(max_y),int(min_x):int(max_x) ,:])
+        return int(min_y), int(max_y), int(min_x), int(max_x)
+
+    def extract_skin(self, image, ldmks):
+        """
+        This method extract the skin from an image using Face Parsing. 
+        Landmarks (ldmks) are used to create a facial bounding box for cropping the face; this way
+        the network used in Face Parsing is more accurate. 
+
+        Args:
+            image (uint8 ndarray): ndarray with shape [rows, columns, rgb_channels].
+            ldmks (float32 ndarray): ndarray with shape [num_landmarks, xy_coordinates].
+
+        Returns:
+            Cropped skin-image and non-cropped skin-image; both are uint8 ndarray with shape [rows, columns, rgb_channels].
+        """
+        # crop with bounding box of ldmks; the network works better if the bounding box is bigger
+        min_y, max_y, min_x, max_x = self.face_box(image, ldmks)
+        cropped_image = np.copy(image[min_y:max_y, min_x:max_x, :])
         nda_im = np.array(cropped_image)
         # prepare the image for the bisenet network
         cropped_image = self.to_tensor(cropped_image)
@@ -129,9 +170,54 @@ class SkinExtractionFaceParsing():
         cropped_skin_img = self.extraction(cropped_image, nda_im)
         # recreate full image using cropped_skin_img
         full_skin_image = np.zeros_like(image)
-        full_skin_image[int(min_y):int(max_y),int(min_x):int(max_x) ,:] = cropped_skin_img
+        full_skin_image[min_y:max_y, min_x:max_x, :] = cropped_skin_img
         return cropped_skin_img, full_skin_image
 
+    def extract_skin_batch(self, images, ldmks_list):
+        """
+        Batched version of :py:meth:`extract_skin`. The face crops of all the frames are resized to
+        [input_size, input_size] and parsed with a single network forward pass; each parsing
+        map is then resized back (nearest neighbour) to its crop.
+
+        Args:
+            images (list): list of uint8 ndarray with shape [rows, columns, rgb_channels].
+            ldmks_list (list): list of float32 ndarray with shape [num_landmarks, xy_coordinates], one for each image.
+
+        Returns:
+            list of (cropped skin-image, non-cropped skin-image) tuples, one for each image, as returned by :py:meth:`extract_skin`.
+        """
+        if len(images) == 0:
+            return []
+        S = self.input_size
+        boxes = [self.face_box(image, ldmks) for image, ldmks in zip(images, ldmks_list)]
+        crops = [image[y0:y1, x0:x1, :] for image, (y0, y1, x0, x1) in zip(images, boxes)]
+        # prepare the images for the bisenet network
+        batch = np.zeros((len(crops), S, S, 3), dtype=np.uint8)
+        for i, crop in enumerate(crops):
+            if crop.size > 0:
+                batch[i] = cv2.resize(crop, (S, S), interpolation=cv2.INTER_LINEAR)
+        with torch.inference_mode(), self.torch_threads():
+            x = torch.from_numpy(batch).permute(0, 3, 1, 2).float().div_(255.0)
+            x = x.sub_(self.norm_mean).div_(self.norm_std)
+            if self.device == 'GPU':
+                x = x.cuda()
+            ### bisenet skin detection ###
+            out = self.net(x)[0]
+            parsing = out.argmax(1).to(torch.uint8).cpu().numpy()
+        res = []
+        for image, crop, (y0, y1, x0, x1), pars in zip(images, crops, boxes, parsing):
+            if crop.size > 0:
+                pars = cv2.resize(pars, (crop.shape[1], crop.shape[0]), interpolation=cv2.INTER_NEAREST)
+                cropped_skin_img = kernel_skin_copy_and_filter(np.ascontiguousarray(crop), pars.astype(np.int32),
+                                                               np.int32(SkinProcessingParams.RGB_LOW_TH), np.int32(SkinProcessingParams.RGB_HIGH_TH))
+            else:
+                cropped_skin_img = np.zeros_like(crop)
+            # recreate full image using cropped_skin_img
+            full_skin_image = np.zeros_like(image)
+            full_skin_image[y0:y1, x0:x1, :] = cropped_skin_img
+            res.append((cropped_skin_img, full_skin_image))
+        return res
+
     def extraction(self, im, nda_im):
         """
         This method performs skin extraction using Face Parsing.
@@ -143,7 +229,7 @@ class SkinExtractionFaceParsing():
         Returns:
             skin-image as uint8 ndarray with shape [rows, columns, rgb_channels].
         """
-        with torch.no_grad():
+        with torch.no_grad(), self.torch_threads():
             if self.device == 'CPU':
                 ### bisenet skin detection ###
                 out = self.net(im)[0]
@@ -243,7 +329,53 @@ class SkinExtractionConvexHull:
             device (str): This class can execute code on 'CPU' or 'GPU'.
         """
         self.device = device
-    
+        # frame-sized mask buffer, reallocated only when the frame shape changes
+        self.mask = np.zeros((0, 0), dtype=np.uint8)
+
+    def face_mask(self, ldmks, shape):
+        """
+        Rasterizes the skin mask of the face: the face convex hull minus the eyes and mouth
+        convex hulls, drawn with cv2.fillPoly over the face bounding box of a frame-sized buffer
+        that is reused across frames. As with full-frame masks, the skin mask is empty if the
+        eyes or the mouth have 3 or less available landmarks.
+
+        Args:
+            ldmks (float32 ndarray): landmarks with shape [num_landmarks, xy_coordinates] (rows, columns); -1 if not available.
+            shape (tuple): (rows, columns) of the frame.
+
+        Returns:
+            uint8 ndarray (a view on the mask buffer) with shape [rmax-rmin+1, cmax-cmin+1] and values 0/1,
+            and the bounding box (rmin, rmax, cmin, cmax) of the face hull, or None and (-1, -1, -1, -1) if the mask is empty.
+        """
+        from pyVHR.extraction.sig_processing import MagicLandmarks
+        def hull(pts):
+            pts = pts[pts[:,0] >= 0][:,:2]
+            # cv2 points are (x, y) = (column, row)
+            return cv2.convexHull(np.ascontiguousarray(pts[:, ::-1], dtype=np.int32)), len(pts)
+
+        face_hull, n = hull(ldmks)
+        if n < 3:
+            return None, (-1, -1, -1, -1)
+        parts = []
+        for idx in (MagicLandmarks.left_eye, MagicLandmarks.right_eye, MagicLandmarks.mounth):
+            part_hull, n = hull(ldmks[idx])
+            if n <= 3:
+                return None, (-1, -1, -1, -1)
+            parts.append(part_hull)
+        shape = tuple(shape[:2])
+        if self.mask.shape != shape:
+            self.mask = np.zeros(shape, dtype=np.uint8)
+        cmin, rmin = np.maximum(face_hull.min(axis=(0, 1)), 0)
+        cmax, rmax = np.minimum(face_hull.max(axis=(0, 1)), (shape[1]-1, shape[0]-1))
+        mask = self.mask[rmin:rmax+1, cmin:cmax+1]
+        mask.fill(0)
+        offset = (-int(cmin), -int(rmin))
+        cv2.fillPoly(mask, [face_hull], 1, offset=offset)
+        for part_hull in parts:
+            # one call per hull: fillPoly leaves the overlaps of several polygons unfilled
+            cv2.fillPoly(mask, [part_hull], 0, offset=offset)
+        return mask, (int(rmin), int(rmax), int(cmin), int(cmax))
+
     def extract_skin(self,image, ldmks):
         """
         This method extract the skin from an image using Convex Hull segmentation.
@@ -255,68 +387,19 @@ class SkinExtractionConvexHull:
         Returns:
             Cropped skin-image and non-cropped skin-image; both are uint8 ndarray with shape [rows, columns, rgb_channels].
         """
-        from pyVHR.extraction.sig_processing import MagicLandmarks
-        aviable_ldmks = ldmks[ldmks[:,0] >= 0][:,:2]        
-        # face_mask convex hull 
-        hull = ConvexHull(aviable_ldmks)
-        verts = [(aviable_ldmks[v,0], aviable_ldmks[v,1]) for v in hull.vertices]
-        img = Image.new('L', image.shape[:2], 0)
-        ImageDraw.Draw(img).polygon(verts, outline=1, fill=1)
-        mask = np.array(img)
-        mask = np.expand_dims(mask,axis=0).T
-
-        # left eye convex hull
-        left_eye_ldmks = ldmks[MagicLandmarks.left_eye]
-        aviable_ldmks = left_eye_ldmks[left_eye_ldmks[:,0] >= 0][:,:2]
-        if len(aviable_ldmks) > 3:
-            hull = ConvexHull(aviable_ldmks)
-            verts = [(aviable_ldmks[v,0], aviable_ldmks[v,1]) for v in hull.vertices]
-            img = Image.new('L', image.shape[:2], 0)
-            ImageDraw.Draw(img).polygon(verts, outline=1, fill=1)
-            left_eye_mask = np.array(img)
-            left_eye_mask = np.expand_dims(left_eye_mask,axis=0).T
-        else:
-            left_eye_mask = np.ones((image.shape[0], image.shape[1],1),dtype=np.uint8)
-
-        # right eye convex hull
-        right_eye_ldmks = ldmks[MagicLandmarks.right_eye]
-        aviable_ldmks = right_eye_ldmks[right_eye_ldmks[:,0] >= 0][:,:2]
-        if len(aviable_ldmks) > 3:
-            hull = ConvexHull(aviable_ldmks)
-            verts = [(aviable_ldmks[v,0], aviable_ldmks[v,1]) for v in hull.vertices]
-            img = Image.new('L', image.shape[:2], 0)
-            ImageDraw.Draw(img).polygon(verts, outline=1, fill=1)
-            right_eye_mask = np.array(img)
-            right_eye_mask = np.expand_dims(right_eye_mask,axis=0).T
-        else:
-            right_eye_mask = np.ones((image.shape[0], image.shape[1],1),dtype=np.uint8)
-
-        # mounth convex hull
-        mounth_ldmks = ldmks[MagicLandmarks.mounth]
-        aviable_ldmks = mounth_ldmks[mounth_ldmks[:,0] >= 0][:,:2]
-        if len(aviable_ldmks) > 3:
-            hull = ConvexHull(aviable_ldmks)
-            verts = [(aviable_ldmks[v,0], aviable_ldmks[v,1]) for v in hull.vertices]
-            img = Image.new('L', image.shape[:2], 0)
-            ImageDraw.Draw(img).polygon(verts, outline=1, fill=1)
-            mounth_mask = np.array(img)
-            mounth_mask = np.expand_dims(mounth_mask,axis=0).T
-        else:
-            mounth_mask = np.ones((image.shape[0], image.shape[1],1),dtype=np.uint8)
-
-        # apply masks and crop 
+        mask, (rmin, rmax, cmin, cmax) = self.face_mask(ldmks, image.shape)
+        # the mask only covers the face bounding box: outside of it the skin image is black
         if self.device == 'GPU':
             image = cupy.asarray(image)
-            mask = cupy.asarray(mask)
-            left_eye_mask = cupy.asarray(left_eye_mask)
-            right_eye_mask = cupy.asarray(right_eye_mask)
-            mounth_mask = cupy.asarray(mounth_mask)
-        skin_image = image * mask * (1-left_eye_mask) * (1-right_eye_mask) * (1-mounth_mask)
-
-        if self.device == 'GPU':
-            rmin, rmax, cmin, cmax = bbox2_GPU(skin_image)
+            skin_image = cupy.zeros_like(image)
         else:
-            rmin, rmax, cmin, cmax = bbox2_CPU(skin_image)
+            skin_image = np.zeros_like(image)
+        if mask is not None:
+            box = (slice(rmin, rmax+1), slice(cmin, cmax+1))
+            if self.device == 'GPU':
+                skin_image[box] = image[box] * cupy.asarray(mask)[:, :, None]
+            else:
+                skin_image[box] = cv2.bitwise_and(image[box], image[box], mask=mask)
 
         cropped_skin_im = skin_image
         if rmin >= 0 and rmax >= 0 and cmin >= 0 and cmax >= 0 and rmax-rmin >= 0 and cmax-cmin >= 0:
@@ -1,9 +1,12 @@
 from numba import prange, njit
 import numpy as np
 import cv2
+import queue
+import threading
 from numba import prange, njit
 import numpy as np
 from scipy.signal import welch, butter, filtfilt, iirnotch, freqz
+from scipy.fft import rfftfreq
 from sklearn.decomposition import PCA
 from scipy.stats import iqr, median_abs_deviation
 
@@ -281,15 +284,24 @@ def sig_windowing(sig, wsize, stride, fps):
 
     Returns:
         A list of ndarray (float32) with shape [num_estimators, rgb_channels, window_frames],
-        an array (float32) of times in seconds (win centers)
+        an array (float32) of times in seconds (win centers).
+        When window size and stride are whole numbers of frames, or when sig is a np.memmap,
+        the windows are read-only views on sig (no copy); otherwise they are copies.
     """
     N = sig.shape[0]
     block_idx, timesES = sliding_straded_win_idx(N, wsize, stride, fps)
+    wsize_fr = wsize*fps
+    stride_fr = stride*fps
+    if len(block_idx) > 0 and N >= wsize_fr and float(wsize_fr).is_integer() and float(stride_fr).is_integer():
+        windows = np.lib.stride_tricks.sliding_window_view(sig, int(wsize_fr), axis=0)
+        return list(windows[::int(stride_fr)][:len(block_idx)]), timesES
     block_signals = []
     for e in block_idx:
         st_frame = int(e[0])
         end_frame = int(e[-1])
-        wind_signal = np.copy(sig[st_frame: end_frame+1])
+        wind_signal = sig[st_frame: end_frame+1]
+        if not isinstance(sig, np.memmap):
+            wind_signal = np.copy(wind_signal)
         wind_signal = np.swapaxes(wind_signal, 0, 1)
         wind_signal = np.swapaxes(wind_signal, 1, 2)
         block_signals.append(wind_signal)
@@ -349,6 +361,57 @@ def sliding_straded_win_idx(N, wsize, stride, fps):
         timesES.append(wsize/2+stride*i)
     return idx, np.array(timesES, dtype=np.float32)
 
+def fill_gaps(sig, max_gap=0):
+    """
+    This method fills the missing (non-finite) samples of a signal along the time axis.
+
+    Gaps of at most max_gap samples between two valid samples are linearly interpolated;
+    longer gaps are forward filled (held at the last valid sample) and flagged. Leading
+    missing samples are back filled with the first valid one, trailing ones forward filled.
+
+    Args:
+        sig (float ndarray): ndarray with shape [num_frames] or [num_frames, num_channels].
+        max_gap (int): longest gap (in samples) bridged by linear interpolation.
+
+    Returns:
+        the filled signal (same shape and dtype as sig; channels without any finite sample stay NaN),
+        and a boolean ndarray with shape [num_frames] marking the samples of gaps longer than max_gap.
+    """
+    x = np.asarray(sig)
+    x2 = x.reshape(x.shape[0], -1)
+    T = x2.shape[0]
+    out = np.array(x2, copy=True)
+    long_gaps = np.zeros(T, dtype=bool)
+    if T == 0:
+        return out.reshape(x.shape), long_gaps
+
+    t = np.arange(T)
+    for c in range(x2.shape[1]):
+        col = x2[:, c]
+        valid = np.isfinite(col)
+        if valid.all() or not valid.any():
+            continue
+        # index of the previous / next valid sample (-1 / T when there is none)
+        prev = np.maximum.accumulate(np.where(valid, t, -1))
+        nxt = np.minimum.accumulate(np.where(valid, t, T)[::-1])[::-1]
+        miss = ~valid
+        gap = nxt - prev - 1
+        inner = miss & (prev >= 0) & (nxt < T)
+        short = inner & (gap <= max_gap)
+
+        src = np.where(prev >= 0, prev, nxt)
+        out[miss, c] = col[src[miss]]
+        if short.any():
+            lo = col[prev[short]].astype(np.float64)
+            hi = col[nxt[short]].astype(np.float64)
+            frac = (t[short] - prev[short]) / (nxt[short] - prev[short])
+            out[short, c] = lo + (hi - lo) * frac
+
+        # leading/trailing runs are "long" by their own length
+        run = np.where(inner, gap, np.where(prev < 0, nxt, T - prev - 1))
+        long_gaps |= miss & (run > max_gap)
+    return out.reshape(x.shape), long_gaps
+
 def get_fps(videoFileName):
     """
     This method returns the fps of a video file name or path.
@@ -358,7 +421,20 @@ def get_fps(videoFileName):
     vidcap.release()
     return fps
 
-def Welch(bvps, fs):
+def get_frame_count(videoFileName):
+    """
+    This method returns the number of frames declared by a video file name or path (0 if unknown).
+    """
+    vidcap = cv2.VideoCapture(videoFileName)
+    n = int(max(0, vidcap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    vidcap.release()
+    return n
+
+def Welch(bvps, fs, method='fft'):
+  """
+  Welch's PSD in the 0.65-4 Hz band; method 'zoom' evaluates only the band bins
+  (see pyVHR.BPM.utils.welch_zoom).
+  """
   _, n = bvps.shape
   if n < 256:
       seglength = n
@@ -370,6 +446,11 @@ def Welch(bvps, fs):
 
   if np.isnan(bvps).any():
     print('OK bvp')
+  if method == 'zoom':
+    from pyVHR.BPM.utils import welch_zoom
+    F = rfftfreq(2048, 1/fs).astype(np.float32)
+    band = np.argwhere((F > 0.65) & (F < 4.0)).flatten()
+    return 60*F[band], welch_zoom(bvps, fs, seglength, overlap, 2048, band)
   F, P = welch(bvps, nperseg=seglength, noverlap=overlap, fs=fs, nfft=2048)
   F = F.astype(np.float32)
   P = P.astype(np.float32)
@@ -390,6 +471,54 @@ def extract_frames_yield(videoFileName):
         success, image = vidcap.read()
     vidcap.release()
 
+def threaded_stage(fn, iterable, maxsize=8):
+    """
+    This method yields fn(x) for each x of iterable, in order, computed ahead by a background
+    thread through a bounded queue of 'maxsize' items. Chaining stages (e.g. decoding -> landmarks)
+    overlaps them with the consumer loop, as long as the work releases the GIL (OpenCV, MediaPipe,
+    nogil numba kernels). Exceptions raised by fn or iterable are re-raised by the consumer.
+    Close the generator (or exhaust it) to stop and join the thread.
+    """
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def work():
+        it = iter(iterable)
+        try:
+            for x in it:
+                if not put((fn(x), None)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((end, e))
+        finally:
+            if hasattr(it, 'close'):
+                it.close()
+
+    t = threading.Thread(target=work, daemon=True)
+    t.start()
+    try:
+        while True:
+            item, err = q.get()
+            if item is end:
+                if err is not None:
+                    raise err
+                return
+            yield item
+    finally:
+        stop.set()
+        t.join()
+
 def med_mad(x):
   MED = np.median(x)
   MAD = median_abs_deviation(x)
@@ -228,13 +228,12 @@ def visualize_landmarks_list(image_file_name=None, landmarks_list=None):
         landmarks_list (list): list of positive integers between 0 and 467 that identify patches centers (landmarks).
     
     """
-    PRESENCE_THRESHOLD = 0.5
-    VISIBILITY_THRESHOLD = 0.5
+    # imported here: pyVHR.utils.errors imports this module while sig_processing is loading
+    from pyVHR.extraction.sig_processing import landmarks_to_array
     if image_file_name is None:
         image_file_name = pyVHR.__path__[0] + '/../img/face.png' 
     imag = cv2.imread(image_file_name, cv2.COLOR_RGB2BGR)
     imag = cv2.cvtColor(imag, cv2.COLOR_BGR2RGB)
-    mp_drawing = mp.solutions.drawing_utils
     mp_face_mesh = mp.solutions.face_mesh
     with mp_face_mesh.FaceMesh(
             static_image_mode=True,
@@ -244,27 +243,13 @@ def visualize_landmarks_list(image_file_name=None, landmarks_list=None):
         results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
         if not results.multi_face_landmarks:
             return
-        width = image.shape[1]
-        height = image.shape[0]
-        face_landmarks = results.multi_face_landmarks[0]
-        ldmks = np.zeros((468, 3), dtype=np.float32)
-        for idx, landmark in enumerate(face_landmarks.landmark):
-            if ((landmark.HasField('visibility') and landmark.visibility < VISIBILITY_THRESHOLD)
-                    or (landmark.HasField('presence') and landmark.presence < PRESENCE_THRESHOLD)):
-                ldmks[idx, 0] = -1.0
-                ldmks[idx, 1] = -1.0
-                ldmks[idx, 2] = -1.0
-            else:
-                coords = mp_drawing._normalized_to_pixel_coordinates(
-                    landmark.x, landmark.y, width, height)
-                if coords:
-                    ldmks[idx, 0] = coords[0]
-                    ldmks[idx, 1] = coords[1]
-                    ldmks[idx, 2] = idx
-                else:
-                    ldmks[idx, 0] = -1.0
-                    ldmks[idx, 1] = -1.0
-                    ldmks[idx, 2] = -1.0
+        pix = landmarks_to_array(results.multi_face_landmarks[0], image.shape[1], image.shape[0])
+        # [x, y, landmark id], -1 for landmarks not visible
+        found = pix[:, 0] >= 0
+        ldmks = np.full((468, 3), -1.0, dtype=np.float32)
+        ldmks[found, 0] = pix[found, 1]
+        ldmks[found, 1] = pix[found, 0]
+        ldmks[found, 2] = np.flatnonzero(found)
     
     filtered_ldmks = []
     if landmarks_list is not None:
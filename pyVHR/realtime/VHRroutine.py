@@ -49,6 +49,10 @@ def VHRroutine(sharedData):
             sig_ext_met = landmarks_median
         elif Params.type == "median" and Params.patches == "rects":
             sig_ext_met = landmarks_median_custom_rect
+        elif Params.type == "integral" and Params.patches == "squares":
+            sig_ext_met = landmarks_mean_integral
+        elif Params.type == "integral" and Params.patches == "rects":
+            sig_ext_met = landmarks_mean_custom_rect_integral
         # patches dims
         if Params.patches == "squares":
             ldmks_regions = np.float32(Params.squares_dim)
@@ -74,10 +78,7 @@ def VHRroutine(sharedData):
     elif Params.skin_extractor == 'faceparsing':
         skin_ex = SkinExtractionFaceParsing(target_device)
 
-    mp_drawing = mp.solutions.drawing_utils
     mp_face_mesh = mp.solutions.face_mesh
-    PRESENCE_THRESHOLD = 0.5
-    VISIBILITY_THRESHOLD = 0.5
 
     if Params.fps_fixed is not None:
         fps = Params.fps_fixed
@@ -120,27 +121,11 @@ def VHRroutine(sharedData):
             # convert the BGR image to RGB.
             image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             processed_frames_count += 1
-            width = image.shape[1]
-            height = image.shape[0]
-            # [landmarks, info], with info->x_center ,y_center, r, g, b
-            ldmks = np.zeros((468, 5), dtype=np.float32)
-            ldmks[:, 0] = -1.0
-            ldmks[:, 1] = -1.0
             magic_ldmks = []
             ### face landmarks ###
-            results = face_mesh.process(image)
-            if results.multi_face_landmarks:
-                face_landmarks = results.multi_face_landmarks[0]
-                landmarks = [l for l in face_landmarks.landmark]
-                for idx in range(len(landmarks)):
-                    landmark = landmarks[idx]
-                    if not ((landmark.HasField('visibility') and landmark.visibility < VISIBILITY_THRESHOLD)
-                            or (landmark.HasField('presence') and landmark.presence < PRESENCE_THRESHOLD)):
-                        coords = mp_drawing._normalized_to_pixel_coordinates(
-                            landmark.x, landmark.y, width, height)
-                        if coords:
-                            ldmks[idx, 0] = coords[1]
-                            ldmks[idx, 1] = coords[0]
+            # [landmarks, info], with info->x_center ,y_center, r, g, b
+            ldmks, face_found = face_landmarks(face_mesh, image)
+            if face_found:
                 ### skin extraction ###
                 cropped_skin_im, full_skin_im = skin_ex.extract_skin(
                     image, ldmks)
@@ -14,7 +14,7 @@ class Params:
     skin_extractor = 'convexhull'  # or faceparsing
     approach = 'patches'  # or holistic
     patches = 'squares'  # or rects
-    type = 'mean'
+    type = 'mean'  # or median, integral
     landmarks_list = MagicLandmarks.equispaced_facial_points
     squares_dim = 30.0
     rects_dims = []
@@ -226,12 +226,19 @@ def BVP_windowing(bvp, wsize, fps, stride=1):
       stride    (float): stride (in seconds)
 
     Returns:
-      bvp_win (list): windowed BVP signal
-      timesES (list): times of (centers) windows 
+      bvp_win (list): windowed BVP signal, ndarrays with shape [1, window_frames]
+                      (read-only views on bvp when wsize and stride are whole numbers of frames)
+      timesES (list): times of (centers) windows
   """
-  
-  bvp = np.array(bvp).squeeze()
+
+  bvp = np.asarray(bvp).squeeze()
   block_idx, timesES = sliding_straded_win_idx(bvp.shape[0], wsize, stride, fps)
+  wsize_fr = wsize*fps
+  stride_fr = stride*fps
+  if (bvp.ndim == 1 and len(block_idx) > 0 and bvp.shape[0] >= wsize_fr
+          and float(wsize_fr).is_integer() and float(stride_fr).is_integer()):
+      windows = np.lib.stride_tricks.sliding_window_view(bvp, int(wsize_fr))
+      return list(windows[::int(stride_fr)][:len(block_idx), np.newaxis, :]), timesES
   bvp_win  = []
   for e in block_idx:
       st_frame = int(e[0])
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+
+def test_bvp_to_bpm_batched_welch_matches_per_window():
+    import importlib
+
+    bpm_module = importlib.import_module("pyVHR.BPM.BPM")
+    rng = np.random.default_rng(4)
+    bvps = [rng.normal(size=(e, 180)).astype(np.float32) for e in (3, 1, 0, 5)]
+    bpms = bpm_module.BVP_to_BPM(bvps, 30.0)
+    for bvp, bpm in zip(bvps, bpms):
+        expected = bpm_module.BPM(bvp, 30.0).BVP_to_BPM() if bvp.shape[0] else np.float32(0.0)
+        assert np.shape(bpm) == np.shape(expected)
+        np.testing.assert_array_equal(bpm, expected)
+
+
+def test_welch_zoom_matches_fft_and_interpolates_peak():
+    from pyVHR.BPM.utils import Welch_batch, peak_bpm
+
+    rng = np.random.default_rng(6)
+    t = np.arange(600) / 60.0
+    hz = rng.uniform(0.8, 3.5, (16, 1))
+    bvps = (np.sin(2 * np.pi * hz * t) + rng.normal(0, 0.3, (16, t.size))).astype(np.float32)
+    for n in (150, 600):
+        freqs, psd = Welch_batch(bvps[:, :n], 60.0)
+        zoom_freqs, zoom_psd = Welch_batch(bvps[:, :n], 60.0, method="zoom")
+        np.testing.assert_array_equal(zoom_freqs, freqs)
+        np.testing.assert_allclose(zoom_psd, psd, rtol=1e-4, atol=1e-6 * psd.max())
+
+    # interpolated peaks on 7 BPM bins beat plain peaks on 1.76 BPM bins
+    freqs, psd = Welch_batch(bvps, 60.0, nfft=2048, method="zoom")
+    coarse_freqs, coarse_psd = Welch_batch(bvps, 60.0, nfft=2048 // 4, method="zoom")
+    plain_err = np.abs(peak_bpm(freqs, psd) - 60 * hz[:, 0]).mean()
+    interp_err = np.abs(peak_bpm(coarse_freqs, coarse_psd, interp=True) - 60 * hz[:, 0]).mean()
+    assert interp_err < plain_err
+
+
+def test_sliding_welch_matches_welch():
+    from pyVHR.BPM.utils import SlidingWelch, Welch_batch
+
+    rng = np.random.default_rng(5)
+    t = np.arange(1500) / 60.0
+    bvps = np.sin(2 * np.pi * 1.3 * t) + rng.normal(0, 0.5, (2, t.size))
+    # 600 samples at 60 fps: Welch averages 7 segments of 256 samples
+    sw = SlidingWelch(60.0, 600, num_estimators=2, resync=700)
+    for i in range(0, t.size, 13):
+        sw.update(bvps[:, i : i + 13])
+        end = min(i + 13, t.size)
+        if end < 600:
+            assert not sw.ready
+            continue
+        freqs, psd = sw.spectrum()
+        expected_freqs, expected_psd = Welch_batch(bvps[:, end - 600 : end], 60.0)
+        np.testing.assert_array_equal(freqs, expected_freqs)
+        np.testing.assert_allclose(psd, expected_psd, rtol=1e-5, atol=1e-7 * expected_psd.max())
+        np.testing.assert_array_equal(sw.bpm(), expected_freqs[np.argmax(expected_psd, axis=1)])
+
+
+def test_circle_clustering_splits_psd_clusters():
+    from sklearn.metrics import pairwise_distances
+
+    from pyVHR.BPM.utils import circle_clustering, optimize_partition
+
+    rng = np.random.default_rng(7)
+    freqs = np.linspace(40, 240, 230)
+    centers = np.repeat([70.0, 140.0], 30)
+    psd = np.exp(-0.5 * ((freqs - centers[:, None]) / 5.0) ** 2) + rng.uniform(0, 0.05, (60, 230))
+    W = pairwise_distances(psd, psd, metric="cosine")
+    theta0 = 2 * np.pi * rng.random(60)
+
+    theta = circle_clustering(W, eps=0.01, theta0=theta0.copy())
+    np.testing.assert_array_equal(theta, circle_clustering(W, eps=0.01, theta0=theta0.copy()))
+    P, Q, Z, _, _ = optimize_partition(theta, opt_factor=0.1)
+    assert not set(P) & set(Q) and not (set(P) | set(Q)) & set(Z)
+    assert {tuple(sorted({int(centers[i]) for i in part})) for part in (P, Q)} == {(70,), (140,)}
+
+
+def test_fast_gaussian_fit_matches_lmfit():
+    from pyVHR.BPM.utils import gaussian_fit
+
+    rng = np.random.default_rng(8)
+    freqs = np.linspace(39, 240, 230).astype(np.float32)
+    for _ in range(5):
+        psd = np.exp(-0.5 * ((freqs - rng.uniform(60, 180)) / rng.uniform(2, 12)) ** 2) + rng.uniform(0, 0.2, 230)
+        psd = (psd / psd.max()).astype(np.float32)
+        f_peak = freqs[np.argmax(psd)]
+        result, _, sigma = gaussian_fit(psd, freqs, f_peak, 1)
+        fast, _, fast_sigma = gaussian_fit(psd, freqs, f_peak, 1, method="fast")
+        assert fast_sigma == pytest.approx(abs(sigma), rel=1e-3)
+        assert fast.chisqr == pytest.approx(result.chisqr, rel=1e-6)
+        assert fast.redchi == pytest.approx(result.redchi, rel=1e-6)
+        assert fast.aic == pytest.approx(result.aic, abs=1e-4)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def test_cpu_pos_fast_matches_cpu_pos():
+    from pyVHR.BVP.methods import cpu_POS, cpu_POS_fast
+
+    rng = np.random.default_rng(2)
+    sig = (100.0 + rng.normal(0, 3, (300, 3))).astype(np.float32)
+    for X in (np.ascontiguousarray(sig.T[np.newaxis]), np.transpose(sig[np.newaxis], (0, 2, 1))):
+        assert np.array_equal(cpu_POS_fast(X, fps=8.0, batch=37), cpu_POS(X, fps=8.0))
+
+
+def test_rgb_sig_to_bvp_batches_windows():
+    from pyVHR.BVP import BVP, methods
+    from pyVHR.extraction.utils import sig_windowing
+
+    rng = np.random.default_rng(3)
+    sig = (100.0 + rng.normal(0, 3, (240, 4, 3))).astype(np.float32)
+    windows, _ = sig_windowing(sig, 4, 0.5, 30.0)
+    assert isinstance(windows, list) and len(windows) == 9
+    for i, w in enumerate(windows):  # read-only views, no per-window copies
+        assert w.shape == (4, 3, 120) and np.shares_memory(w, sig) and not w.flags.writeable
+        np.testing.assert_array_equal(w, sig[15 * i:15 * i + 120].transpose(1, 2, 0))
+    copied, _ = sig_windowing(sig, 4, 0.51, 30.0)  # stride not a whole number of frames
+    assert isinstance(copied, list) and all(w.shape[:2] == (4, 3) for w in copied)
+    for name in ("cpu_CHROM", "cpu_POS", "cpu_OMIT"):
+        method = getattr(methods, name)
+        params = {"fps": "adaptive"} if "POS" in name else {}
+        batched = BVP.RGB_sig_to_BVP(windows, 30.0, device_type="cpu", method=method, params=dict(params))
+        per_window = BVP.RGB_sig_to_BVP(
+            windows, 30.0, device_type="cpu", method=lambda s, **k: method(s, **k), params=dict(params)
+        )
+        assert len(batched) == len(per_window) == len(windows)
+        for b, w in zip(batched, per_window):
+            assert b.shape == w.shape == (4, 120)
+            np.testing.assert_allclose(b, w, rtol=1e-5, atol=1e-5)
+
+
+def test_bvp_windowing_returns_list_of_windows():
+    from pyVHR.extraction.utils import sliding_straded_win_idx
+    from pyVHR.utils.errors import BVP_windowing
+
+    bvp = np.arange(300, dtype=np.float32)
+    for stride in (1, 0.55):
+        wins, times = BVP_windowing(bvp, 6, 30.0, stride=stride)
+        assert isinstance(wins, list) and len(wins) == len(times) > 0
+        for w, idx in zip(wins, sliding_straded_win_idx(300, 6, stride, 30.0)[0]):
+            np.testing.assert_array_equal(w, bvp[idx.astype(int)][np.newaxis])
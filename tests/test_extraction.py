@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+
+def test_fill_gaps_interpolates_short_and_flags_long():
+    from pyVHR.extraction.utils import fill_gaps
+
+    nan = np.nan
+    sig = np.array([nan, 1.0, nan, 3.0, nan, nan, nan, 7.0, 8.0, nan], dtype=np.float32)
+    filled, long_gaps = fill_gaps(sig, max_gap=2)
+    assert filled.tolist() == [1.0, 1.0, 2.0, 3.0, 3.0, 3.0, 3.0, 7.0, 8.0, 8.0]
+    assert long_gaps.tolist() == [False, False, False, False, True, True, True, False, False, False]
+
+    rgb = np.stack([sig, sig * 2, np.full_like(sig, nan)], axis=1)
+    filled, _ = fill_gaps(rgb, max_gap=2)
+    assert filled[:, 1].tolist() == [2.0, 2.0, 4.0, 6.0, 6.0, 6.0, 6.0, 14.0, 16.0, 16.0]
+    assert np.isnan(filled[:, 2]).all()
+
+
+def test_landmarks_to_array_matches_mediapipe_pixel_coordinates():
+    from mediapipe.framework.formats import landmark_pb2
+    from mediapipe.python.solutions.drawing_utils import _normalized_to_pixel_coordinates
+    from pyVHR.extraction.sig_processing import landmarks_to_array
+
+    rng = np.random.default_rng(4)
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for i, (x, y) in enumerate(rng.uniform(-0.1, 1.1, (468, 2))):
+        lm = landmark_list.landmark.add(x=x, y=y, z=0.0)
+        if i % 7 == 0:
+            lm.visibility = i % 2
+        if i % 11 == 0:
+            lm.presence = i % 3 / 2
+    landmark_list.landmark[0].x, landmark_list.landmark[0].y = 1.0, 0.0
+
+    # FaceMesh output (x, y, z only) is read from the serialized message
+    mesh_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in rng.uniform(-0.1, 1.1, (478, 3)):
+        mesh_list.landmark.add(x=x, y=y, z=z)
+    mesh_list.landmark[1].x = 1.0
+
+    width, height = 640, 480
+    for lms in (landmark_list, mesh_list):
+        ldmks = landmarks_to_array(lms, width, height)
+        assert ldmks.shape == (468, 5) and ldmks.dtype == np.float32
+        for lm, row in zip(lms.landmark, ldmks):
+            coords = None
+            if not ((lm.HasField("visibility") and lm.visibility < 0.5) or (lm.HasField("presence") and lm.presence < 0.5)):
+                coords = _normalized_to_pixel_coordinates(lm.x, lm.y, width, height)
+            expected = (-1.0, -1.0) if coords is None else (coords[1], coords[0])
+            assert tuple(row[:2]) == expected
+
+
+def _convex_hull_skin_reference(image, ldmks):
+    # full-frame masks from ConvexHull().vertices, as SkinExtractionConvexHull used to build them
+    from PIL import Image, ImageDraw
+    from scipy.spatial import ConvexHull
+    from pyVHR.extraction.sig_processing import MagicLandmarks
+    from pyVHR.extraction.skin_extraction_methods import bbox2_CPU
+
+    def hull_mask(pts):
+        pts = pts[pts[:, 0] >= 0][:, :2]
+        if len(pts) <= 3:
+            return None
+        img = Image.new("L", image.shape[:2], 0)
+        ImageDraw.Draw(img).polygon([(pts[v, 0], pts[v, 1]) for v in ConvexHull(pts).vertices], outline=1, fill=1)
+        return np.array(img).T
+
+    mask = hull_mask(ldmks)
+    for idx in (MagicLandmarks.left_eye, MagicLandmarks.right_eye, MagicLandmarks.mounth):
+        part = hull_mask(ldmks[idx])
+        mask = mask * (1 - part) if part is not None else np.zeros_like(mask)
+    return mask, bbox2_CPU(image * mask[:, :, None])
+
+
+def test_convex_hull_face_mask_matches_reference():
+    from scipy.ndimage import maximum_filter, minimum_filter
+    from pyVHR.extraction.sig_processing import MagicLandmarks
+    from pyVHR.extraction.skin_extraction_methods import SkinExtractionConvexHull
+
+    rng = np.random.default_rng(5)
+    ex = SkinExtractionConvexHull("CPU")
+    for t in range(60):
+        h, w = (240, 320) if t < 30 else (200, 300)
+        image = rng.integers(1, 256, (h, w, 3), dtype=np.uint8)
+        center = rng.uniform(60, 180, 2)
+        ldmks = np.full((468, 5), -1, dtype=np.float32)
+        ldmks[:, 0] = np.floor(np.clip(center[0] + rng.normal(0, 40, 468), 0, h - 1))
+        ldmks[:, 1] = np.floor(np.clip(center[1] + rng.normal(0, 50, 468), 0, w - 1))
+        if t % 3 == 0:
+            ldmks[rng.choice(468, 300, replace=False), :2] = -1
+        if t % 10 == 1:
+            ldmks[MagicLandmarks.right_eye[3:], :2] = -1  # eye hole with 3 landmarks: no skin at all
+
+        ref_mask, _ = _convex_hull_skin_reference(image, ldmks)
+        mask, box = ex.face_mask(ldmks, image.shape)
+        cropped, full = ex.extract_skin(image, ldmks)
+        if mask is None:
+            assert not ref_mask.any() and cropped.shape == image.shape and not full.any()
+            continue
+        # the box is the face hull's
+        pts = ldmks[ldmks[:, 0] >= 0][:, :2]
+        assert box == (pts[:, 0].min(), pts[:, 0].max(), pts[:, 1].min(), pts[:, 1].max())
+        rmin, rmax, cmin, cmax = box
+        ours = np.zeros_like(ref_mask)
+        ours[rmin:rmax + 1, cmin:cmax + 1] = mask
+        np.testing.assert_array_equal(full, image * ours[:, :, None])
+        np.testing.assert_array_equal(cropped, full[rmin:rmax, cmin:cmax])
+        # cv2 and PIL rasterize polygon edges differently: pixels may only differ on a hull
+        # boundary (next to an edge of either mask), and at most 3% of the skin pixels
+        diff = ours != ref_mask
+        edge = maximum_filter(ref_mask, size=3) != minimum_filter(ref_mask, size=3)
+        edge |= maximum_filter(ours, size=3) != minimum_filter(ours, size=3)
+        assert not (diff & ~edge).any()
+        assert diff.sum() <= 0.03 * ref_mask.sum()
+
+
+def _face_parsing_extractor(monkeypatch, **kwargs):
+    # random network weights: no resnet18/faceparsing checkpoint download
+    import torch
+    import pyVHR.extraction.skin_extraction_methods as sem
+    from pyVHR.resources.faceparsing.model import BiSeNet
+    from pyVHR.resources.faceparsing.resnet import Resnet18
+
+    monkeypatch.setattr(Resnet18, "init_weight", lambda self: None)
+    torch.manual_seed(0)
+    state_dict = BiSeNet(n_classes=19).state_dict()
+    monkeypatch.setattr(sem.os.path, "isfile", lambda p: True)
+    monkeypatch.setattr(sem.torch, "load", lambda p: state_dict)
+    extractor = sem.SkinExtractionFaceParsing("CPU", **kwargs)
+    monkeypatch.undo()
+    return extractor
+
+
+def test_face_parsing_batch_matches_per_frame(monkeypatch):
+    import torch
+
+    threads = torch.get_num_threads()
+    extractor = _face_parsing_extractor(monkeypatch, batch_size=3, num_threads=threads + 1)
+    assert torch.get_num_threads() == threads
+
+    rng = np.random.default_rng(6)
+    images, ldmks_list = [], []
+    for _ in range(3):
+        images.append(rng.integers(0, 256, (300, 320, 3), dtype=np.uint8))
+        ldmks = np.zeros((468, 5), dtype=np.float32)
+        ldmks[:, :2] = np.floor(rng.uniform(100, 200, (468, 2)))
+        ldmks[:2, :2] = [[100, 100], [200, 200]]  # square face box: batch crops are not resized
+        ldmks[5:8, :2] = -1
+        ldmks_list.append(ldmks)
+    y0, y1, x0, x1 = extractor.face_box(images[0], ldmks_list[0])
+    assert y1 - y0 == x1 - x0
+    extractor.input_size = y1 - y0
+
+    batch = extractor.extract_skin_batch(images, ldmks_list)
+    assert torch.get_num_threads() == threads
+    assert len(batch) == len(images)
+    for image, ldmks, (cropped, full) in zip(images, ldmks_list, batch):
+        ref_cropped, ref_full = extractor.extract_skin(image, ldmks)
+        np.testing.assert_array_equal(cropped, ref_cropped)
+        np.testing.assert_array_equal(full, ref_full)
+    assert any(cropped.any() for cropped, _ in batch)
+
+
+def test_integral_means_match_direct_means():
+    from pyVHR.extraction.sig_extraction_methods import (
+        landmarks_mean,
+        landmarks_mean_custom_rect,
+        landmarks_mean_custom_rect_integral,
+        landmarks_mean_integral,
+    )
+
+    rng = np.random.default_rng(7)
+    low, high = np.int32(75), np.int32(230)
+    for t in range(40):
+        h, w = rng.integers(40, 300, 2)
+        im = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        if t % 3 == 0:
+            im[:] = 255 * (rng.random((h, w, 1)) > 0.5)
+        # few small patches (direct sums) and many large ones (summed-area tables)
+        n = int(rng.integers(1, 10)) if t % 2 else int(rng.integers(100, 468))
+        ldmks = np.zeros((n, 5), dtype=np.float32)
+        ldmks[:, 0] = rng.integers(0, h, n)
+        ldmks[:, 1] = rng.integers(0, w, n)
+        ldmks[rng.random(n) < 0.1, :2] = -1
+        square = np.float32(rng.choice([1.0, 7.0, 30.5, 60.0]))
+        rects = rng.integers(1, 50, (n, 2)).astype(np.float32)
+        np.testing.assert_array_equal(
+            landmarks_mean_integral(ldmks, im, square, low, high), landmarks_mean(ldmks, im, square, low, high)
+        )
+        np.testing.assert_array_equal(
+            landmarks_mean_custom_rect_integral(ldmks, im, rects, low, high),
+            landmarks_mean_custom_rect(ldmks, im, rects, low, high),
+        )
+
+
+def test_threaded_stage_keeps_order_errors_and_stops_on_close():
+    import threading
+
+    from pyVHR.extraction.utils import threaded_stage
+
+    stages = threaded_stage(lambda x: x + 1, threaded_stage(lambda x: 2 * x, range(50), maxsize=3))
+    assert list(stages) == [2 * x + 1 for x in range(50)]
+
+    def fail(x):
+        if x == 5:
+            raise ValueError("bad frame")
+        return x
+
+    out = []
+    with pytest.raises(ValueError, match="bad frame"):
+        for x in threaded_stage(fail, range(10)):
+            out.append(x)
+    assert out == [0, 1, 2, 3, 4]
+
+    pulled, closed = [], threading.Event()
+
+    def source():
+        try:
+            for x in range(1000):
+                pulled.append(x)
+                yield x
+        finally:
+            closed.set()
+
+    stage = threaded_stage(lambda x: x, source(), maxsize=4)
+    assert [next(stage) for _ in range(3)] == [0, 1, 2]
+    stage.close()  # joins the worker thread, which closes the source
+    assert closed.is_set()
+    assert len(pulled) <= 3 + 4 + 1  # bounded read-ahead
+
+
+def test_holistic_mean_mask_matches_holistic_mean_of_skin_image():
+    from pyVHR.extraction.sig_extraction_methods import holistic_mean, holistic_mean_mask
+    from pyVHR.extraction.skin_extraction_methods import SkinExtractionConvexHull
+
+    rng = np.random.default_rng(9)
+    ex = SkinExtractionConvexHull("CPU")
+    low, high = np.int32(55), np.int32(200)
+    for t in range(20):
+        h, w = 120, 160
+        image = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        center = rng.uniform(30, 90, 2)
+        ldmks = np.full((468, 5), -1, dtype=np.float32)
+        ldmks[:, 0] = np.floor(np.clip(center[0] + rng.normal(0, 20, 468), 0, h - 1))
+        ldmks[:, 1] = np.floor(np.clip(center[1] + rng.normal(0, 25, 468), 0, w - 1))
+        cropped, _ = ex.extract_skin(image, ldmks)
+        mask, (rmin, _, cmin, _) = ex.face_mask(ldmks, image.shape)
+        # as in SignalProcessing.extract_holistic: the crop drops the last row and column of the box
+        fused = holistic_mean_mask(image, mask[:-1, :-1], np.int32(rmin), np.int32(cmin), low, high)
+        np.testing.assert_array_equal(fused, holistic_mean(cropped, low, high))
+
+
+def test_histogram_medians_match_np_median():
+    import math
+
+    from pyVHR.extraction.sig_extraction_methods import landmarks_median, landmarks_median_custom_rect
+
+    rng = np.random.default_rng(10)
+
+    def reference(im, ldmks, half_rows, half_cols, low, high):
+        h, w = im.shape[:2]
+        out = np.zeros((len(ldmks), 3), dtype=np.float32)
+        for i, (x, y) in enumerate(ldmks[:, :2]):
+            if x < 0:
+                continue
+            pix = im[int(max(x - half_rows[i], 0)):int(min(x + half_rows[i], h)),
+                     int(max(y - half_cols[i], 0)):int(min(y + half_cols[i], w))].reshape(-1, 3).astype(int)
+            pix = pix[~((pix <= low).all(axis=1) | (pix >= high).all(axis=1))]
+            if len(pix) > 0:
+                out[i] = np.median(pix, axis=0)
+        return out
+
+    for t in range(40):
+        h, w = rng.integers(40, 200, 2)
+        im = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        if t % 2:
+            im = (im // 8 + 100).astype(np.uint8)  # many ties
+        n = int(rng.integers(1, 30))
+        ldmks = np.zeros((n, 5), dtype=np.float32)
+        ldmks[:, 0] = rng.integers(0, h + 5, n)
+        ldmks[:, 1] = rng.integers(0, w + 5, n)
+        ldmks[rng.random(n) < 0.1, 0] = -1
+        low, high = np.int32(rng.integers(0, 120)), np.int32(rng.integers(130, 256))
+        square = np.float32(rng.integers(1, 40))
+        rects = rng.integers(1, 40, (n, 2)).astype(np.float32)
+
+        half = np.full(n, math.floor(square / 2))
+        out = landmarks_median(ldmks, im, square, low, high)
+        np.testing.assert_array_equal(out[:, :2], ldmks[:, :2])
+        valid = ldmks[:, 0] >= 0
+        np.testing.assert_array_equal(out[valid, 2:], reference(im, ldmks, half, half, low, high)[valid])
+        out = landmarks_median_custom_rect(ldmks, im, rects, low, high)
+        ref = reference(im, ldmks, np.floor(rects[:, 1] / 2), np.floor(rects[:, 0] / 2), low, high)
+        np.testing.assert_array_equal(out[valid, 2:], ref[valid].astype(np.int32))
+
+
+def test_skin_yield_batches_frames_with_a_face(monkeypatch):
+    from pyVHR.extraction.sig_processing import SignalProcessing
+
+    extractor = _face_parsing_extractor(monkeypatch, batch_size=3)
+    rng = np.random.default_rng(11)
+    frames = []
+    for i in range(7):
+        image = rng.integers(0, 256, (300, 320, 3), dtype=np.uint8)
+        ldmks = np.zeros((468, 5), dtype=np.float32)
+        ldmks[:, :2] = np.floor(rng.uniform(100, 200, (468, 2)))
+        ldmks[:2, :2] = [[100, 100], [200, 200]]
+        frames.append((image, ldmks, i not in (2, 5)))
+    y0, y1, _, _ = extractor.face_box(frames[0][0], frames[0][1])
+    extractor.input_size = y1 - y0
+
+    sp = SignalProcessing()
+    sp.set_total_frames(6)
+    calls = []
+    extract_skin_batch = extractor.extract_skin_batch
+
+    def counting_batch(images, ldmks_list):
+        calls.append(len(images))
+        return extract_skin_batch(images, ldmks_list)
+
+    monkeypatch.setattr(extractor, "extract_skin_batch", counting_batch)
+    out = list(sp._skin_yield(iter(frames), extractor))
+
+    assert calls == [2, 2]  # batches of 3 frames, without the frames with no face
+    assert len(out) == 6
+    for (image, ldmks, found), (o_image, o_ldmks, o_found, cropped, full) in zip(frames, out):
+        assert o_image is image and o_ldmks is ldmks and o_found == found
+        if found:
+            ref_cropped, ref_full = extractor.extract_skin(image, ldmks)
+        else:
+            ref_cropped = ref_full = np.zeros_like(image)
+        np.testing.assert_array_equal(cropped, ref_cropped)
+        np.testing.assert_array_equal(full, ref_full)
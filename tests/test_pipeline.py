@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pyVHR.analysis.pipeline as pipeline
+from pyVHR.analysis.pipeline import Pipeline
+
+
+class WorkerDied(BaseException):
+    """Stands for a worker process dying (not caught by _dataset_worker_run)."""
+
+
+class InProcessPool:
+    """ProcessPoolExecutor stand-in: runs tasks in order; a dead worker breaks the pool."""
+
+    max_workers_seen: list = []
+
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        self.max_workers_seen.append(max_workers)
+        initializer(*initargs)
+        self.broken = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        if not self.broken:
+            try:
+                future.set_result(fn(*args))
+                return future
+            except WorkerDied:
+                self.broken = True
+        future.set_exception(BrokenProcessPool("a worker died"))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FlakyPipeline(Pipeline):
+    """Pipeline whose videos succeed, raise, or kill their worker."""
+
+    CRASH, ERROR = 1, 3
+
+    def parse_cfg(self, configFilename):
+        pass
+
+    def _load_dataset(self):
+        return None
+
+    def _make_sig_processing(self, verb):
+        return None
+
+    def _run_video(self, v, dataset, sig_processing, verb=True):
+        if v == self.CRASH:
+            raise WorkerDied()
+        if v == self.ERROR:
+            raise ValueError("bad video")
+        return [{"videoIdx": v}]
+
+
+def test_run_videos_parallel_retries_after_a_worker_crash(monkeypatch):
+    monkeypatch.setattr(pipeline, "ProcessPoolExecutor", InProcessPool)
+    monkeypatch.setattr(InProcessPool, "max_workers_seen", [])
+    pipe = FlakyPipeline()
+    pipe.configFilename = "unused.cfg"
+    pipe.videoIdx = list(range(6))
+    pipe.failedVideoIdx = []
+
+    video_rows = pipe._run_videos_parallel(3, False)
+
+    assert video_rows == {v: [{"videoIdx": v}] for v in (0, 2, 4, 5)}
+    assert sorted(pipe.failedVideoIdx) == [FlakyPipeline.CRASH, FlakyPipeline.ERROR]
+    # videos pending when the pool broke are retried one worker at a time
+    assert InProcessPool.max_workers_seen == [3, 1, 1]
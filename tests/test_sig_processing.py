@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+FACE_IMG = os.path.join(os.path.dirname(__file__), "..", "img", "face.png")
+
+
+def _write_video(path, frames, fps=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (frames[0].shape[1], frames[0].shape[0]))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+@pytest.fixture
+def face_video(tmp_path):
+    """Writes a short video of the test face (slightly changing brightness); returns a factory."""
+    face = cv2.imread(FACE_IMG)
+
+    def make(n=6, name="face.avi", shift=0):
+        frames = [cv2.add(face, np.full_like(face, (i + shift) % 4)) for i in range(n)]
+        return _write_video(tmp_path / name, frames)
+
+    return make
+
+
+def test_signal_cache_hit_miss_and_invalidation(face_video, tmp_path, monkeypatch):
+    from pyVHR.extraction import sig_processing as sp_mod
+    from pyVHR.extraction.sig_extraction_methods import SignalProcessingParams
+
+    video = face_video()
+    sp = sp_mod.SignalProcessing()
+    sp.set_total_frames(4)
+    sp.set_cache_dir(str(tmp_path / "cache"))
+
+    extractions = []
+    face_landmarks_yield = sp_mod.SignalProcessing._face_landmarks_yield
+
+    def counting_yield(self, *args, **kwargs):
+        extractions.append(args[0])
+        return face_landmarks_yield(self, *args, **kwargs)
+
+    monkeypatch.setattr(sp_mod.SignalProcessing, "_face_landmarks_yield", counting_yield)
+
+    sig = sp.extract_holistic(video)
+    assert sig.shape == (4, 1, 3) and len(extractions) == 1
+    # hit: same video and setting
+    np.testing.assert_array_equal(sp.extract_holistic(video), sig)
+    assert len(extractions) == 1
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+    # miss: another setting (color thresholds, frames, patches) is another entry
+    monkeypatch.setattr(SignalProcessingParams, "RGB_LOW_TH", np.int32(SignalProcessingParams.RGB_LOW_TH + 5))
+    sp.extract_holistic(video)
+    sp.set_total_frames(3)
+    assert sp.extract_holistic(video).shape == (3, 1, 3)
+    sp.set_landmarks([1, 10, 50])
+    sp.set_square_patches_side(20.0)
+    patches = sp.extract_patches(video, "squares", "mean")
+    np.testing.assert_array_equal(sp.extract_patches(video, "squares", "mean"), patches)
+    assert len(extractions) == 4
+    assert len(os.listdir(tmp_path / "cache")) == 4
+
+    # invalidation: a new video content or cache version, and no cache while visualizing
+    sp.set_total_frames(4)
+    monkeypatch.setattr(SignalProcessingParams, "RGB_LOW_TH", np.int32(SignalProcessingParams.RGB_LOW_TH - 5))
+    face_video(shift=2)
+    assert not np.array_equal(sp.extract_holistic(video), sig)
+    monkeypatch.setattr(sp_mod, "SIG_CACHE_VERSION", sp_mod.SIG_CACHE_VERSION + 1)
+    sp.extract_holistic(video)
+    sp.set_visualize_skin_and_landmarks(visualize_skin=True)
+    sp.extract_holistic(video)
+    assert len(extractions) == 7
+    assert len(os.listdir(tmp_path / "cache")) == 6
+
+
+def test_frames_memmap_grows_and_truncates(tmp_path):
+    from pyVHR.extraction.sig_processing import FramesMemmap
+
+    frames = np.random.default_rng(8).integers(0, 256, (7, 4, 5, 3), dtype=np.uint8)
+    for expected in (0, 2, 7, 20):
+        filename = str(tmp_path / f"frames{expected}.raw")
+        store = FramesMemmap(filename, expected, frames.shape[1:], frames.dtype)
+        for frame in frames:
+            store.append(frame)
+        out = store.close()
+        assert isinstance(out, np.memmap)
+        np.testing.assert_array_equal(out, frames)
+        assert os.path.getsize(filename) == frames.nbytes
+
+    empty = FramesMemmap(str(tmp_path / "empty.raw"), 5, (4, 5, 3), np.float32).close()
+    assert empty.shape == (0, 4, 5, 3) and empty.dtype == np.float32
+    assert os.path.getsize(tmp_path / "empty.raw") == 0
+
+
+def test_extract_raw_memmap_matches_in_memory(face_video, tmp_path):
+    from pyVHR.extraction.sig_processing import SignalProcessing
+
+    video = face_video(n=5)
+    sp = SignalProcessing()
+    in_memory = sp.extract_raw(video)
+    mapped = sp.extract_raw(video, memmap_file=str(tmp_path / "raw.dat"))
+    assert isinstance(mapped, np.memmap) and in_memory.shape[0] == 5
+    np.testing.assert_array_equal(mapped, in_memory)
+
+    sp.set_total_frames(3)
+    in_memory = sp.extract_raw_holistic(video)
+    mapped = sp.extract_raw_holistic(video, memmap_file=str(tmp_path / "skin.dat"))
+    assert isinstance(mapped, np.memmap) and mapped.dtype == np.float32 and in_memory.shape[0] == 3
+    np.testing.assert_array_equal(mapped, in_memory)
+
+
+def test_face_landmarks_yield_matches_sequential(face_video):
+    import mediapipe as mp
+
+    from pyVHR.extraction.sig_processing import SignalProcessing, face_landmarks
+    from pyVHR.extraction.utils import extract_frames_yield
+
+    video = face_video(n=5)
+
+    def face_mesh():
+        return mp.solutions.face_mesh.FaceMesh(max_num_faces=1, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+    with face_mesh() as fm:
+        expected = [
+            (image,) + face_landmarks(fm, image)
+            for image in (cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in extract_frames_yield(video))
+        ]
+    with face_mesh() as fm:
+        got = list(SignalProcessing()._face_landmarks_yield(video, fm))
+
+    assert len(got) == len(expected) == 5
+    assert all(found for _, _, found in got)
+    for (image, ldmks, found), (ref_image, ref_ldmks, ref_found) in zip(got, expected):
+        np.testing.assert_array_equal(image, ref_image)
+        np.testing.assert_array_equal(ldmks, ref_ldmks)
+        assert found == ref_found
+
+
+def test_fused_holistic_matches_skin_image_path(face_video):
+    from pyVHR.extraction.sig_processing import SignalProcessing
+
+    video = face_video(n=4)
+    sp = SignalProcessing()
+    fused = sp.extract_holistic(video)
+    sp.set_visualize_skin_and_landmarks(visualize_skin=True)  # builds the skin images
+    unfused = sp.extract_holistic(video)
+    assert len(sp.get_visualize_skin()) == 4
+    assert fused.shape == (4, 1, 3) and (fused > 0).all()
+    np.testing.assert_array_equal(fused, unfused)